@@ -259,6 +259,10 @@ submit(){
     partition=$(sed -n '3'p "slurm_config")
     nodes=$(sed -n '4'p "slurm_config")
 
+    # write the ascii particle file read by aspect, if particles are saved in the binary format
+    eval "python -m shilofue.Parse convert_particle_file -i ${case_dir}" || \
+        { cecho ${BAD} "submit case: ${case_name} failed to convert the particle file"; return 1; }
+
     # scp to remote
     local remote_target=$(dirname "${remote_case_dir}")
     eval "${RSYNC} -r ${case_dir} ${server_info}:${remote_target}/"
@@ -465,6 +469,8 @@ plot_visit_case(){
 #   fileout: file to output to
 #   vlist: [start step, interval, end step].
 #       If this is none, take all steps   
+#   solver_output_command: command of shilofue.SolverOutput to call,
+#       default is 'parse_solver_output'
 parse_solver_output(){
     # parse in options
     # assert the list of value
@@ -484,18 +490,10 @@ parse_solver_output(){
         end=1000000
     fi
 
-    # loop for timesteps
-    timestep=${start}
-    while ((timestep<end)); do
-        parse_solver_output_timestep
-        
-        # check if this is successful
-        # we take for granted that any non-zero state
-        # indicates that we reach the EOF
-        [[ $? -eq 0 ]] || break
-
-        ((timestep+=interval))
-    done
+    # read the stdout file once as a stream with the python module,
+    # parse_solver_output_timestep greps the whole file for every timestep
+    eval "python -m shilofue.SolverOutput ${solver_output_command:-parse_solver_output} -i ${filein} -o ${fileout} -l ${start} ${interval} ${end}"
+    [[ $? -eq 0 ]] || { cecho ${WARN} "${FUNCNAME[0]}: fail to parse ${filein}"; return 1; }
     return 0
 }
 
@@ -544,7 +542,9 @@ parse_case_solver_output()
         [[ -e "${fileout}" && "${fileout}" -nt ${filein} ]] && return -1
     fi
 
-    # call parse_solver_output function
+    # call parse_solver_output function,
+    # a checkpoint next to the output file is used to only parse new outputs in the stdout file
+    local solver_output_command="update_solver_output"
     parse_solver_output
     return 0
 }
@@ -713,6 +713,7 @@ build_aspect_plugin(){
 #   case_dir: directory of case
 bash_post_process_case(){
     # handle newton solver output
+    # this goes through shilofue.SolverOutput, which reads the stdout file only once
     # future: add option
     vlist=(0 1 20)
     parse_case_solver_output
@@ -0,0 +1,95 @@
+import os
+import sys
+import shutil
+import timeit
+import argparse
+import tempfile
+from pathlib import Path
+import shilofue.Doc as Doc
+
+'''
+Benchmark of finding images in img directories of cases, compare one rglob
+per name and directory with ReturnFileList, which walks a directory once and
+reuses the index
+example:
+    python -m benchmarks.bench_file_list -c 20 -f 2000
+'''
+
+
+def ReturnFileListOld(_dir, _names):
+    '''
+    the way of finding files before FileIndex
+    '''
+    _files = []
+    for _name in _names:
+        for _path in Path(_dir).rglob(_name + '*'):
+            if os.path.isfile(str(_path)):
+                _files.append(os.path.basename(str(_path)))
+    return _files
+
+
+def MakeImgDirs(_dir, cases, frames):
+    '''
+    make img directories of cases, with figures and a subdirectory of visit frames
+    '''
+    _img_dirs = []
+    for i in range(cases):
+        _img_dir = os.path.join(_dir, 'case%d' % i, 'img')
+        os.makedirs(os.path.join(_img_dir, 'visit'))
+        for _name in ['Statistics.png', 'DepthAverage_t0.png', 'NewtonSolver.png']:
+            open(os.path.join(_img_dir, _name), 'w').close()
+        for j in range(frames):
+            open(os.path.join(_img_dir, 'visit', 'visit_%06d.png' % j), 'w').close()
+        _img_dirs.append(_img_dir)
+    return _img_dirs
+
+
+def main():
+    '''
+    main function of this module
+    Inputs:
+        sys.arg[1:](str):
+            options
+    '''
+    parser = argparse.ArgumentParser(description='Benchmark of finding images')
+    parser.add_argument('-c', '--cases', type=int,
+                        default=20,
+                        help='number of cases')
+    parser.add_argument('-f', '--frames', type=int,
+                        default=2000,
+                        help='number of visit frames in a case')
+    parser.add_argument('-n', '--number', type=int,
+                        default=3,
+                        help='number of repetitions')
+    arg = parser.parse_args(sys.argv[1:])
+
+    _names = ['Statistics', 'DepthAverage', 'NewtonSolver', 'visit']
+    _dir = tempfile.mkdtemp()
+    try:
+        _img_dirs = MakeImgDirs(_dir, arg.cases, arg.frames)
+        for _img_dir in _img_dirs:
+            assert(sorted(ReturnFileListOld(_img_dir, _names)) == sorted(Doc.ReturnFileList(_img_dir, _names)))
+
+        def FindOld():
+            # an analysis looks for names one by one
+            for _name in _names:
+                for _img_dir in _img_dirs:
+                    ReturnFileListOld(_img_dir, [_name])
+
+        def FindNew():
+            index = {}
+            for _name in _names:
+                for _img_dir in _img_dirs:
+                    Doc.ReturnFileList(_img_dir, [_name], index=index)
+
+        print("%-30s %s" % ('method', 'time per analysis (s)'))
+        for _method, fun in [('rglob', FindOld), ('ReturnFileList', FindNew)]:
+            _time = timeit.timeit(fun, number=arg.number) / arg.number
+            print("%-30s %.4e" % (_method, _time))
+    finally:
+        shutil.rmtree(_dir)
+
+
+# run script
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import timeit
+import argparse
+import numpy as np
+import shilofue.Utilities as Utilities
+
+'''
+Benchmark of reading data tables from aspect, compare LoadTable with
+reading the whole file for the header and parsing numbers with np.genfromtxt
+example:
+    python -m benchmarks.bench_load_table -n 10
+'''
+
+_fixture_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'tests', 'integration', 'fixtures', 'test-plot')
+
+
+def ReadOld(_filename, header_reader):
+    '''
+    the way of reading a table before LoadTable
+    '''
+    with open(_filename, 'r') as fin:
+        _texts = fin.readlines()
+    _header = header_reader(_texts)
+    _data = np.genfromtxt(_filename, comments='#')
+    return _header, _data
+
+
+def main():
+    '''
+    main function of this module
+    Inputs:
+        sys.arg[1:](str):
+            options
+    '''
+    parser = argparse.ArgumentParser(description='Benchmark of reading data tables')
+    parser.add_argument('-n', '--number', type=int,
+                        default=10,
+                        help='number of repetitions')
+    arg = parser.parse_args(sys.argv[1:])
+
+    cases = [
+        ('statistics', Utilities.ReadHeader, ['Time', 'Time_step_number', 'Number_of_mesh_cells']),
+        ('depth_average.txt', Utilities.ReadHeader2, ['time', 'depth', 'temperature'])
+    ]
+    print("%-20s %-30s %s" % ('file', 'method', 'time per read (s)'))
+    for _name, header_reader, usecols in cases:
+        _filename = os.path.join(_fixture_dir, _name)
+        methods = [
+            ('genfromtxt', lambda: ReadOld(_filename, header_reader)),
+            ('LoadTable', lambda: Utilities.LoadTable(_filename, header_reader=header_reader)),
+            ('LoadTable, %d columns' % len(usecols),
+             lambda: Utilities.LoadTable(_filename, header_reader=header_reader, usecols=usecols))
+        ]
+        for _method, fun in methods:
+            _time = timeit.timeit(fun, number=arg.number) / arg.number
+            print("%-20s %-30s %.4e" % (_name, _method, _time))
+
+
+# run script
+if __name__ == '__main__':
+    main()
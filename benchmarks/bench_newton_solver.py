@@ -0,0 +1,88 @@
+import os
+import sys
+import shutil
+import timeit
+import argparse
+import tempfile
+import numpy as np
+import shilofue.Plot as Plot
+import shilofue.SolverOutput as SolverOutput
+
+'''
+Benchmark of analyzing solver outputs of cases, compare reading every file with
+NEWTON_SOLVER_PLOT with loading all files into one table and computing statistics
+of all cases at once
+example:
+    python -m benchmarks.bench_newton_solver -c 200
+'''
+
+_fixture_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'tests', 'integration', 'fixtures', 'doc', 'foo', 'output', 'solver_output')
+
+
+def AnalyzeOld(files):
+    '''
+    the way of reading solver outputs before LoadSolverOutputs, the number of steps
+    and iterations are counted in a loop
+    '''
+    NewtonSolver = Plot.NEWTON_SOLVER_PLOT('NewtonSolver')
+    NewtonSolver.cache = False
+    _stats = []
+    for _file in files:
+        NewtonSolver.ReadHeader(_file)
+        NewtonSolver.ReadData(_file)
+        _data_list = NewtonSolver.ManageDataAll()
+        _steps = np.unique(_data_list[0])
+        _stats.append((_steps.size, _data_list[0].size))
+    return _stats
+
+
+def AnalyzeNew(files, cache):
+    '''
+    load solver outputs into one table and compute statistics
+    '''
+    _data = SolverOutput.LoadSolverOutputs(files, cache=cache)
+    return SolverOutput.NewtonSolverStats(_data, len(files))
+
+
+def main():
+    '''
+    main function of this module
+    Inputs:
+        sys.arg[1:](str):
+            options
+    '''
+    parser = argparse.ArgumentParser(description='Benchmark of analyzing solver outputs')
+    parser.add_argument('-c', '--cases', type=int,
+                        default=200,
+                        help='number of cases')
+    parser.add_argument('-n', '--number', type=int,
+                        default=3,
+                        help='number of repetitions')
+    arg = parser.parse_args(sys.argv[1:])
+
+    _dir = tempfile.mkdtemp()
+    try:
+        files = []
+        for i in range(arg.cases):
+            _file = os.path.join(_dir, 'solver_output_%d' % i)
+            shutil.copy(_fixture_file, _file)
+            files.append(_file)
+        _stats = AnalyzeNew(files, True)
+        assert([(_stats['steps'][i], _stats['iterations'][i]) for i in range(arg.cases)] == AnalyzeOld(files))
+        print("%-30s %s" % ('method', 'time per analysis (s)'))
+        methods = [
+            ('NEWTON_SOLVER_PLOT', lambda: AnalyzeOld(files)),
+            ('LoadSolverOutputs', lambda: AnalyzeNew(files, False)),
+            ('LoadSolverOutputs, cached', lambda: AnalyzeNew(files, True))
+        ]
+        for _method, fun in methods:
+            _time = timeit.timeit(fun, number=arg.number) / arg.number
+            print("%-30s %.4e" % (_method, _time))
+    finally:
+        shutil.rmtree(_dir)
+
+
+# run script
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import os
+import re
+import sys
+import glob
+import timeit
+import argparse
+import shilofue.Parse as Parse
+
+'''
+Benchmark of parsing .prm files, compare ParseFromDealiiInput with
+the recursive parser based on regular expressions used before,
+every .prm file in the files directory is parsed.
+example:
+    python -m benchmarks.bench_parse_prm -n 10
+'''
+
+_files_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'files')
+
+
+def ParseOld(fin):
+    '''
+    the way of parsing a .prm file before
+    '''
+    inputs = {}
+    line = fin.readline()
+    while line != "":
+        if re.match('^(\t| )*#', line):
+            pass
+        elif re.match('^(\t| )*set', line):
+            temp = re.sub('^(\t| )*set ', '', line, count=1)
+            temp = temp.split('=', maxsplit=1)
+            key = temp[0]
+            key = re.sub('(\t| )*$', '', key)
+            value = temp[1]
+            value = re.sub('^ *', '', value)
+            value = re.sub(' *(#.*)?\n$', '', value)
+            while value[-1] == '\\':
+                line = fin.readline()
+                line = re.sub(' *(#.*)?\n$', '', line)
+                value = value + '\n' + line
+            inputs[key] = value
+        elif re.match('^.*subsection', line):
+            key = re.sub('^.*subsection ', '', line)
+            key = key.strip('\n')
+            try:
+                inputs[key]
+            except KeyError:
+                inputs[key] = ParseOld(fin)
+            else:
+                temp = ParseOld(fin)
+                inputs[key].update(temp.items())
+        elif re.match('^.*end', line):
+            return inputs
+        line = fin.readline()
+    return inputs
+
+
+def ParseFiles(_files, parse):
+    '''
+    parse all files
+    '''
+    _outputs = []
+    for _file in _files:
+        with open(_file, 'r') as fin:
+            _outputs.append(parse(fin))
+    return _outputs
+
+
+def main():
+    '''
+    main function of this module
+    Inputs:
+        sys.arg[1:](str):
+            options
+    '''
+    parser = argparse.ArgumentParser(description='Benchmark of parsing .prm files')
+    parser.add_argument('-n', '--number', type=int,
+                        default=10,
+                        help='number of repetitions')
+    arg = parser.parse_args(sys.argv[1:])
+
+    _files = sorted(glob.glob(os.path.join(_files_dir, '**', '*.prm'), recursive=True))
+    # check the outputs are the same
+    assert(ParseFiles(_files, ParseOld) == ParseFiles(_files, Parse.ParseFromDealiiInput))
+    print("%d files in %s" % (len(_files), _files_dir))
+    print("%-30s %s" % ('method', 'time for all files (s)'))
+    _times = {}
+    for _method, parse in [('regular expressions', ParseOld), ('ParseFromDealiiInput', Parse.ParseFromDealiiInput)]:
+        _times[_method] = timeit.timeit(lambda: ParseFiles(_files, parse), number=arg.number) / arg.number
+        print("%-30s %.4e" % (_method, _times[_method]))
+    print("speedup: %.1f" % (_times['regular expressions'] / _times['ParseFromDealiiInput']))
+
+
+# run script
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import timeit
+import argparse
+import numpy as np
+import shilofue.Parse as Parse
+import shilofue.TwoDSubduction as TwoDSubduction
+from shilofue.Utilities import ggr2cart2
+
+'''
+Benchmark of generating particles in the slab, compare SLAB_PARTICLES with
+the loop over particles used before, and the time to write particle files.
+ASPECT_LAB_DIR needs to be set for importing shilofue.TwoDSubduction.
+example:
+    python -m benchmarks.bench_particles -p 1000000 -n 3
+'''
+
+
+def GenerateOld(_config):
+    '''
+    the way of generating particles before SLAB_PARTICLES
+    '''
+    slab_phi_c = _config.get("slab_phi_c", 0.628319)
+    R0 = _config.get("R0", 6.371e6)
+    Rc = _config.get("Rc", 4.0e5)
+    slab_to = _config.get("slab_to", 2.0e5)
+    depth_particle_in_slab = _config.get("depth_particle_in_slab", 100.0)
+    number_particle_in_slab = _config.get("number_particle_in_slab", 1000)
+    particle_data = np.zeros((number_particle_in_slab, 2))
+    phi_st = slab_phi_c + (2 * Rc * slab_to - slab_to**2.0)**0.5 / R0
+    for i in range(number_particle_in_slab):
+        phi = i * phi_st / number_particle_in_slab
+        if phi < slab_phi_c:
+            r = R0 - depth_particle_in_slab
+        else:
+            r = R0 + (Rc**2.0 - R0**2.0 * (phi - slab_phi_c)**2.0)**0.5  - Rc - depth_particle_in_slab
+        x, y = ggr2cart2(phi, r)
+        particle_data[i, 0] = x
+        particle_data[i, 1] = y
+    return particle_data
+
+
+def main():
+    '''
+    main function of this module
+    Inputs:
+        sys.arg[1:](str):
+            options
+    '''
+    parser = argparse.ArgumentParser(description='Benchmark of generating particles')
+    parser.add_argument('-p', '--particles', type=int,
+                        default=1000000,
+                        help='number of particles')
+    parser.add_argument('-n', '--number', type=int,
+                        default=3,
+                        help='number of repetitions')
+    parser.add_argument('-o', '--output_dir', type=str,
+                        default='.test',
+                        help='directory to write particle files to')
+    arg = parser.parse_args(sys.argv[1:])
+
+    _config = {'number_particle_in_slab': arg.particles}
+    # check the outputs are the same, up to the rounding of vectorized sin and cos
+    assert(np.allclose(GenerateOld(_config), TwoDSubduction.SLAB_PARTICLES(_config)(), rtol=1e-14, atol=0.0))
+    # the same number of particles, in 10 layers through the slab, spaced by arc length
+    _config_layers = {'number_particle_in_slab': arg.particles // 10, 'layers_particle_in_slab': 10,
+                      'thickness_particle_in_slab': 5e4, 'spacing_particle_in_slab': 'arc_length'}
+    # the same number of particles, in 10 rows in latitude in 3d
+    _config_3d = {'number_particle_in_slab': arg.particles // 10, 'number_particle_in_latitude': 10,
+                  'latitude_particle_in_slab': [-0.1, 0.1]}
+    if not os.path.isdir(arg.output_dir):
+        os.mkdir(arg.output_dir)
+    particle_data = TwoDSubduction.SLAB_PARTICLES(_config)()
+    methods = [
+        ('loop', lambda: GenerateOld(_config)),
+        ('SLAB_PARTICLES', lambda: TwoDSubduction.SLAB_PARTICLES(_config)()),
+        ('SLAB_PARTICLES, 10 layers', lambda: TwoDSubduction.SLAB_PARTICLES(_config_layers)()),
+        ('SLAB_PARTICLES, 3d', lambda: TwoDSubduction.SLAB_PARTICLES(_config_3d, dimension=3)()),
+        ('write ascii', lambda: Parse.WriteParticleFile(os.path.join(arg.output_dir, 'particle.dat'), particle_data)),
+        ('write binary', lambda: Parse.WriteParticleFile(os.path.join(arg.output_dir, 'particle.npy'),
+                                                         particle_data, binary=True))
+    ]
+    print("%d particles" % arg.particles)
+    print("%-30s %s" % ('method', 'time (s)'))
+    for _method, fun in methods:
+        _time = timeit.timeit(fun, number=arg.number) / arg.number
+        print("%-30s %.4e" % (_method, _time))
+
+
+# run script
+if __name__ == '__main__':
+    main()
@@ -2,16 +2,21 @@ import numpy
 import json
 import os
 import re
+import errno
+import bisect
 import filecmp
+import threading
+import concurrent.futures
 import shilofue.json
 import pdb
 import shilofue.Plot as Plot
+import shilofue.Parse as Parse
+import shilofue.SolverOutput as SolverOutput
 from matplotlib import pyplot as plt
 from matplotlib import cm
 from importlib import resources
-from shutil import copyfile
-from pathlib import Path
-from shilofue.Utilities import my_assert, re_neat_word, re_count_indent, touch
+from shutil import copyfile, copy2
+from shilofue.Utilities import my_assert, re_neat_word, re_count_indent, touch, FileFingerprint
 
 
 
@@ -137,14 +142,34 @@ class MKDOC():
         dir(str) - directory of case data
         imgs(list) - list of images
         new_files(dict) - name: new file
+        manifest(DOC_MANIFEST) - record of entries generated, None if not used
+        defer_nav(bool) - if True, changes to the nav are kept in mkdocs_nav
+            and written to mkdocs.yml by Flush
+        mkdocs_nav(MKDOCS_NAV) - nav of the mkdocs.yml file, None if not read yet. It is
+            read once and kept until Flush if defer_nav is True, otherwise during a call
+        workers(int) - number of threads to sync images with
+        file_index(dict) - indexes of img directories (see ReturnFileList), kept until
+            Flush if defer_nav is True, otherwise during a call
     '''
     def __init__(self, _odir, **kwargs):
         '''
         Inputs:
             _odir(str) - directory of mkdocs project
+            kwargs:
+                manifest(bool) - use a manifest of entries generated, so that an entry
+                                 is only updated when its sources are changed, default is False
+                defer_nav(bool) - write changes to the nav once by Flush, default is False
+                workers(int) - number of threads to sync images with, default is 1
         '''
         self.odir = _odir
         self.new_files = {}
+        self.manifest = DOC_MANIFEST(_odir) if kwargs.get('manifest', False) else None
+        self.defer_nav = kwargs.get('defer_nav', False)
+        self.mkdocs_nav = None
+        self.workers = kwargs.get('workers', 1)
+        self.file_index = {}
+        my_assert(type(self.workers) == int and self.workers >= 1, ValueError,
+                  'MKDOC: workers must be a positive int')
 
     def AttachImage(self, _img):
         '''
@@ -169,6 +194,9 @@ class MKDOC():
                 extra_images(list) - names of extra images to append
         '''
         self.new_files = {}
+        if not self.defer_nav:
+            self.file_index = {}
+            self.mkdocs_nav = None
         self.imgs = kwargs.get('images', [])
         update = kwargs.get('update', False)
         append_prm = kwargs.get('append_prm', False)
@@ -200,8 +228,30 @@ class MKDOC():
         else:
             raise ValueError("Type must be 'case', 'group', 'analysis' ")
         if self.new_files != {}:
-            self.RenewMkdocsYml(_name)
-        
+            if self.defer_nav:
+                self.Nav().Merge({_name: self.new_files})
+            else:
+                self.RenewMkdocsYml(_name)
+
+    def Flush(self):
+        '''
+        Write changes to the nav to mkdocs.yml at once and save the manifest
+        '''
+        if self.mkdocs_nav is not None:
+            self.mkdocs_nav.Save()
+            # mkdocs.yml is read again in the next run
+            self.mkdocs_nav = None
+        if self.manifest is not None:
+            self.manifest.Save()
+        # images are found again in the next run
+        self.file_index = {}
+
+    def ManifestKey(self, _target_dir):
+        '''
+        Key of an entry in the manifest, path of the target directory relative to the docs directory
+        '''
+        return os.path.relpath(_target_dir, os.path.join(self.odir, 'docs'))
+
     def AppendCase(self, _name, _dir, _target_dir, **kwargs):
         '''
         Append a case to doc
@@ -218,23 +268,31 @@ class MKDOC():
         append_prm = kwargs.get('append_prm', False)
         _prm = kwargs.get('prm', 'case.prm')
         _base_name = kwargs.get('basename', None)
-        if not os.path.isdir(_target_dir):
-            os.mkdir(_target_dir)
         # get images
         _img_dir = os.path.join(_dir, 'img')
-        _imgs = ReturnFileList(_img_dir, self.imgs)
-        # create hard links in target_dir
+        _imgs = ReturnFileList(_img_dir, self.imgs, index=self.file_index)
         _target_img_dir = os.path.join(_target_dir, 'img')
+        # skip a case that is not changed since the last update
+        _use_manifest = (update and self.manifest is not None)
+        if _use_manifest:
+            _sources = [os.path.join(_dir, 'auto.md'), os.path.join(_dir, 'extra.md')]
+            _outputs = [os.path.join(_target_dir, 'summary.md')]
+            if append_prm:
+                _sources.append(os.path.join(_dir, _prm))
+                _outputs.append(os.path.join(_target_dir, _prm))
+            _sources += [os.path.join(_img_dir, _img) for _img in _imgs]
+            _outputs += [os.path.join(_target_img_dir, _img) for _img in _imgs]
+            _options = {'type': 'case', 'images': self.imgs, 'append_prm': append_prm, 'prm': _prm}
+            _key = self.ManifestKey(_target_dir)
+            if self.manifest.IsUpToDate(_key, _sources, _options, _outputs):
+                return
+        if not os.path.isdir(_target_dir):
+            os.mkdir(_target_dir)
+        # create hard links in target_dir
         if not os.path.isdir(_target_img_dir):
             os.mkdir(_target_img_dir)
-        for _img in _imgs:
-            _file = os.path.join(_img_dir, _img)
-            _target_file = os.path.join(_target_img_dir, _img)
-            if not os.path.isfile(_target_file):
-                os.link(_file, _target_file)
-            elif filecmp.cmp(_file, _target_file) is False:
-                os.remove(_target_file)
-                os.link(_file, _target_file)
+        SyncImages([(os.path.join(_img_dir, _img), os.path.join(_target_img_dir, _img)) for _img in _imgs],
+                   workers=self.workers)
         # Append a summary.md
         if os.path.isfile(os.path.join(_target_dir, 'summary.md')):
             if update == True:
@@ -273,6 +331,8 @@ class MKDOC():
                     except KeyError:
                         self.new_files[_name] = {}
                         self.new_files[_name]['Parameters'] = os.path.join(_base_name, _parameters)
+        if _use_manifest:
+            self.manifest.Record(_key, _sources, _options, _outputs)
     
     def AppendGroup(self, _name, _dir, _case_names, _target_dir, **kwargs):
         '''
@@ -293,7 +353,13 @@ class MKDOC():
         # Append a summary.md
         if os.path.isfile(os.path.join(_target_dir, 'summary.md')):
             if update == True:
-                self.GenerateGroupMkd(_dir, _target_dir, update=True)
+                _sources = [os.path.join(_dir, 'auto.md'), os.path.join(_dir, 'extra.md')]
+                _outputs = [os.path.join(_target_dir, 'summary.md')]
+                _key = self.ManifestKey(_target_dir)
+                if self.manifest is None or not self.manifest.IsUpToDate(_key, _sources, {'type': 'group'}, _outputs):
+                    self.GenerateGroupMkd(_dir, _target_dir, update=True)
+                    if self.manifest is not None:
+                        self.manifest.Record(_key, _sources, {'type': 'group'}, _outputs)
         else:
             _filename = self.GenerateGroupMkd(_dir, _target_dir)
             # in a mkdocs file, files are listed as 'name/_filename'
@@ -308,6 +374,9 @@ class MKDOC():
         # Inputs:
         #   extra_analysis(str): type of extra analysis
         #   kwargs(dict): dictionary of options
+        # Returns:
+        #   results(dict): results of extra analysis to put in the summary, keys are types of analysis
+        results = {}
         for key,value in extra_analysis.items():
             if key == 'machine_time':
                 # todo change to a class 
@@ -316,45 +385,48 @@ class MKDOC():
                 AnalyzeMachineTime(value)
             if key == 'newton_solver':
                 my_assert(type(value)==dict, TypeError, "AnalyzeExtra: settings to an option(a key in the analysis dict) must be a dict")
-                self.AnalyzeNewtonSolver(_project_dir, _case_dirs, _target_dir, value)
+                results[key] = self.AnalyzeNewtonSolver(_project_dir, _case_dirs, _target_dir, value)
+        return results
 
     
     def AnalyzeNewtonSolver(self, _project_dir, _case_dirs, _target_dir, kwargs):
         '''
-        generate a comparison of solver output
+        generate a comparison of solver output.
+        solver_output files of all cases are loaded into one table (see SolverOutput.LoadSolverOutputs),
+        statistics of all cases are computed at once and residuals are plotted in one figure.
+        Inputs:
+            kwargs(dict): options
+                max_iterations(int): maximum number of nonlinear iterations in a step, by default
+                    this is read from 'Max nonlinear iterations' in the case.prm file of every case
+        Returns:
+            _stats(dict): statistics of cases, see SolverOutput.NewtonSolverStats
         '''
-        # Instantiate an object for Solver output
-        NewtonSolver = Plot.NEWTON_SOLVER_PLOT('NewtonSolver')
-        
+        _n_cases = len(_case_dirs)
+        _files = [os.path.join(_project_dir, _dir, 'output', 'solver_output') for _dir in _case_dirs]
+        _data = SolverOutput.LoadSolverOutputs(_files)
+        max_iterations = kwargs.get('max_iterations', None)
+        if max_iterations is None:
+            max_iterations = [MaxNonlinearIterations(os.path.join(_project_dir, _dir, 'case.prm')) for _dir in _case_dirs]
+        _stats = SolverOutput.NewtonSolverStats(_data, _n_cases, max_iterations=max_iterations)
+
         # Initialize plot
         fig, ax = plt.subplots()
 
         # create a color table
-        normalizer = [float(i)/(len(_case_dirs)-1) for i in range(len(_case_dirs))]
+        normalizer = [float(i)/max(_n_cases-1, 1) for i in range(_n_cases)]
         colors = cm.rainbow(normalizer)
 
-        # loop for cases, read data and plot
-        for i in range(len(_case_dirs)):
-            _dir = _case_dirs[i]
-            _img_dir = os.path.join(_project_dir, _dir, 'img')
-            _output_dir = os.path.join(_project_dir, _dir, 'output')
-            solver_output_file = os.path.join(_output_dir, 'solver_output')
-            if os.path.isfile(solver_output_file):
-                NewtonSolver.ReadHeader(solver_output_file)  # inteprate header information
-        
-                # catch possible vacant file
-                state = NewtonSolver.ReadData(solver_output_file)  # read data
-                if state == 1:
-                    continue
-        
-                # manage output data for all steps
-                _data_list = NewtonSolver.ManageDataAll()
+        # plot residuals against the number of nonlinear iteration in every case
+        _bounds = SolverOutput.CaseBounds(_data, _n_cases)
+        _numbers = SolverOutput.NonlinearIterationNumbers(_data, _n_cases)
+        _residuals = _data[:, 3]
+        for i in range(_n_cases):
+            if _bounds[i] == _bounds[i+1]:
+                # no data in this case
+                continue
+            ax.semilogy(_numbers[_bounds[i]: _bounds[i+1]], _residuals[_bounds[i]: _bounds[i+1]], '.-',
+                        color=colors[i], label=_case_dirs[i])
 
-                # plot
-                options={'xname': 'Number_of_nonlinear_iteration', 'yname': 'Relative_nonlinear_residual', 'log_y': 1,
-                        'line': '.-', 'color': colors[i], 'label': _dir}
-                NewtonSolver.Plot(_data_list, ax, options)
-        
         # save figure
         _target_img_dir = os.path.join(_target_dir, 'img')
         fileout = os.path.join(_target_img_dir, 'NewtonSolverAnalysis.png')
@@ -362,7 +434,9 @@ class MKDOC():
         ax.legend()
         ax.set_title("Relative Nonlinear Residual")
         fig.savefig(fileout)
-    
+        plt.close(fig)
+        return _stats
+
     def AppendAnalysis(self, _name, _project_dir, _case_dirs, _target_dir, kwargs):
         '''
         Append a analysis to doc
@@ -372,17 +446,13 @@ class MKDOC():
             _target_dir(str): directory to put outputs
         '''
         update = kwargs.get('update', False)
+        extra_analysis = kwargs.get('extra_analysis', {})
+        my_assert(type(extra_analysis)==dict, TypeError, "AppendAnalysis: extra_analysis must be a dict")
 
-        # check on target directory 
-        if not os.path.isdir(_target_dir):
-            os.mkdir(_target_dir)
-        
-        # create hard link for images
         _target_img_dir = os.path.join(_target_dir, 'img')
-        if not os.path.isdir(_target_img_dir):
-            os.mkdir(_target_img_dir)
         # loop imgs first, so as to create a two-d list
         _imgs_list = []
+        _links = []  # (image, hard link in target_dir)
         for i in range(len(self.imgs)):
             _imgs_list.append([])
         # _imgs_list = [[]]*len(self.imgs)
@@ -390,34 +460,59 @@ class MKDOC():
             img = self.imgs[i]
             for _dir in _case_dirs:
                 _img_dir = os.path.join(_project_dir, _dir, 'img')
-                _imgs = ReturnFileList(_img_dir, [img])
+                _imgs = ReturnFileList(_img_dir, [img], index=self.file_index)
                 # transfer _dir to a name to append
                 _dir_transfered = re.sub(os.sep, '-', _dir)
                 #_dir_transfered = os.path.basename(_dir)
-                # create hard links in target_dir
                 for _img in _imgs:
                     _file = os.path.join(_img_dir, _img)
                     _target_file = os.path.join(_target_img_dir, "%s_%s" %(_dir_transfered, _img))
-                    if not os.path.isfile(_target_file):
-                        os.link(_file, _target_file)
-                    elif filecmp.cmp(_file, _target_file) is False:
-                        os.remove(_target_file)
-                        os.link(_file, _target_file)
+                    _links.append((_file, _target_file))
                     _imgs_list[i].append(_target_file)
 
+        # skip an analysis that is not changed since the last update
+        _use_manifest = (update and self.manifest is not None)
+        if _use_manifest:
+            _sources = [_file for _file, _ in _links]
+            _outputs = [os.path.join(_target_dir, 'summary.md')] + [_target_file for _, _target_file in _links]
+            for _dir in _case_dirs:
+                _output_dir = os.path.join(_project_dir, _dir, 'output')
+                if 'machine_time' in extra_analysis:
+                    _sources.append(os.path.join(_output_dir, 'machine_time'))
+                if 'newton_solver' in extra_analysis:
+                    _sources.append(os.path.join(_output_dir, 'solver_output'))
+                    _sources.append(os.path.join(_project_dir, _dir, 'case.prm'))
+            if 'machine_time' in extra_analysis:
+                _outputs.append(os.path.join(_target_img_dir, 'MachineTimeAnalysis.png'))
+            if 'newton_solver' in extra_analysis:
+                _outputs.append(os.path.join(_target_img_dir, 'NewtonSolverAnalysis.png'))
+            _options = {'type': 'analysis', 'images': self.imgs, 'case_dirs': _case_dirs, 'extra_analysis': extra_analysis}
+            _key = self.ManifestKey(_target_dir)
+            if self.manifest.IsUpToDate(_key, _sources, _options, _outputs):
+                return
+
+        # check on target directory 
+        if not os.path.isdir(_target_dir):
+            os.mkdir(_target_dir)
+        
+        # create hard link for images
+        if not os.path.isdir(_target_img_dir):
+            os.mkdir(_target_img_dir)
+        SyncImages(_links, workers=self.workers)
+
         # deal with extra analysis
-        extra_analysis = kwargs.get('extra_analysis', {})
-        my_assert(type(extra_analysis)==dict, TypeError, "AppendAnalysis: extra_analysis must be a dict")
-        self.AnalyzeExtra(_name, _project_dir, _case_dirs, _target_dir, extra_analysis, kwargs)
+        extra_results = self.AnalyzeExtra(_name, _project_dir, _case_dirs, _target_dir, extra_analysis, kwargs)
         
         # Append a summary.md
         # append image information
         _base_name = kwargs.get('basename', None)
         if os.path.isfile(os.path.join(_target_dir, 'summary.md')):
             if update == True:
-                _filename = self.GenerateAnalysisMkd(_target_dir, _case_dirs, images=_imgs_list, extra_analysis=extra_analysis)
+                _filename = self.GenerateAnalysisMkd(_target_dir, _case_dirs, images=_imgs_list, extra_analysis=extra_analysis,
+                                                     extra_results=extra_results)
         else:
-            _filename = self.GenerateAnalysisMkd(_target_dir, _case_dirs, images=_imgs_list, extra_analysis=extra_analysis)
+            _filename = self.GenerateAnalysisMkd(_target_dir, _case_dirs, images=_imgs_list, extra_analysis=extra_analysis,
+                                                 extra_results=extra_results)
             # in a mkdocs file, files are listed as 'name/_filename'
             _summary = os.path.join(_name, os.path.basename(_filename))
             if _base_name is None:
@@ -425,7 +520,8 @@ class MKDOC():
             else:
                 # a subcase of a group
                 self.new_files[_name]['Summary'] = os.path.join(_base_name, _summary)
-        pass
+        if _use_manifest:
+            self.manifest.Record(_key, _sources, _options, _outputs)
 
     def GenerateCaseMkd(self, _dir, _target_dir, **kwargs):
         '''
@@ -521,6 +617,7 @@ class MKDOC():
             _target_dir(str): directory of this case
             kwargs:
                 filename(str): name of the file
+                extra_results(dict): results of extra analysis, from AnalyzeExtra
         Returns:
             _filename(str): file generated
         '''
@@ -563,6 +660,9 @@ class MKDOC():
             if key == 'newton_solver':
                 contents += 'Here we show solver output for each case\n'
                 contents += '%s\n\n' % ConvertMediaMKD("NewtonSolverAnalysis.png", "img/NewtonSolverAnalysis.png")
+                _stats = kwargs.get('extra_results', {}).get(key, None)
+                if _stats is not None:
+                    contents += NewtonSolverTableMKD(_case_dirs, _stats)
 
         # write
         with open(_filename, 'w') as fout:
@@ -572,44 +672,201 @@ class MKDOC():
         return _filename
         
 
+    def Nav(self):
+        '''
+        Nav of the mkdocs.yml file in the project directory, the file is read at the first call
+        Returns:
+            mkdocs_nav(MKDOCS_NAV)
+        '''
+        if self.mkdocs_nav is None:
+            self.mkdocs_nav = MKDOCS_NAV(os.path.join(self.odir, 'mkdocs.yml'))
+        return self.mkdocs_nav
+
     def RenewMkdocsYml(self, _name):
         '''
         Renew the mkdocs.yml file in the project directory
         '''
-        _filename = os.path.join(self.odir, 'mkdocs.yml')
-        _start = None
-        _end = None
+        _nav = self.Nav()
+        _nav.Merge({_name: self.new_files})
+        _nav.Save()
+
+
+class MKDOCS_NAV():
+    '''
+    MKDOCS_NAV():
+    The nav part of a mkdocs.yml file. The file is read once, changes are merged
+    into the nav in memory and the file is written once by Save.
+    Contents before and after the nav part are kept as they are.
+
+    Attributes:
+        filename(str): the mkdocs.yml file
+        head(list of str): lines before entries of the nav, the 'nav:' line included
+        tail(list of str): lines after entries of the nav
+        nav(dict): entries of the nav
+        now(int): indent of entries at the top level
+        is_changed(bool): if there are changes not saved
+    '''
+    def __init__(self, _filename):
+        '''
+        Inputs:
+            _filename(str): the mkdocs.yml file
+        '''
+        self.filename = _filename
         with open(_filename, 'r') as fin:
-            # read in the old file
-            _lines = fin.read().split('\n')
+            _lines = fin.read().splitlines()
+        _start = None
         for i in range(len(_lines)):
-            # read in the nav part
-            _line = _lines[i]
-            if _start is None and re.match('^nav', _line):
+            if re.match('^nav', _lines[i]):
                 _start = i + 1
                 _previous_indent = re_count_indent(_lines[i])
-                _indent = re_count_indent(_lines[i+1])
-            elif _start is not None and re_count_indent(_line) == _previous_indent:
-                _end = i
                 break
-        my_assert(_start is not None and _end is not None, TypeError, 'Cannot find start and end of the nav part')
-        _nav_dict, _temp= ExtractNav(_lines[_start: _end], previous=_indent)
-        assert(_temp == _end - _start - 1)
-        try:
-            # this case is already in the nav part of the yml file
-            value = _nav_dict[_name]
-            my_assert(type(value) == dict, TypeError,
-                      'entry for a case must be a single dict, prepared to include dictionary in the future')
-            _nav_dict[_name] = {**value, **self.new_files}  # merge and substitute value in first dict with value in second dict
-        except KeyError:
-            # this case is new to the yml file
-            _nav_dict[_name] = self.new_files
-        _new_lines = _lines[0: _start]
-        _new_lines += ProduceNav(_nav_dict)
-        _new_lines += _lines[_end: -1]
-        with open(_filename, 'w') as fout:
-            for _line in _new_lines:
-                fout.write(_line + '\n')
+        my_assert(_start is not None, TypeError, 'Cannot find the nav part in %s' % _filename)
+        # the nav part ends at the first line that is not indented further than 'nav:',
+        # vacant lines at its end are left to the contents after it
+        _end = _start
+        for i in range(_start, len(_lines)):
+            if _lines[i].strip() == '':
+                continue
+            if re_count_indent(_lines[i]) <= _previous_indent:
+                break
+            _end = i + 1
+        _nav_lines = [_line for _line in _lines[_start: _end] if _line.strip() != '']
+        my_assert(len(_nav_lines) > 0, TypeError, 'Cannot find entries of the nav part in %s' % _filename)
+        self.now = re_count_indent(_nav_lines[0])
+        self.nav, _temp = ExtractNav(_nav_lines, previous=self.now)
+        my_assert(_temp == len(_nav_lines) - 1, ValueError,
+                  'Entries of the nav part in %s are not all at or below the level of the first one' % _filename)
+        self.head = _lines[0: _start]
+        self.tail = _lines[_end:]
+        self.is_changed = False
+
+    def Merge(self, _entries):
+        '''
+        Merge entries into the nav
+        Inputs:
+            _entries(dict): name: new files, values in an existing entry are substituted
+        '''
+        for _name, _new_files in _entries.items():
+            try:
+                # this case is already in the nav part of the yml file
+                value = self.nav[_name]
+                my_assert(type(value) == dict, TypeError,
+                          'entry for a case must be a single dict, prepared to include dictionary in the future')
+                self.nav[_name] = {**value, **_new_files}  # merge and substitute value in first dict with value in second dict
+            except KeyError:
+                # this case is new to the yml file
+                self.nav[_name] = _new_files
+            self.is_changed = True
+
+    def Lines(self):
+        '''
+        Returns:
+            lines(list of str): lines of the mkdocs.yml file with the nav
+        '''
+        return self.head + ProduceNav(self.nav, now=self.now) + self.tail
+
+    def Save(self):
+        '''
+        Write the mkdocs.yml file if there are changes, the file is replaced atomically
+        '''
+        if not self.is_changed:
+            return
+        _temp_file = '%s.%d.tmp' % (self.filename, os.getpid())
+        with open(_temp_file, 'w') as fout:
+            fout.write(''.join([_line + '\n' for _line in self.Lines()]))
+        os.replace(_temp_file, self.filename)
+        self.is_changed = False
+
+
+class DOC_MANIFEST():
+    '''
+    DOC_MANIFEST():
+    A manifest of entries generated for a mkdocs project, saved in the project directory
+    as '.doc_manifest.json'. For every entry (a case, a group or an analysis), fingerprints
+    of source files, a hash of options and files generated are recorded, thus an entry
+    is only generated again when its sources or options are changed.
+
+    Attributes:
+        odir(str): directory of mkdocs project
+        filename(str): file of this manifest
+        entries(dict): records of entries, keys are paths relative to the docs directory
+    '''
+    def __init__(self, _odir):
+        '''
+        Inputs:
+            _odir(str): directory of mkdocs project
+        '''
+        self.odir = _odir
+        self.filename = os.path.join(_odir, '.doc_manifest.json')
+        self.entries = {}
+        if os.path.isfile(self.filename):
+            try:
+                with open(self.filename, 'r') as fin:
+                    self.entries = json.load(fin)
+            except ValueError:
+                # a broken manifest, start over
+                self.entries = {}
+
+    def IsUpToDate(self, _key, _sources, _options, _outputs):
+        '''
+        Inputs:
+            _key(str): key of the entry
+            _sources(list of str): source files, files that don't exist are ignored
+            _options(dict): options of generating
+            _outputs(list of str): files generated
+        Returns:
+            True if files generated all exist, and sources and options are the same
+            as when they were generated
+        '''
+        _record = self.entries.get(_key, None)
+        if _record is None or _record['options'] != Plot.OptionsHash(_options):
+            return False
+        for _output in _outputs:
+            if not os.path.isfile(_output):
+                return False
+        _old_sources = _record['sources']
+        _sources = [_source for _source in _sources if os.path.isfile(_source)]
+        if len(_sources) != len(_old_sources):
+            # a source is added or removed
+            return False
+        for _source in _sources:
+            _name = os.path.relpath(_source, self.odir)
+            _old = _old_sources.get(_name, None)
+            if _old is None:
+                return False
+            _new = FileFingerprint(_source, _old)
+            if _new['md5'] != _old['md5']:
+                return False
+            # contents are the same, only update the fingerprint
+            _old_sources[_name] = _new
+        return True
+
+    def Record(self, _key, _sources, _options, _outputs):
+        '''
+        Record an entry generated, the manifest is saved by Save
+        Inputs:
+            _key(str): key of the entry
+            _sources(list of str): source files, files that don't exist are ignored
+            _options(dict): options of generating
+            _outputs(list of str): files generated
+        '''
+        _old_sources = self.entries.get(_key, {}).get('sources', {})
+        _fingerprints = {}
+        for _source in _sources:
+            if os.path.isfile(_source):
+                _name = os.path.relpath(_source, self.odir)
+                _fingerprints[_name] = FileFingerprint(_source, _old_sources.get(_name, None))
+        self.entries[_key] = {'sources': _fingerprints, 'options': Plot.OptionsHash(_options),
+                              'outputs': [os.path.relpath(_output, self.odir) for _output in _outputs]}
+
+    def Save(self):
+        '''
+        Save the manifest, the file is replaced atomically
+        '''
+        _temp_file = '%s.%d.tmp' % (self.filename, os.getpid())
+        with open(_temp_file, 'w') as fout:
+            json.dump(self.entries, fout, indent=2)
+        os.replace(_temp_file, self.filename)
 
 
 class ANALYZEMACHINETIME():
@@ -701,6 +958,42 @@ class ANALYZEMACHINETIME():
             fig.savefig(fileout_pdf)
 
 
+def NewtonSolverTableMKD(_case_dirs, _stats):
+    '''
+    Generate a markdown table of statistics of the newton solver
+    Inputs:
+        _case_dirs(list): directory of cases
+        _stats(dict): statistics of cases, see SolverOutput.NewtonSolverStats
+    Returns:
+        _contents(str): contents of markdown file
+    '''
+    _contents = '| case | steps | iterations | iterations per step | max iterations in a step | reduction rate | steps at cap |\n'
+    _contents += '| --- | --- | --- | --- | --- | --- | --- |\n'
+    for i in range(len(_case_dirs)):
+        _values = [_stats['mean_iterations'][i], _stats['reduction_rate'][i], _stats['steps_at_cap'][i]]
+        _values = ['-' if numpy.isnan(_value) else '%.4g' % _value for _value in _values]
+        _contents += '| %s | %d | %d | %s | %d | %s | %s |\n' % (_case_dirs[i], _stats['steps'][i], _stats['iterations'][i],
+                                                             _values[0], _stats['max_iterations'][i], _values[1], _values[2])
+    _contents += '\n'
+    return _contents
+
+
+def MaxNonlinearIterations(_prm_file):
+    '''
+    Maximum number of nonlinear iterations in a step of a case
+    Inputs:
+        _prm_file(str): case.prm file of a case
+    Returns:
+        float, nan if this is not given in the file
+    '''
+    if not os.path.isfile(_prm_file):
+        return numpy.nan
+    try:
+        return float(Parse.ReadPrmFile(_prm_file)['Max nonlinear iterations'])
+    except (KeyError, ValueError):
+        return numpy.nan
+
+
 def ExtractNav(_lines, **kwargs):
     '''
     extract the nav message from plain text
@@ -779,48 +1072,146 @@ def SeparateNavPattern(_pattern):
 
 def UpdateProjectDoc(_project_dict, _project_dir, **kwargs):
     '''
-    Update doc for all cases in this project
+    Update doc for all cases in this project.
+    Cases, groups and analyses are recorded in a manifest (see DOC_MANIFEST), those not changed
+    since the last update are skipped, and changes to the nav are written to mkdocs.yml at once.
     Inputs:
         kwargs(dict): options
             analysis: a dictionary of tests
+            incremental(bool): only update entries that are changed, default is True
+            workers(int): number of threads to sync images with, default is 1
     '''
     _mkdocs = kwargs.get('mkdocs', 'mkdocs_project')
     _imgs = kwargs.get('images', [])
-    myMkdoc = MKDOC(os.path.join(_project_dir, _mkdocs))
+    incremental = kwargs.get('incremental', True)
+    workers = kwargs.get('workers', 1)
+    myMkdoc = MKDOC(os.path.join(_project_dir, _mkdocs), manifest=incremental, defer_nav=True, workers=workers)
 
-    # deal with case and group
-    for key, value in _project_dict.items():
-        if key == 'cases':
-            for _case in value:
-                myMkdoc(_case, os.path.join(_project_dir, _case), append_prm=True, update=True, images=_imgs)
-        else:
-            my_assert(type(value) == list and value != [], TypeError, 'Input group must have a \'case\' list and it cannot be []')
-            myMkdoc(key, os.path.join(_project_dir, key), append_prm=True, update=True, type='group', case_names=value, images=_imgs)
-    
-    # deal with analysis
-    analysis_dict = kwargs.get('analysis', {})
-    for key, value in analysis_dict.items():
-        case_dirs = value['case_dirs']
-        images = value.get('images', [])
-        extra_analysis = value.get('extra_analysis', {})
-        myMkdoc(key, _project_dir, append_prm=True, update=True, type='analysis', case_dirs=case_dirs, images=images, extra_analysis=extra_analysis)
+    try:
+        # deal with case and group
+        for key, value in _project_dict.items():
+            if key == 'cases':
+                for _case in value:
+                    myMkdoc(_case, os.path.join(_project_dir, _case), append_prm=True, update=True, images=_imgs)
+            else:
+                my_assert(type(value) == list and value != [], TypeError, 'Input group must have a \'case\' list and it cannot be []')
+                myMkdoc(key, os.path.join(_project_dir, key), append_prm=True, update=True, type='group', case_names=value, images=_imgs)
+
+        # deal with analysis
+        analysis_dict = kwargs.get('analysis', {})
+        for key, value in analysis_dict.items():
+            case_dirs = value['case_dirs']
+            images = value.get('images', [])
+            extra_analysis = value.get('extra_analysis', {})
+            myMkdoc(key, _project_dir, append_prm=True, update=True, type='analysis', case_dirs=case_dirs, images=images, extra_analysis=extra_analysis)
+    finally:
+        # entries generated before an error are still recorded
+        myMkdoc.Flush()
 
 
-def ReturnFileList(_dir, _names):
+def SyncImage(_file, _target_file):
+    '''
+    Make _target_file a hard link of _file, the link is only made again if the contents
+    differ. Whether they differ is decided by the inode first, then by size and mtime,
+    and the contents are compared only if these are not conclusive.
+    If a hard link cannot be made across file systems, the file is copied instead.
+    Inputs:
+        _file(str): image
+        _target_file(str): link in the docs
+    Returns:
+        True if _target_file is linked again
+    '''
+    _stat = os.stat(_file)
+    try:
+        _target_stat = os.stat(_target_file)
+    except FileNotFoundError:
+        _target_stat = None
+    if _target_stat is not None:
+        if (_stat.st_ino, _stat.st_dev) == (_target_stat.st_ino, _target_stat.st_dev):
+            # already a hard link of this file
+            return False
+        if _stat.st_size == _target_stat.st_size and \
+           (_stat.st_mtime_ns == _target_stat.st_mtime_ns or filecmp.cmp(_file, _target_file, shallow=False)):
+            # a copy with the same contents
+            return False
+    # link to a temporary file first, thus the target is replaced atomically
+    _temp_file = '%s.%d.%d.tmp' % (_target_file, os.getpid(), threading.get_ident())
+    try:
+        os.link(_file, _temp_file)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # on different file systems
+        copy2(_file, _temp_file)
+    os.replace(_temp_file, _target_file)
+    return True
+
+
+def SyncImages(_links, **kwargs):
+    '''
+    Sync images to the docs with SyncImage
+    Inputs:
+        _links(list of tuple): (image, link in the docs)
+        kwargs:
+            workers(int): number of threads to sync with, default is 1
+    Returns:
+        number of links made again
+    '''
+    workers = kwargs.get('workers', 1)
+    if workers == 1 or len(_links) <= 1:
+        return sum([SyncImage(_file, _target_file) for _file, _target_file in _links])
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(lambda _link: SyncImage(*_link), _links))
+
+
+def FileIndex(_dir):
+    '''
+    Index of files in a directory and its subdirectories, made by a single walk with os.scandir.
+    Links to directories are not followed.
+    Inputs:
+        _dir(str): target directory
+    Returns:
+        _index(list of str): sorted base names of files
+    '''
+    _index = []
+    _dirs = [_dir]
+    while len(_dirs) > 0:
+        with os.scandir(_dirs.pop()) as _entries:
+            for _entry in _entries:
+                if _entry.is_dir(follow_symlinks=False):
+                    _dirs.append(_entry.path)
+                elif _entry.is_file():
+                    _index.append(_entry.name)
+    _index.sort()
+    return _index
+
+
+def ReturnFileList(_dir, _names, **kwargs):
     '''
     match file starts with _name in a directory and return a list
     Inputs:
         _dir(str): target directory
         _names(list of str): names to match
+        kwargs:
+            index(dict): indexes of directories from FileIndex, an index is made once for a
+                directory and reused in later calls. By default, the directory is walked again.
+    Returns:
+        _files(list of str): base names of files, files matching a name are sorted
     '''
     if not os.path.isdir(_dir):
         return []
+    index = kwargs.get('index', None)
+    if index is None:
+        _index = FileIndex(_dir)
     else:
-        _files = []
-        for _name in _names:
-            _pathlist = Path(_dir).rglob(_name+'*')
-            for _path in _pathlist:
-                _base_name = os.path.basename(str(_path))
-                if os.path.isfile(str(_path)):
-                    _files.append(_base_name)
-        return _files
\ No newline at end of file
+        _index = index.get(_dir, None)
+        if _index is None:
+            _index = FileIndex(_dir)
+            index[_dir] = _index
+    _files = []
+    for _name in _names:
+        i = bisect.bisect_left(_index, _name)
+        while i < len(_index) and _index[i].startswith(_name):
+            _files.append(_index[i])
+            i += 1
+    return _files
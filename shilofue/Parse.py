@@ -3,10 +3,19 @@ import os
 import shutil
 import json
 import sys
+import time
+import types
+import pickle
+import hashlib
 import argparse
+import warnings
+import itertools
+import collections.abc
+import concurrent.futures
 import numpy as np
 import shilofue.Plot as Plot
-from shilofue.Utilities import my_assert, re_neat_word, WriteFileHeader
+import shilofue.ParticleOutput as ParticleOutput
+from shilofue.Utilities import my_assert, re_neat_word, WriteFileHeader, FileFingerprint, LoadTableCache, SaveTableCache
 
 '''
 For now, my strategy is first defining a method to parse inputs for every key word,
@@ -65,6 +74,85 @@ class COMPOSITION():
         return line
 
 
+class PRM_OVERLAY(collections.abc.MutableMapping):
+    '''
+    A copy-on-write view of a dictionary of parameters from a .prm file.
+    The base dictionary is shared and never changed, changes to this view
+    are saved as overrides. A subsection (dict in the base) is returned as
+    a view of its own when it is first accessed, thus only subsections
+    that are accessed take memory.
+    Attributes:
+        base(dict): base dictionary
+        overrides(dict): values changed, deleted keys are marked by PRM_OVERLAY.DELETED
+    '''
+    # mark of deleted keys
+    DELETED = object()
+
+    def __init__(self, _base):
+        '''
+        Inputs:
+            _base(dict): base dictionary
+        '''
+        self.base = _base
+        self.overrides = {}
+
+    def __getitem__(self, key):
+        try:
+            value = self.overrides[key]
+        except KeyError:
+            value = self.base[key]
+            if isinstance(value, collections.abc.Mapping):
+                # make a view of the subsection for changes to it
+                value = PRM_OVERLAY(value)
+                self.overrides[key] = value
+            return value
+        if value is PRM_OVERLAY.DELETED:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.overrides[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.overrides[key] = PRM_OVERLAY.DELETED
+
+    def __iter__(self):
+        # keys in the base come first, keep the order of the base
+        for key in self.base:
+            if self.overrides.get(key, None) is not PRM_OVERLAY.DELETED:
+                yield key
+        for key, value in self.overrides.items():
+            if key not in self.base and value is not PRM_OVERLAY.DELETED:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        try:
+            value = self.overrides[key]
+        except KeyError:
+            return key in self.base
+        return value is not PRM_OVERLAY.DELETED
+
+    def ToDict(self):
+        '''
+        Returns:
+            _odict(dict): the merged dictionary, as a new dict
+        '''
+        _odict = {}
+        for key in self:
+            value = self[key] if key in self.overrides else self.base[key]
+            if isinstance(value, PRM_OVERLAY):
+                value = value.ToDict()
+            elif isinstance(value, collections.abc.Mapping):
+                value = PRM_OVERLAY(value).ToDict()
+            _odict[key] = value
+        return _odict
+
+
 class CASE():
     '''
     class for a case
@@ -73,8 +161,9 @@ class CASE():
             list for name of variables to change
         values(list):
             list of value of variables to change
-        idict(dict):
-            dictionary of parameters
+        idict(PRM_OVERLAY):
+            dictionary of parameters, a copy-on-write view of the dictionary
+            to initiate from, which is shared by cases and not changed
         config(dict):
             dictionary of configuration for the parameters
         particle_data(list):
@@ -91,9 +180,9 @@ class CASE():
                 config: (dict) - a dictionary that contains the configuration
                 test: (dict) - a dictionary that contains the configuration to test
         '''
-        my_assert(type(_idict)==dict, TypeError, "First entry mush be a dictionary")
+        my_assert(isinstance(_idict, collections.abc.Mapping), TypeError, "First entry mush be a dictionary")
         self.case_name = ''
-        self.idict = _idict
+        self.idict = PRM_OVERLAY(_idict)
         self.config = kwargs.get('config', {})
         # configurations
         my_assert(type(self.config)==dict, TypeError, 'Config must be a dictionary')
@@ -161,19 +250,7 @@ class CASE():
         '''
         Output to a ascii file that contains Particle coordinates, containing the coordinates of each particle
         '''
-        # header information
-        _header = '# Ascii file for particle coordinates\n'
-        # output particle file
-        fout.write(_header)
-        for i in range(self.particle_data.shape[0]):
-            _string = ''
-            for j in range(self.particle_data.shape[1]):
-                if j == self.particle_data.shape[1] - 1:
-                    _string += '%.4e\n' % self.particle_data[i, j]
-                else:
-                    _string += '%.4e ' % self.particle_data[i, j]
-            fout.write(_string)
-        pass
+        WriteParticleAscii(fout, self.particle_data)
 
     def __call__(self, parse_operations, **kwargs):
         '''
@@ -185,6 +262,8 @@ class CASE():
                 dirname: (str) - output directory, in use with 'auto' method
                 basename: (str) - base for case name, in use with 'auto' method
                 filename: (str) - output file, in use with 'manual' method
+                particle_format: (str) - format of the particle file, 'ascii' (default) or 'binary',
+                    see WriteParticleFile
         '''
         # assign file name with a method defined
         _method = kwargs.get('method', 'auto')
@@ -209,31 +288,34 @@ class CASE():
             update_ = kwargs.get('update', 0)
             if not update_:
                 my_assert(os.path.isdir(_case_dir) is False, ValueError, 'Going to update a pr-exiting case, but update is not included in the option')
-            if not os.path.isdir(_case_dir):
-                os.mkdir(_case_dir)            
-
-            # write configs to _json
-            _json_outputs = {'basename': _basename, 'config': self.config, 'test': self.test, 'extra': _extra, 'extra_file': _extra_files}
-            _json_ofile = os.path.join(_case_dir, 'config.json')
-            with open(_json_ofile, 'w') as fout:
-                json.dump(_json_outputs, fout)
-
-            # At last, export a .prm file
-            _filename = os.path.join(_case_dir, 'case.prm')
-            with open(_filename, 'w') as fout:
-                ParseToDealiiInput(fout, self.idict)
-
-            # output particle data to an ascii file
-            if self.particle_data is not None:
-                _filename = os.path.join(_case_dir, 'particle.dat')
-                with open(_filename, 'w') as fout:
-                    self.output_particle_ascii(fout)
 
-            # also copy the extra files
-            if type(_extra_files) is str:
-                _extra_files = [_extra_files]
-            for _extra_file in _extra_files:
-                shutil.copy2(_extra_file, _case_dir)
+            # files are written to a temporary directory first and then moved into place,
+            # thus a failure doesn't leave a half-written case
+            _temp_dir = os.path.join(_dirname, '.%s.%d.tmp' % (self.case_name, os.getpid()))
+            if os.path.isdir(_temp_dir):
+                # left by a process killed before
+                shutil.rmtree(_temp_dir)
+            os.mkdir(_temp_dir)
+            try:
+                self.WriteFiles(_temp_dir, _basename, _extra, _extra_files,
+                                particle_format=kwargs.get('particle_format', 'ascii'))
+                if os.path.isdir(_case_dir):
+                    # update an existing case, replace files one by one,
+                    # files with the same contents are kept so that their mtime doesn't change
+                    for _name in os.listdir(_temp_dir):
+                        _temp_file = os.path.join(_temp_dir, _name)
+                        _case_file = os.path.join(_case_dir, _name)
+                        if SameContents(_temp_file, _case_file):
+                            os.remove(_temp_file)
+                        else:
+                            os.replace(_temp_file, _case_file)
+                    os.rmdir(_temp_dir)
+                else:
+                    # this fails if the case is created by another process in the mean time
+                    os.rename(_temp_dir, _case_dir)
+            except BaseException:
+                shutil.rmtree(_temp_dir, ignore_errors=True)
+                raise
 
         elif _method == 'manual':
             # export a .prm file
@@ -243,6 +325,45 @@ class CASE():
             pass
         return self.case_name
 
+    def WriteFiles(self, _case_dir, _basename, _extra, _extra_files, **kwargs):
+        '''
+        Write files of a case to a directory
+        Inputs:
+            _case_dir(str): directory to write to
+            _basename(str): base for case name
+            _extra(dict): extra configuration
+            _extra_files(str or list): extra files to copy
+            kwargs:
+                particle_format(str): format of the particle file, 'ascii' (default) or 'binary'
+        '''
+        particle_format = kwargs.get('particle_format', 'ascii')
+        my_assert(particle_format in ['ascii', 'binary'], ValueError,
+                  'CASE: particle_format must be \'ascii\' or \'binary\'')
+        # write configs to _json
+        _json_outputs = {'basename': _basename, 'config': self.config, 'test': self.test, 'extra': _extra, 'extra_file': _extra_files}
+        _json_ofile = os.path.join(_case_dir, 'config.json')
+        with open(_json_ofile, 'w') as fout:
+            json.dump(_json_outputs, fout)
+
+        # At last, export a .prm file
+        _filename = os.path.join(_case_dir, 'case.prm')
+        WriteDealiiInput(_filename, self.idict)
+
+        # output particle data to an ascii file, or a binary file
+        if self.particle_data is not None:
+            if particle_format == 'binary':
+                WriteParticleFile(os.path.join(_case_dir, 'particle.npy'), self.particle_data, binary=True)
+            else:
+                _filename = os.path.join(_case_dir, 'particle.dat')
+                with open(_filename, 'w') as fout:
+                    self.output_particle_ascii(fout)
+
+        # also copy the extra files
+        if type(_extra_files) is str:
+            _extra_files = [_extra_files]
+        for _extra_file in _extra_files:
+            shutil.copy2(_extra_file, _case_dir)
+
 
 def PatternFromStr(_str):
     '''
@@ -286,11 +407,16 @@ def PatternFromValue(_value):
 class GROUP_CASE():
     '''
     Class for a group of cases
+    Cases are created one at a time when the group is called,
+    thus a large group doesn't take memory for all of its cases.
     Attributes:
-        cases(list<class CASE>):
-            a list of cases
+        CASE_CLASS(class): class of cases
+        inputs(dict): inputs from a base input file
+        config_tests(GROUP_CASE_CONFIGS):
+            configurations and tests of cases
+        failures(dict): cases failed to create, values are error messages
     '''
-    def __init__(self, CASE_CLASS, _inputs, _json_inputs):
+    def __init__(self, CASE_CLASS, _inputs, _json_inputs, **kwargs):
         '''
         initiate from a dictionary
         Attribute:
@@ -298,15 +424,32 @@ class GROUP_CASE():
         Inputs:
             _inputs(dict): inputs from a base input file
             _json_inputs(dict): inputs from a json file containing configurations
+            kwargs:
+                predicate(function): takes the config and the test of a case,
+                    a case is skipped if it returns False
         '''
-        self.cases = []  # initiate a list to save parsed cases
+        self.CASE_CLASS = CASE_CLASS
+        self.inputs = _inputs
         self.case_names = []
+        self.failures = {}
         self.configs = _json_inputs
-        self.config_tests = GetGroupCaseFromDict1(_json_inputs)  # Get a list for names and a list for parameters from a dictionary read from a json file
+        # a lazy sequence of configurations and tests from a dictionary read from a json file
+        self.config_tests = GROUP_CASE_CONFIGS(_json_inputs, predicate=kwargs.get('predicate', None))
+
+    def __len__(self):
+        '''
+        number of cases in this group
+        '''
+        return len(self.config_tests)
+
+    def Cases(self):
+        '''
+        A generator of cases in this group
+        Yields:
+            _case(CASE_CLASS)
+        '''
         for _config_test in self.config_tests:
-            _config = _config_test['config']
-            _test = _config_test.get('test', {})
-            self.cases.append(CASE_CLASS(_inputs, config=_config, test=_test))
+            yield self.CASE_CLASS(self.inputs, config=_config_test['config'], test=_config_test['test'])
 
     def get_case_names(self):
         '''
@@ -326,23 +469,103 @@ class GROUP_CASE():
                 extra(dict): extra configurations
                 operation(dict): operations to do
                 basename(str): base name for cases
+                workers(int): number of processes to create cases with, default is 1
+                particle_format(str): format of particle files, 'ascii' (default) or 'binary'
+        Returns:
+            case_names(list): names of cases created. Cases that failed are
+                recorded in self.failures and summarized in a warning
         '''
         _extra = kwargs.get('extra', {})
         _base_name = kwargs.get('basename', '')
+        workers = kwargs.get('workers', 1)
+        my_assert(type(workers) == int and workers >= 1, ValueError,
+                  'GROUP_CASE: workers must be a positive int')
         # write configs to _json
         _json_outputs = self.configs
-        _json_outputs['extra'] = _extra 
+        _json_outputs['extra'] = _extra
         _json_ofile = os.path.join(_odir, 'config.json')
         with open(_json_ofile, 'w') as fout:
             json.dump(_json_outputs, fout)
 
         # create cases in this group
         update_ = kwargs.get('update', 0)
-        for _case in self.cases:
-            _case_name = _case(parse_operations, dirname=_odir, extra=_extra, basename=_base_name, update=update_)
-            self.case_names.append(_case_name)
+        _case_kwargs = {'dirname': _odir, 'extra': _extra, 'basename': _base_name, 'update': update_,
+                        'particle_format': kwargs.get('particle_format', 'ascii')}
+        if workers == 1:
+            _results = (_TryCreateCase(_case, parse_operations, _case_kwargs) for _case in self.Cases())
+            self.CollectResults(_results)
+        else:
+            # cases are sent to processes by their configurations,
+            # the base inputs are only sent once to each process
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_InitGroupCaseWorker,
+                                                        initargs=(self.CASE_CLASS, self.inputs, parse_operations, _case_kwargs)) as executor:
+                self.CollectResults(executor.map(_TryCreateGroupCase, self.config_tests, chunksize=16))
         return self.case_names
 
+    def CollectResults(self, _results):
+        '''
+        Collect results of creating cases
+        Inputs:
+            _results(iterable): (case name, error message) of every case, error message is None
+                if the case is created
+        '''
+        self.failures = {}
+        for _case_name, _error in _results:
+            if _error is None:
+                self.case_names.append(_case_name)
+            else:
+                self.failures[_case_name] = _error
+        if len(self.failures) > 0:
+            _summary = '\n'.join(['%s: %s' % (_case_name, _error) for _case_name, _error in self.failures.items()])
+            warnings.warn('GROUP_CASE: failed to create %d cases\n%s' % (len(self.failures), _summary),
+                          GroupCaseWarning)
+
+
+class GroupCaseWarning(UserWarning):
+    # handle the circumstance that creating some cases in a group failed
+    pass
+
+
+# states of a process creating cases for a group, set by _InitGroupCaseWorker
+_group_case_worker = {}
+
+
+def _InitGroupCaseWorker(CASE_CLASS, _inputs, parse_operations, _case_kwargs):
+    '''
+    initiate a process for creating cases in a group
+    '''
+    _group_case_worker['CASE_CLASS'] = CASE_CLASS
+    _group_case_worker['inputs'] = _inputs
+    _group_case_worker['parse_operations'] = parse_operations
+    _group_case_worker['case_kwargs'] = _case_kwargs
+
+
+def _TryCreateGroupCase(_config_test):
+    '''
+    create a case from its configuration in a process initiated by _InitGroupCaseWorker
+    '''
+    _case = _group_case_worker['CASE_CLASS'](_group_case_worker['inputs'], config=_config_test['config'],
+                                             test=_config_test['test'])
+    return _TryCreateCase(_case, _group_case_worker['parse_operations'], _group_case_worker['case_kwargs'])
+
+
+def _TryCreateCase(_case, parse_operations, _case_kwargs):
+    '''
+    Create a case and catch the error
+    Returns:
+        _case_name(str): name of the case
+        _error(str): error message, None if there is no error
+    '''
+    try:
+        _case_name = _case(parse_operations, **_case_kwargs)
+    except Exception as e:
+        try:
+            _case_name = _case_kwargs.get('basename', '') + _case.CaseName()
+        except Exception:
+            _case_name = str({'config': _case.config, 'test': _case.test})
+        return _case_name, '%s: %s' % (type(e).__name__, str(e))
+    return _case_name, None
+
 
 class PARSE_OPERATIONS():
     """
@@ -604,8 +827,7 @@ class BASH_OPTIONS():
         prm_file = os.path.join(self._case_dir, 'case.prm')
         my_assert(os.access(prm_file, os.R_OK), FileNotFoundError,
                   'BASH_OPTIONS.__init__: case prm file - %s cannot be read' % prm_file)
-        with open(prm_file, 'r') as fin:
-            self.idict = ParseFromDealiiInput(fin)
+        self.idict = ReadPrmFile(prm_file, sidecar=True)
 
         # initiate a dictionary
         self.odict = {}
@@ -677,9 +899,24 @@ class VISIT_OPTIONS(BASH_OPTIONS):
         self.odict['ALL_AVAILABLE_PARTICLE_SNAPSHOTS'] = str(particle_snaps)
 
 
+def IsParticleOutput(filein):
+    """
+    Inputs:
+        filein(str or list): file input
+    Returns:
+        True if filein is particle output of aspect, i.e. a .vtu file, a .pvtu file
+        or a list of them (blocks of a snapshot in particles.visit). Positions
+        ('x', 'y', 'z') and point data (e.g. 'id') are then read directly, by names in the header
+    """
+    if type(filein) in [list, tuple]:
+        return True
+    return filein.endswith('.vtu') or filein.endswith('.pvtu')
+
+
 class VISIT_XYZ():
     """
-    Read .xyz file exported from visit and do analysis
+    Read .xyz file exported from visit and do analysis,
+    particle output of aspect could also be read directly, see IsParticleOutput
     Attributes:
         data(nparray): data
         header(dict): headers in file
@@ -702,13 +939,28 @@ class VISIT_XYZ():
         """
         read date form file
         Args:
-            filein(str): file input
+            filein(str or list): file input, a .xyz file exported from visit, or
+                particle output of aspect (see IsParticleOutput)
         """
+        if IsParticleOutput(filein):
+            self.Columns()
+            self.data = ParticleOutput.ParticleColumns(filein, list(self.header.keys()))
+            return
+
         # assert file
         my_assert(os.access(filein, os.R_OK), FileNotFoundError,
                   'VISIT_XYZ.__init__: visit xyz file - %s cannot be read' % filein)
 
-        # construct cols
+        # read data
+        self.data = np.loadtxt(filein, usecols=(self.Columns()), skiprows=2)
+
+    def Columns(self):
+        """
+        construct columns to read from the header, and record the index of every
+        column in self.data
+        Returns:
+            cols(list): columns in file
+        """
         cols = []
         i = 0
         for key, value in self.header.items():
@@ -716,9 +968,71 @@ class VISIT_XYZ():
             # record column in self.data
             self.column_indexes[key] = i
             i += 1
+        return cols
 
-        # read data
-        self.data = np.loadtxt(filein, usecols=(cols), skiprows=2)
+    def ReadSnapshots(self, filesin, **kwargs):
+        """
+        read data from files of a series of snapshots, data are stacked into
+        3d arrays of (snapshot, particle, column) and sorted by id if 'id' is in the header.
+        The order to sort with is reused for the next snapshot if ids are in the same order.
+        Args:
+            filesin(list): files input
+            kwargs:
+                chunk(int): maximum number of snapshots in a stack, this bounds the memory used.
+                    default is 64
+                cache(bool): use sidecar caches of data read, see LoadSnapshot. default is False
+        Returns:
+            generator of stacks, a new stack starts when the number of particles changes
+        """
+        chunk = kwargs.get('chunk', 64)
+        cache = kwargs.get('cache', False)
+        cols = self.Columns()
+        col_id = self.column_indexes.get('id', None)
+        _stack = []
+        _order = None
+        _sorted_ids = None
+        for filein in filesin:
+            _data = self.LoadSnapshot(filein, cols, cache)
+            if col_id is not None:
+                _ids = _data[:, col_id]
+                if _order is None or _ids.size != _order.size or not np.array_equal(_ids[_order], _sorted_ids):
+                    # sort by id
+                    _order = _ids.argsort()
+                    _sorted_ids = _ids[_order]
+                _data = _data[_order]
+            if len(_stack) > 0 and (len(_stack) == chunk or _stack[0].shape != _data.shape):
+                yield np.stack(_stack)
+                _stack = []
+            _stack.append(_data)
+        if len(_stack) > 0:
+            yield np.stack(_stack)
+
+    def LoadSnapshot(self, filein, cols, cache):
+        """
+        load columns of a file, from the sidecar cache if it is valid (see Utilities.LoadTableCache).
+        The columns loaded are recorded in the cache as a header line.
+        Args:
+            filein(str): file input
+            cols(list): columns in file
+            cache(bool): use the sidecar cache, the cache is saved after data is read
+        Returns:
+            _data(nparray): data of these columns
+        """
+        if IsParticleOutput(filein):
+            # columns are taken by keys in the header, binary data are decoded fast enough without a cache
+            return ParticleOutput.ParticleColumns(filein, list(self.header.keys()))
+        my_assert(os.access(filein, os.R_OK), FileNotFoundError,
+                  'VISIT_XYZ.LoadSnapshot: visit xyz file - %s cannot be read' % filein)
+        _header_lines = ['# columns: %s\n' % ' '.join([str(col) for col in cols])]
+        if cache:
+            _cache = LoadTableCache(filein)
+            if _cache is not None and _cache[0] == _header_lines:
+                return _cache[1]
+        _stat = os.stat(filein)
+        _data = np.loadtxt(filein, usecols=(cols), skiprows=2, ndmin=2)
+        if cache:
+            SaveTableCache(filein, _stat, _header_lines, _data)
+        return _data
 
     def Analyze(self, kwargs):
         """
@@ -726,6 +1040,17 @@ class VISIT_XYZ():
         """
         pass
 
+    def AnalyzeSnapshots(self, data, kwargs):
+        """
+        analyze data of a series of snapshots, to be reloaded in children
+        Args:
+            data(nparray): data stacked by snapshots, see ReadSnapshots
+            kwargs(dict): options, 'time' is an array of times of snapshots if present
+        Returns:
+            output data, one row per snapshot
+        """
+        return np.zeros((data.shape[0], 0))
+
     def Output(self, ofile):
         """
         output data
@@ -767,90 +1092,587 @@ class VISIT_XYZ():
         if ofile is not None:
             self.Output(ofile)
 
+    def Batch(self, filesin, **kwargs):
+        """
+        analyze files of a series of snapshots and output the results at once,
+        snapshots are read and analyzed in stacks, see ReadSnapshots
+        Args:
+            filesin(list): files input
+            kwarg(dict): options
+                header(dict): columns to import
+                times(list): times of snapshots
+                chunk(int): maximum number of snapshots in a stack
+                cache(bool): use sidecar caches of data read
+                ofile(str): file to output, an existing file is replaced
+        """
+        # options
+        default_header = {
+            'x': {'col': 1 },
+            'y': {'col': 2 },
+            'id': {'col': 3 }
+        }
+        self.header = kwargs.get("header", default_header)
+        times = kwargs.get('times', None)
+        _kwargs = {key: value for key, value in kwargs.items() if key not in ['times', 'ofile']}
+
+        # read and analyze
+        _outputs = []
+        i = 0
+        for data in self.ReadSnapshots(filesin, **kwargs):
+            if times is not None:
+                _kwargs['time'] = np.array(times[i: i + data.shape[0]])
+            _outputs.append(self.AnalyzeSnapshots(data, _kwargs))
+            i += data.shape[0]
+        if len(_outputs) > 0:
+            self.output_data = np.concatenate(_outputs)
+        else:
+            self.output_data = np.array([])
+
+        # output if file given
+        ofile = kwargs.get('ofile', None)
+        if ofile is not None:
+            if os.path.isfile(ofile):
+                os.remove(ofile)
+            self.Output(ofile)
+
 
 def ParseFromDealiiInput(fin):
     """
     ParseFromDealiiInput(fin)
 
     Parse Dealii input file to a python dictionary
+    The file is read in a single pass, lines are sorted out with string methods and
+    subsections are held in a stack, instead of calling this function recursively.
     """
     inputs = {}
-    line = fin.readline()
-    while line is not "":
+    _sections = []  # stack of (name, parent dictionary) for subsections
+    _lines = iter(fin)
+    for line in _lines:
         # Inputs formats are
         # comment: "# some comment"
         # start and end of new section:
         # "subsection name" and "end"
         # set variables values:
         # 'set key = val'
-        if re.match('^(\t| )*#', line):
+        _stripped = line.lstrip(' \t')
+        if _stripped.startswith('#'):
             # Skip comment lines, mark by '#' in file
-            pass
-        elif re.match('^(\t| )*set', line):
+            continue
+        elif _stripped.startswith('set'):
             # Parse key and value
             # from format in file as 'set key = val'
             # to a dictionary inputs
             # inputs[key] = val
-            temp = re.sub('^(\t| )*set ', '', line, count=1)
-            temp = temp.split('=', maxsplit=1)
-            key = temp[0]
-            key = re.sub('(\t| )*$', '', key)
-            # key = key.strip(' ')
-            value = temp[1]
-            value = re.sub('^ *', '', value)
-            value = re.sub(' *(#.*)?\n$', '', value)
-            while value[-1] == '\\':
-                # Deal with entries that extent to
-                # multiple lines
-                line = fin.readline()
-                line = re.sub(' *(#.*)?\n$', '', line)
-                value = value + '\n' + line
+            key, value, _ = ReadPrmEntry(_stripped, line, _lines)
             inputs[key] = value
-        elif re.match('^.*subsection', line):
+        elif 'subsection' in line:
             # Start a new subsection
-            # Initialize new dictionary and interatively call function,
-            key = re.sub('^.*subsection ', '', line)
-            key = key.strip('\n')
-            try:
-                # Fix the bug where a subsection emerges
-                # multiple times
-                inputs[key]
-            except KeyError:
-                inputs[key] = ParseFromDealiiInput(fin)
-            else:
-                temp = ParseFromDealiiInput(fin)
-                inputs[key].update(temp.items())
-        elif re.match('^.*end', line):
-            # Terminate and return, marked by 'end' in file
-            return inputs
-        line = fin.readline()
+            # the name follows the last 'subsection ' in the line
+            _index = line.rfind('subsection ')
+            key = line[_index + 11:] if _index >= 0 else line
+            _sections.append((key.strip('\n'), inputs))
+            inputs = {}
+        elif 'end' in line:
+            # Terminate a subsection, marked by 'end' in file
+            if len(_sections) == 0:
+                # an 'end' out of any subsection terminates the file
+                return inputs
+            inputs = _EndSubsection(_sections.pop(), inputs)
+    # subsections not terminated at the end of file
+    while len(_sections) > 0:
+        inputs = _EndSubsection(_sections.pop(), inputs)
     return inputs
 
 
-def ParseToDealiiInput(fout, outputs, layer=0):
+def ReadPrmEntry(_stripped, line, _lines):
+    """
+    Read an entry of 'set key = val' in a Dealii input file
+    Inputs:
+        _stripped(str): line with leading spaces stripped
+        line(str): line of the entry
+        _lines(iterator): lines in the file, lines after line are read for
+            entries that extent to multiple lines
+    Returns:
+        key(str): key
+        value(str): value
+        _raw_lines(list): lines of this entry in the file
+    """
+    temp = _stripped[4:] if _stripped.startswith('set ') else line
+    temp = temp.split('=', maxsplit=1)
+    key = temp[0].rstrip(' \t')
+    value = StripPrmValue(temp[1].lstrip(' '))
+    _raw_lines = [line]
+    while value.endswith('\\'):
+        # Deal with entries that extent to
+        # multiple lines
+        line = next(_lines, '')
+        _raw_lines.append(line)
+        value = value + '\n' + StripPrmValue(line)
+    return key, value, _raw_lines
+
+
+def StripPrmValue(value):
+    """
+    Strip a value in a Dealii input file of the comment and the new line character
+    Inputs:
+        value(str): value, or a line that continues a value
+    Returns:
+        value(str): stripped value
+    """
+    if not value.endswith('\n'):
+        # the last line of file, leave it be
+        return value
+    _index = value.find('#')
+    if _index < 0:
+        _index = len(value) - 1
+    return value[:_index].rstrip(' ')
+
+
+def _EndSubsection(_section, inputs):
+    """
+    Put a subsection to the dictionary it belongs to
+    Inputs:
+        _section(tuple): name of the subsection and the parent dictionary
+        inputs(dict): entries in this subsection
+    Returns:
+        the parent dictionary
+    """
+    key, _parent = _section
+    if key in _parent:
+        # Fix the bug where a subsection emerges
+        # multiple times
+        _parent[key].update(inputs.items())
+    else:
+        _parent[key] = inputs
+    return _parent
+
+
+def WriteParticleFile(filename, particle_data, **kwargs):
+    """
+    Write coordinates of particles to a file.
+    The ascii format is the one read by the 'ascii file' particle generator of aspect.
+    The binary format is a .npy file of float64, which is much faster to write and read
+    for millions of particles. It is not read by aspect, convert it to ascii before
+    running a case (see ConvertParticleFile).
+    Inputs:
+        filename(str): file to write to
+        particle_data(ndarray): coordinates of particles, one particle per row
+        kwargs:
+            binary(bool): write in the binary format, default is False
+    """
+    binary = kwargs.get('binary', False)
+    if binary:
+        np.save(filename, np.asarray(particle_data, dtype=np.float64), allow_pickle=False)
+    else:
+        with open(filename, 'w') as fout:
+            WriteParticleAscii(fout, particle_data)
+
+
+def WriteParticleAscii(fout, particle_data, **kwargs):
+    """
+    Write coordinates of particles in the ascii format.
+    Rows are formatted by chunks, with a single string formatting for each chunk,
+    which is several times faster than np.savetxt.
+    Inputs:
+        fout: a file object opened for writing
+        particle_data(ndarray): coordinates of particles, one particle per row
+        kwargs:
+            chunk(int): number of rows in a chunk, default is 10000
+    """
+    chunk = kwargs.get('chunk', 10000)
+    particle_data = np.asarray(particle_data)
+    # header information
+    fout.write('# Ascii file for particle coordinates\n')
+    _format = ' '.join(['%.4e'] * particle_data.shape[1]) + '\n'
+    for i in range(0, particle_data.shape[0], chunk):
+        _rows = particle_data[i: i + chunk]
+        fout.write((_format * _rows.shape[0]) % tuple(_rows.ravel().tolist()))
+
+
+def ReadParticleFile(filename):
+    """
+    Read coordinates of particles from a file written by WriteParticleFile
+    Inputs:
+        filename(str): a .npy file in the binary format, or an ascii file otherwise
+    Returns:
+        particle_data(ndarray): coordinates of particles, one particle per row
+    """
+    if filename.endswith('.npy'):
+        return np.load(filename, allow_pickle=False)
+    return np.loadtxt(filename, ndmin=2)
+
+
+def ConvertParticleFile(case_dir):
+    """
+    Write the ascii particle file read by aspect from the binary one ('particle.npy')
+    in a case directory. The ascii file is the 'Data file name' of the 'Ascii file'
+    particle generator in the case.prm file. It is only written if it doesn't exist or
+    is older than the binary file, and it is replaced atomically.
+    Inputs:
+        case_dir(str): directory of a case
+    Returns:
+        _filename(str): the ascii particle file, None if the case doesn't use
+            the ascii file generator or there is no binary file
+    """
+    _binary_file = os.path.join(case_dir, 'particle.npy')
+    _prm_file = os.path.join(case_dir, 'case.prm')
+    if not os.path.isfile(_binary_file) or not os.path.isfile(_prm_file):
+        return None
+    try:
+        _generator = ReadPrmFile(_prm_file)['Postprocess']['Particles']['Generator']['Ascii file']
+    except KeyError:
+        return None
+    _filename = os.path.join(case_dir, _generator.get('Data directory', './'),
+                             _generator.get('Data file name', 'particle.dat'))
+    if os.path.isfile(_filename) and os.path.getmtime(_filename) >= os.path.getmtime(_binary_file):
+        return _filename
+    _temp_file = '%s.%d.tmp' % (_filename, os.getpid())
+    WriteParticleFile(_temp_file, ReadParticleFile(_binary_file))
+    os.replace(_temp_file, _filename)
+    return _filename
+
+
+class PRM_CACHE():
+    """
+    A least recently used cache of parsed .prm files, keyed by the real path,
+    mtime and size of a file, thus a file is parsed again once it is changed.
+    Parsed files are returned as read-only views (see FreezePrm), so that entries
+    in the cache are not changed by their consumers.
+    Optionally, a parsed file is also saved to a pickle file next to it
+    ('.case.prm.cache.pkl' for 'case.prm'), which is reused by other processes.
+    Attributes:
+        maxsize(int): maximum number of files in the cache
+        entries(OrderedDict): parsed files, from the least to the most recently used
+    """
+    def __init__(self, **kwargs):
+        """
+        Inputs:
+            kwargs:
+                maxsize(int): maximum number of files in the cache, default is 64
+        """
+        self.maxsize = kwargs.get('maxsize', 64)
+        self.entries = collections.OrderedDict()
+
+    def __call__(self, prm_file, **kwargs):
+        """
+        Inputs:
+            prm_file(str): a .prm file
+            kwargs:
+                sidecar(bool): use a pickle file next to the .prm file, default is False
+        Returns:
+            _inputs(MappingProxyType): read-only view of the parsed file
+        """
+        sidecar = kwargs.get('sidecar', False)
+        _realpath = os.path.realpath(prm_file)
+        _stat = os.stat(_realpath)
+        _key = (_realpath, _stat.st_mtime_ns, _stat.st_size)
+        _inputs = self.entries.get(_key, None)
+        if _inputs is not None:
+            self.entries.move_to_end(_key)
+            return _inputs
+        if sidecar:
+            _inputs = LoadPrmCache(_realpath, _stat)
+        if _inputs is None:
+            with open(_realpath, 'r') as fin:
+                _inputs = ParseFromDealiiInput(fin)
+            if sidecar:
+                SavePrmCache(_realpath, _stat, _inputs)
+        _inputs = FreezePrm(_inputs)
+        self.entries[_key] = _inputs
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return _inputs
+
+
+# cache of parsed .prm files in this process
+_prm_cache = PRM_CACHE()
+
+
+def ReadPrmFile(prm_file, **kwargs):
+    """
+    Read a .prm file through the cache of this process.
+    The return value is read-only, initiate a PRM_OVERLAY with it to make changes
+    Inputs:
+        prm_file(str): a .prm file
+        kwargs:
+            sidecar(bool): use a pickle file next to the .prm file, default is False
+    Returns:
+        _inputs(MappingProxyType): read-only view of the parsed file
+    """
+    return _prm_cache(prm_file, **kwargs)
+
+
+def FreezePrm(_inputs):
+    """
+    Make a read-only view of a dictionary of parameters, subsections included
+    Inputs:
+        _inputs(dict): dictionary from ParseFromDealiiInput
+    Returns:
+        (MappingProxyType): read-only view
+    """
+    return types.MappingProxyType({key: (FreezePrm(value) if isinstance(value, dict) else value)
+                                   for key, value in _inputs.items()})
+
+
+def PrmCacheFile(prm_file):
+    """
+    Inputs:
+        prm_file(str): a .prm file
+    Returns:
+        name of the pickle file for prm_file
+    """
+    _dirname, _basename = os.path.split(prm_file)
+    return os.path.join(_dirname, '.%s.cache.pkl' % _basename)
+
+
+def LoadPrmCache(prm_file, _stat):
+    """
+    Load a parsed .prm file from its pickle file
+    Inputs:
+        prm_file(str): a .prm file
+        _stat(os.stat_result): stat of prm_file
+    Returns:
+        _inputs(dict): parsed file, None if the pickle file doesn't exist or is out of date
+    """
+    try:
+        with open(PrmCacheFile(prm_file), 'rb') as fin:
+            _cache = pickle.load(fin)
+        if _cache['mtime'] == _stat.st_mtime_ns and _cache['size'] == _stat.st_size:
+            return _cache['inputs']
+    except Exception:
+        # not exist or broken
+        pass
+    return None
+
+
+def SavePrmCache(prm_file, _stat, _inputs):
+    """
+    Save a parsed .prm file to its pickle file, the pickle file is replaced atomically,
+    and it is skipped if it cannot be written
+    Inputs:
+        prm_file(str): a .prm file
+        _stat(os.stat_result): stat of prm_file
+        _inputs(dict): parsed file
+    """
+    _cache_file = PrmCacheFile(prm_file)
+    _temp_file = '%s.%d.tmp' % (_cache_file, os.getpid())
+    try:
+        with open(_temp_file, 'wb') as fout:
+            pickle.dump({'mtime': _stat.st_mtime_ns, 'size': _stat.st_size, 'inputs': _inputs},
+                        fout, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(_temp_file, _cache_file)
+    except OSError:
+        pass
+
+
+def ParseToDealiiInput(fout, outputs, layer=0, **kwargs):
     """
     def ParseToDealiiInput(fout, outputs, layer=0)
 
     Parse a python dictionary into a Dealii input file
+    Contents are generated by DealiiInputText as a whole and written at once.
+    kwargs:
+        canonical(bool), template(str): see DealiiInputText
+    """
+    fout.write(DealiiInputText(outputs, layer=layer, **kwargs))
+
+
+def WriteDealiiInput(filename, outputs, **kwargs):
+    """
+    Write a python dictionary to a Dealii input file, the file is not written
+    if its contents are the same, so that its mtime is kept.
+    Inputs:
+        filename(str): file to write to
+        outputs(dict): dictionary of parameters
+        kwargs:
+            canonical(bool), template(str): see DealiiInputText
+    Returns:
+        True if the file is written
+    """
+    _contents = DealiiInputText(outputs, **kwargs).encode()
+    if os.path.isfile(filename) and os.path.getsize(filename) == len(_contents) and \
+       FileFingerprint(filename)['md5'] == hashlib.md5(_contents).hexdigest():
+        return False
+    with open(filename, 'wb') as fout:
+        fout.write(_contents)
+    return True
+
+
+def SameContents(_file0, _file1):
+    """
+    Inputs:
+        _file0(str), _file1(str): files to compare
+    Returns:
+        True if both files exist and have the same size and md5 hash
+    """
+    if not (os.path.isfile(_file0) and os.path.isfile(_file1)):
+        return False
+    if os.path.getsize(_file0) != os.path.getsize(_file1):
+        return False
+    return FileFingerprint(_file0)['md5'] == FileFingerprint(_file1)['md5']
+
+
+def DealiiInputText(outputs, **kwargs):
+    """
+    Generate contents of a Dealii input file from a python dictionary
+    Inputs:
+        outputs(dict): dictionary of parameters, values are str, int, float or dict
+        kwargs:
+            layer(int): layer of subsection to start with, default is 0
+            canonical(bool): write in a canonical form, default is False.
+                Entries are sorted, entries come before subsections in a subsection and
+                top-level subsections are separated by vacant lines. Contents written
+                are the same after a round trip with ParseFromDealiiInput.
+            template(str): contents of an original file. Comments and order of the original
+                file are kept, entries unchanged keep their original lines, entries
+                removed are dropped and entries added are appended to their subsections.
+    Returns:
+        _contents(str)
+    """
+    layer = kwargs.get('layer', 0)
+    canonical = kwargs.get('canonical', False)
+    template = kwargs.get('template', None)
+    _lines = []
+    if template is not None:
+        _TemplateLines(_lines, outputs, template)
+    elif canonical:
+        _CanonicalLines(_lines, outputs, layer)
+    else:
+        _DealiiInputLines(_lines, outputs, layer)
+    return ''.join(_lines)
+
+
+def _PrmValue(value):
+    """
+    Value of an entry as a str
+    """
+    if type(value) is str:
+        return value
+    elif type(value) in [int, float]:
+        return str(value)
+    raise ValueError('Value in dict must be str')
+
+
+def _DealiiInputLines(_lines, outputs, layer):
+    """
+    Append lines for a dictionary to _lines
     """
     indent = ' ' * 4 * layer  # Indentation of output
     for key, value in outputs.items():
         # output format is
         # same as input but no comment
-        if type(value) is str:
-            fout.write(indent + 'set %s = %s\n' % (key, value))
-        elif type(value) is dict:
+        if isinstance(value, collections.abc.Mapping):
+            # a dict or a PRM_OVERLAY
             if layer == 0:
-                fout.write('\n')
-            fout.write(indent + 'subsection %s\n' % key)
-            layer1 = layer + 1
-            ParseToDealiiInput(fout, value, layer1)
-            fout.write(indent + 'end\n')
+                _lines.append('\n')
+            _lines.append(indent + 'subsection %s\n' % key)
+            _DealiiInputLines(_lines, value, layer + 1)
+            _lines.append(indent + 'end\n')
             if layer == 0:
-                fout.write('\n')
+                _lines.append('\n')
+        else:
+            _lines.append(indent + 'set %s = %s\n' % (key, _PrmValue(value)))
+
+
+def _CanonicalLines(_lines, outputs, layer):
+    """
+    Append lines for a dictionary to _lines, in the canonical form
+    """
+    indent = ' ' * 4 * layer  # Indentation of output
+    _subsections = []
+    for key, value in sorted(outputs.items(), key=lambda item: item[0]):
+        if isinstance(value, collections.abc.Mapping):
+            _subsections.append(key)
+            continue
+        value = _PrmValue(value)
+        my_assert(_IsRoundTrip(key, value), ValueError,
+                  'DealiiInputText: entry (%s, %s) cannot be written in the canonical form' % (key, value))
+        _lines.append(indent + 'set %s = %s\n' % (key, value))
+    for key in _subsections:
+        if layer == 0 and len(_lines) > 0:
+            _lines.append('\n')
+        _lines.append(indent + 'subsection %s\n' % key)
+        _CanonicalLines(_lines, outputs[key], layer + 1)
+        _lines.append(indent + 'end\n')
+
+
+def _IsRoundTrip(key, value):
+    """
+    Check that an entry is read back the same by ParseFromDealiiInput
+    """
+    if key != key.strip() or '=' in key or '#' in key or '\n' in key:
+        return False
+    _parts = value.split('\n')
+    if _parts[0] != _parts[0].lstrip(' '):
+        return False
+    for i, _part in enumerate(_parts):
+        if '#' in _part or _part != _part.rstrip(' '):
+            return False
+        # only the last line doesn't continue
+        if _part.endswith('\\') != (i < len(_parts) - 1):
+            return False
+    return True
+
+
+def _TemplateLines(_lines, outputs, template):
+    """
+    Append lines for a dictionary to _lines, following a template.
+    Lines are sorted out the same way as in ParseFromDealiiInput.
+    """
+    _written = {}  # keys written, for every subsection
+    _ends = {}  # position in _lines to append new entries, for every subsection
+    _sections = [((), outputs)]  # stack of (path, dictionary) for subsections, dictionary is None if removed
+    _template_lines = iter(template.splitlines(keepends=True))
+    for line in _template_lines:
+        _path, _dict = _sections[-1]
+        _stripped = line.lstrip(' \t')
+        if _stripped.startswith('#') or not (_stripped.startswith('set') or 'subsection' in line or 'end' in line):
+            # comments and vacant lines
+            if _dict is not None:
+                _lines.append(line)
+        elif _stripped.startswith('set'):
+            key, value, _raw_lines = ReadPrmEntry(_stripped, line, _template_lines)
+            if _dict is None or key not in _dict or isinstance(_dict[key], collections.abc.Mapping):
+                # removed
+                continue
+            _new_value = _PrmValue(_dict[key])
+            if _new_value == value:
+                _lines += _raw_lines
+            else:
+                _lines.append(line[:len(line) - len(_stripped)] + 'set %s = %s\n' % (key, _new_value))
+            _written.setdefault(_path, set()).add(key)
+        elif 'subsection' in line:
+            _index = line.rfind('subsection ')
+            key = (line[_index + 11:] if _index >= 0 else line).strip('\n')
+            _sub_dict = None
+            if _dict is not None and isinstance(_dict.get(key, None), collections.abc.Mapping):
+                _sub_dict = _dict[key]
+                _lines.append(line)
+                _written.setdefault(_path, set()).add(key)
+            _sections.append((_path + (key,), _sub_dict))
         else:
-            raise ValueError('Value in dict must be str')
-    return
+            # end of a subsection
+            if len(_sections) == 1:
+                # an 'end' out of any subsection terminates the file
+                _ends[_path] = (len(_lines), _dict)
+                _lines.append(line)
+                break
+            if _dict is not None:
+                # new entries are appended to the last appearance of a subsection
+                _ends[_path] = (len(_lines), _dict)
+                _lines.append(line)
+            _sections.pop()
+    # subsections not terminated at the end of file
+    for _path, _dict in _sections:
+        if _dict is not None and (_path not in _ends or len(_path) > 0):
+            _ends[_path] = (len(_lines), _dict)
+    # append new entries, from the end of file
+    for _path, (_position, _dict) in sorted(_ends.items(), key=lambda item: item[1][0], reverse=True):
+        _written_keys = _written.get(_path, set())
+        _new_lines = []
+        _DealiiInputLines(_new_lines, {key: value for key, value in _dict.items() if key not in _written_keys},
+                          len(_path))
+        _lines[_position:_position] = _new_lines
 
 
 def GetGroupCaseFromDict(_idict):
@@ -897,55 +1719,67 @@ def GetGroupCaseFromDict1(_idict):
         _config_tests(dict of dict):
             list of configuretions and tests for cases
     '''
-    my_assert(type(_idict) == dict, TypeError, 'Input is not a dictionary')
-    _config_tests=[]
-    _configs = _idict['config']
-    _tests = _idict.get('test', {})
-    # get total number of cases
-    _total = 1
-    _totals = [1]
-    for key, value in sorted(_configs.items(), key=lambda item: item[0]):
-        # if re.match("sub_group", key):
-        #   continue
-        if type(value) == list:
-            _total *= len(value)
-        _totals.append(_total)
-    for key, value in sorted(_tests.items(), key=lambda item: item[0]):
-        if type(value) == list:
-            _total *= len(value)
-        _totals.append(_total)
-    # get case configuration and test
-    for j in range(_total):
-        # loop for every case
-        _config_test = {'config': {}, 'test': {}}  # initiate dict
-        i = 0  # current index of parameters
-        for key, value in sorted(_configs.items(), key=lambda item: item[0]):
-            # loop for configurations
-            # derive index number by mod
-            _ind = j
-            _ind = int(_ind // _totals[i])
-            try:
-                _ind = _ind % len(value)
-                # indexing by _ind and append value to key
-                _config_test['config'][key] = value[_ind]
-            except TypeError:
-                # only one value
-                _config_test['config'][key] = value
-            i += 1
-        for key, value in sorted(_tests.items(), key=lambda item: item[0]):
-            # loop for tests
-            _ind = j
-            _ind = int(_ind // _totals[i])
-            try:
-                _ind = _ind % len(value)
-                # indexing by _ind and append value to key
-                _config_test['test'][key] = value[_ind]
-            except TypeError:
+    return list(GROUP_CASE_CONFIGS(_idict))
+
+
+class GROUP_CASE_CONFIGS():
+    '''
+    A lazy sequence of configurations and tests for cases in a group,
+    from a dictionary read from a json file.
+    Every member of a list in 'config' or 'test' is taken in turn, keys are sorted by name,
+    the first key of 'config' changes the fastest and the last key of 'test' changes the slowest.
+    Combinations are generated one at a time with itertools.product.
+    Attributes:
+        keys(list of tuple): ('config' or 'test', key) for each parameter
+        values(list of list): values for each parameter
+        predicate(function): takes a config and a test, a combination is skipped
+            if it returns False
+    '''
+    def __init__(self, _idict, **kwargs):
+        '''
+        Inputs:
+            _idict(dict):
+                input dictionary
+            kwargs:
+                predicate(function): filter of combinations, default is None
+        '''
+        my_assert(type(_idict) == dict, TypeError, 'Input is not a dictionary')
+        self.predicate = kwargs.get('predicate', None)
+        self.keys = []
+        self.values = []
+        for _type, _dict in [('config', _idict['config']), ('test', _idict.get('test', {}))]:
+            for key, value in sorted(_dict.items(), key=lambda item: item[0]):
+                self.keys.append((_type, key))
                 # only one value
-                _config_test['test'][key] = value
-            i += 1
-        _config_tests.append(_config_test)
-    return _config_tests
+                self.values.append(value if type(value) == list else [value])
+        self._length = None
+
+    def __iter__(self):
+        '''
+        Yields:
+            _config_test(dict): {'config': config, 'test': test} for a case
+        '''
+        # itertools.product changes the last one the fastest, so it's called with
+        # reversed values and combinations are reversed back
+        for _combination in itertools.product(*reversed(self.values)):
+            _config_test = {'config': {}, 'test': {}}
+            for (_type, key), value in zip(self.keys, reversed(_combination)):
+                _config_test[_type][key] = value
+            if self.predicate is None or self.predicate(_config_test['config'], _config_test['test']):
+                yield _config_test
+
+    def __len__(self):
+        '''
+        Number of combinations, with a predicate, combinations are counted once
+        '''
+        if self._length is None:
+            if self.predicate is None:
+                self._length = 1
+                for _values in self.values:
+                    self._length *= len(_values)
+            else:
+                self._length = sum(1 for _ in self)
+        return self._length
 
 
 def ExpandNamesParameters(_names, _parameters):
@@ -994,7 +1828,7 @@ def ChangeDiscValues(_idict, _names, _values):
         _values(list):
             list of values of variables
     '''
-    my_assert(type(_idict) == dict, TypeError, 'First Entry needs to be a dict')
+    my_assert(isinstance(_idict, collections.abc.MutableMapping), TypeError, 'First Entry needs to be a dict')
     my_assert(type(_names) == list, TypeError, 'Second Entry needs to be a list')
     my_assert(type(_values) == list, TypeError, 'Third Entry needs to be a list')
     my_assert(len(_names) == len(_values), ValueError, 'Length of second and third entries must match')
@@ -1124,26 +1958,21 @@ def UpdateProjectJson(_dir, **kwargs):
     _json = kwargs.get('json', 'project.json')
     _cases = []
     _groups = []
-    # walk through the directory and look for groups and cases
-    for _subname in os.listdir(_dir):
-        # loop in _dir
-        _fullsubname = os.path.join(_dir, _subname)
-        if os.path.isdir(_fullsubname):
-            if 'case.prm' in os.listdir(_fullsubname):
-                _cases.append(_subname)
-            else:
-                if 'config.json' in os.listdir(_fullsubname):
-                    _groups.append(_subname)
+    # look for groups and cases in the index of this project
+    _index = PROJECT_INDEX(_dir).Refresh(depth=2)
+    for _subname in _index.Node('')['subdirs']:
+        _node = _index.Node(_subname)
+        if _node['case']:
+            _cases.append(_subname)
+        elif _node['config']:
+            _groups.append(_subname)
     # construct a output dictionary
     _odict = {"cases": _cases}
     for _group in _groups:
-        _group_dir = os.path.join(_dir, _group)
         _sub_cases = []  # an array to hold names of sub-cases
-        for _subname in os.listdir(_group_dir):
-            _fullsubname = os.path.join(_group_dir, _subname)
-            if os.path.isdir(_fullsubname):
-                if 'case.prm' in os.listdir(_fullsubname):
-                    _sub_cases.append(_subname)
+        for _subname in _index.Node(_group)['subdirs']:
+            if _index.Node(os.path.join(_group, _subname))['case']:
+                _sub_cases.append(_subname)
         _odict[_group] = _sub_cases
     # output to a json file
     _json_file = os.path.join(_dir, _json)
@@ -1158,8 +1987,7 @@ def GetSnapsSteps(case_dir, type_='graphical'):
     prm_file = os.path.join(case_dir, 'case.prm')
     my_assert(os.access(prm_file, os.R_OK), FileNotFoundError,
               'case prm file - %s cannot be read' % prm_file)
-    with open(prm_file, 'r') as fin:
-        idict = ParseFromDealiiInput(fin)
+    idict = ReadPrmFile(prm_file, sidecar=True)
 
     # import statistics file
     Statistics = Plot.STATISTICS_PLOT('Statistics')
@@ -1167,7 +1995,7 @@ def GetSnapsSteps(case_dir, type_='graphical'):
     my_assert(os.access(statistic_file, os.R_OK), FileNotFoundError,
               'case statistic file - %s cannot be read' % prm_file)
     Statistics.ReadHeader(statistic_file)
-    Statistics.ReadData(statistic_file)
+    Statistics.ReadData(statistic_file, usecols=['Time', 'Time_step_number'])
     col_time = Statistics.header['Time']['col']
     
     # final time
@@ -1217,25 +2045,217 @@ def GetSnapsSteps(case_dir, type_='graphical'):
 
 def GetSubCases(_dir):
     '''
-    get cases in a folder
+    get cases in a folder, this folder and its sub-folders are looked up
+    in the index of this folder (see PROJECT_INDEX)
+    Returns:
+        case_dirs(list): absolute directories of cases, in the order of a walk
+            through sub-folders sorted by name
     '''
     my_assert(os.path.isdir(_dir), TypeError, "_dir must be a directory")
-    dir_abs = os.path.abspath(_dir)
+    _index = PROJECT_INDEX(_dir).Refresh()
+    return [_index.FullPath(_path) for _path in _index.Cases()]
 
-    # initiate
+
+def SearchGroupsCases(_dir):
+    '''
+    search for groups and cases in a directory, the same way as
+    the bash function search_for_groups_cases:
+        a case has both 'config.json' and 'case.prm', a group only has 'config.json'.
+        If _dir is a case, it is the only case returned, otherwise groups and cases
+        are looked for in _dir and cases are looked for in groups.
+    Inputs:
+        _dir(str): directory of a project, a group or a case
+    Returns:
+        group_dirs(list): directories of groups
+        case_dirs(list): directories of cases
+    '''
+    my_assert(os.path.isdir(_dir), TypeError, "_dir must be a directory")
+    _index = PROJECT_INDEX(_dir).Refresh(depth=2)
+    group_dirs = []
     case_dirs = []
 
-    # look for config.json and case.prm
-    if 'case.prm' in os.listdir(dir_abs):
-        case_dirs.append(dir_abs)
+    def _IsCase(_node):
+        return _node['case'] and _node['config']
+
+    def _IsGroup(_node):
+        return _node['config'] and not _node['case']
+
+    _root = _index.Node('')
+    if _IsCase(_root):
+        return group_dirs, [_dir]
+    if _IsGroup(_root):
+        group_dirs.append(_dir)
+    # there could be 3 layers at most
+    for _subname in _root['subdirs']:
+        _node = _index.Node(_subname)
+        if _IsCase(_node):
+            case_dirs.append(os.path.join(_dir, _subname))
+        elif _IsGroup(_node):
+            group_dirs.append(os.path.join(_dir, _subname))
+            for _sub_subname in _node['subdirs']:
+                if _IsCase(_index.Node(os.path.join(_subname, _sub_subname))):
+                    case_dirs.append(os.path.join(_dir, _subname, _sub_subname))
+    return group_dirs, case_dirs
+
+
+class PROJECT_INDEX():
+    '''
+    PROJECT_INDEX():
+    An index of directories in a project, built with one walk of os.scandir.
+    For every directory, its mtime, whether it has 'case.prm' and 'config.json'
+    and its sub-directories are recorded. The walk doesn't go into a case (a directory
+    with 'case.prm'), thus outputs of cases are never scanned. The index is saved
+    in the project as '.project_index.json', only if the directory is the root of
+    a project rather than a case or a group. When it is refreshed, only directories
+    whose mtime has changed are scanned again, others only take a stat call.
 
-    # loop in _dir and iteration
-    for _subname in os.listdir(dir_abs):
-        _fullsubname = os.path.join(dir_abs, _subname)
-        if os.path.isdir(_fullsubname):
-            case_dirs += GetSubCases(_fullsubname)
-    
-    return case_dirs
+    Attributes:
+        dir(str): absolute directory of the project
+        filename(str): file of the index
+        nodes(dict): records of directories, keys are paths relative to dir
+            ('' for dir itself), ordered as a walk through sub-directories
+            sorted by name
+    '''
+    # a directory modified within this time (in ns) may be modified again
+    # without a change of its mtime, it is always scanned again
+    racy_time = 2000000000
+
+    def __init__(self, _dir, **kwargs):
+        '''
+        Inputs:
+            _dir(str): directory of a project
+            kwargs:
+                index_file(str): file of the index, default is '.project_index.json' in _dir
+        '''
+        my_assert(os.path.isdir(_dir), TypeError, "PROJECT_INDEX: %s must be a directory" % _dir)
+        self.dir = os.path.abspath(_dir)
+        self.filename = kwargs.get('index_file', os.path.join(self.dir, '.project_index.json'))
+        self.nodes = {}
+        if os.path.isfile(self.filename):
+            try:
+                with open(self.filename, 'r') as fin:
+                    _index = json.load(fin)
+                if _index['dir'] == self.dir:
+                    self.nodes = _index['nodes']
+            except (ValueError, KeyError):
+                # a broken index, start over
+                self.nodes = {}
+
+    def Refresh(self, **kwargs):
+        '''
+        walk through the project and update the index, save the index if it is changed
+        Inputs:
+            kwargs:
+                depth(int): only walk to directories at this depth (the project is at 0),
+                    default is None, which means there is no limit. Deeper directories
+                    in the index are kept as they are.
+        Returns:
+            self
+        '''
+        depth = kwargs.get('depth', None)
+        _old_nodes = self.nodes
+        self.nodes = {}
+        _changed = False
+        _now = time.time_ns()
+        _stack = [('', 0)]
+        while len(_stack) > 0:
+            _path, _depth = _stack.pop()
+            try:
+                _mtime = os.stat(self.FullPath(_path)).st_mtime_ns
+            except OSError:
+                # removed during the walk
+                _changed = True
+                continue
+            _old_node = _old_nodes.get(_path, None)
+            _node = _old_node
+            if _node is None or _node['mtime'] != _mtime:
+                _node = self.ScanDir(_path)
+                _node['mtime'] = _mtime if _now - _mtime > self.racy_time else None
+                # the project directory is changed by saving the index itself, so a new
+                # mtime of it alone doesn't make the index changed
+                if _old_node is None or _path != '' or \
+                   any([_node[key] != _old_node[key] for key in ['case', 'config', 'subdirs']]):
+                    _changed = True
+            self.nodes[_path] = _node
+            if depth is not None and _depth >= depth:
+                continue
+            # push in reversed order, so that sub-directories are visited by name
+            for _subname in reversed(_node['subdirs']):
+                _stack.append((os.path.join(_path, _subname), _depth + 1))
+        if depth is not None:
+            # keep deeper directories that still belong to the project
+            for _path in sorted(_old_nodes.keys(), key=lambda _path: _path.count(os.sep)):
+                _parent, _name = os.path.split(_path)
+                if _path not in self.nodes and _parent in self.nodes and _name in self.nodes[_parent]['subdirs']:
+                    self.nodes[_path] = _old_nodes[_path]
+        if _changed or len(self.nodes) != len(_old_nodes):
+            _root = self.nodes.get('', None)
+            if _root is not None and not _root['case'] and not _root['config']:
+                self.Save()
+        return self
+
+    def ScanDir(self, _path):
+        '''
+        scan a directory, only names and types from os.scandir are used,
+        thus there is no extra call for every entry
+        Inputs:
+            _path(str): path relative to the project
+        Returns:
+            _node(dict): record of this directory, sub-directories of a case are not recorded
+        '''
+        _node = {'mtime': None, 'case': False, 'config': False, 'subdirs': []}
+        with os.scandir(self.FullPath(_path)) as _entries:
+            for _entry in _entries:
+                if _entry.name == 'case.prm':
+                    _node['case'] = True
+                elif _entry.name == 'config.json':
+                    _node['config'] = True
+                elif _entry.is_dir():
+                    _node['subdirs'].append(_entry.name)
+        if _node['case']:
+            # don't go into outputs of a case
+            _node['subdirs'] = []
+        _node['subdirs'].sort()
+        return _node
+
+    def Save(self):
+        '''
+        Save the index, the file is replaced atomically, as the index could be
+        refreshed by several processes at the same time.
+        An index that cannot be written is ignored.
+        '''
+        _temp_file = '%s.%d.tmp' % (self.filename, os.getpid())
+        try:
+            with open(_temp_file, 'w') as fout:
+                json.dump({'dir': self.dir, 'nodes': self.nodes}, fout)
+            os.replace(_temp_file, self.filename)
+        except OSError:
+            pass
+
+    def FullPath(self, _path):
+        '''
+        Inputs:
+            _path(str): path relative to the project
+        Returns:
+            absolute path
+        '''
+        return os.path.join(self.dir, _path) if _path != '' else self.dir
+
+    def Node(self, _path):
+        '''
+        Inputs:
+            _path(str): path relative to the project
+        Returns:
+            record of this directory
+        '''
+        return self.nodes[_path]
+
+    def Cases(self):
+        '''
+        Returns:
+            paths of cases (directories with 'case.prm') relative to the project
+        '''
+        return [_path for _path, _node in self.nodes.items() if _node['case']]
 
     
 def ParsePhaseInput(inputs):
@@ -1286,6 +2306,9 @@ def main():
     parser.add_argument('-j', '--json_file', type=str,
                         default='./config_case.json',
                         help='Filename for json file')
+    parser.add_argument('-i', '--inputs', type=str,
+                        default='.',
+                        help='A directory to look into')
     _options = []
     try:
         _options = sys.argv[2: ]
@@ -1312,6 +2335,27 @@ def main():
         # print the output 
         print(outputs)
 
+    elif _commend == 'search_groups_cases':
+        # print groups and cases, one in a line, used by the bash function search_for_groups_cases
+        # example:
+        #   python -m shilofue.Parse search_groups_cases -i ./TwoDSubduction
+        group_dirs, case_dirs = SearchGroupsCases(arg.inputs)
+        for _group_dir in group_dirs:
+            print('group %s' % _group_dir)
+        for _case_dir in case_dirs:
+            print('case %s' % _case_dir)
+
+    elif _commend == 'convert_particle_file':
+        # write the ascii particle file read by aspect from particle.npy, used before a case is run
+        # example:
+        #   python -m shilofue.Parse convert_particle_file -i ./foo
+        _filename = ConvertParticleFile(arg.inputs)
+        if _filename is not None:
+            print(_filename)
+
+    else:
+        raise ValueError('Commend %s is not available.' % _commend)
+
 # run script
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,355 @@
+import re
+import os
+import sys
+import zlib
+import base64
+import argparse
+import numpy as np
+import xml.etree.ElementTree as ET
+from shilofue.Utilities import my_assert
+
+'''
+Read particle output of aspect (particles.visit, .pvtu and .vtu files) directly,
+instead of exporting every snapshot to a .xyz file with visit and parsing the text.
+Positions and point data (e.g. 'id') are decoded from the xml, inline binary
+(base64, optionally compressed with zlib) and appended data of the .vtu files.
+'''
+
+# base64 text, which ends with the padding
+_BASE64_PATTERN = re.compile(rb'[A-Za-z0-9+/]*=*')
+
+# types of data arrays in vtk files
+VTK_TYPES = {
+    'Int8': 'i1', 'UInt8': 'u1', 'Int16': 'i2', 'UInt16': 'u2',
+    'Int32': 'i4', 'UInt32': 'u4', 'Int64': 'i8', 'UInt64': 'u8',
+    'Float32': 'f4', 'Float64': 'f8'
+}
+
+
+def ReadVisitRecord(filein):
+    '''
+    Read a .visit file (e.g. particles.visit) that lists output files of all snapshots
+    Inputs:
+        filein(str): a .visit file
+    Returns:
+        times(list): time of every snapshot, None if times are not given in the file
+        snapshots(list): files of every snapshot, with their directory
+    '''
+    my_assert(os.access(filein, os.R_OK), FileNotFoundError,
+              'ReadVisitRecord: visit file - %s cannot be read' % filein)
+    _dir = os.path.dirname(filein)
+    n_blocks = 1
+    times = []
+    _files = []
+    with open(filein, 'r') as fin:
+        for line in fin:
+            line = line.strip()
+            if line.startswith('!NBLOCKS'):
+                n_blocks = int(line.split()[1])
+            elif line.startswith('!TIME'):
+                times.append(float(line.split()[1]))
+            elif line != '':
+                _files.append(os.path.join(_dir, line))
+    snapshots = [_files[i: i + n_blocks] for i in range(0, len(_files), n_blocks)]
+    if len(times) != len(snapshots):
+        times = None
+    return times, snapshots
+
+
+def ReadPvtu(filein):
+    '''
+    Read a .pvtu file
+    Inputs:
+        filein(str): a .pvtu file
+    Returns:
+        _files(list): .vtu files of pieces, with their directory
+    '''
+    my_assert(os.access(filein, os.R_OK), FileNotFoundError,
+              'ReadPvtu: pvtu file - %s cannot be read' % filein)
+    _dir = os.path.dirname(filein)
+    _root = ET.parse(filein).getroot()
+    return [os.path.join(_dir, piece.get('Source')) for piece in _root.iter('Piece')]
+
+
+def VtuFiles(filein):
+    '''
+    .vtu files of a snapshot
+    Inputs:
+        filein(str or list): a .vtu file, a .pvtu file or a list of them
+    Returns:
+        _files(list): .vtu files
+    '''
+    if type(filein) in [list, tuple]:
+        return [_file for _filein in filein for _file in VtuFiles(_filein)]
+    if filein.endswith('.pvtu'):
+        return ReadPvtu(filein)
+    return [filein]
+
+
+def ReadVtu(filein, names=None):
+    '''
+    Read positions and point data from a .vtu file
+    Inputs:
+        filein(str): a .vtu file
+        names(list): names of point data to read, default is None, which means all point data
+    Returns:
+        _outputs(dict): 'position' (array of n_points x 3) and point data by names,
+            point data with multiple components are arrays of n_points x n_components
+    '''
+    my_assert(os.access(filein, os.R_OK), FileNotFoundError,
+              'ReadVtu: vtu file - %s cannot be read' % filein)
+    with open(filein, 'rb') as fin:
+        _contents = fin.read()
+    # appended data are raw bytes that can't be parsed as xml, cut them off first
+    _appended = None
+    _index = _contents.find(b'<AppendedData')
+    if _index >= 0:
+        _start = _contents.index(b'_', _contents.index(b'>', _index)) + 1
+        _end = _contents.rfind(b'</AppendedData>')
+        _appended = _contents[_start: _end]
+        _root = ET.fromstring(_contents[:_index] + b'</VTKFile>')
+        _encoding = ET.fromstring(_contents[_index: _start - 1] + b'</AppendedData>').get('encoding', 'raw')
+        if _encoding == 'base64':
+            _appended = _appended.strip()
+        else:
+            my_assert(_encoding == 'raw', ValueError, 'ReadVtu: unknown encoding %s in %s' % (_encoding, filein))
+    else:
+        _root = ET.fromstring(_contents)
+    # options of data arrays
+    _byte_order = '>' if _root.get('byte_order', 'LittleEndian') == 'BigEndian' else '<'
+    _options = {
+        'header': _byte_order + VTK_TYPES[_root.get('header_type', 'UInt32')],
+        'compressed': _root.get('compressor', None) is not None,
+        'byte_order': _byte_order,
+        'appended': _appended,
+        'encoding': _encoding if _appended is not None else None
+    }
+    my_assert(_root.get('compressor', 'vtkZLibDataCompressor') == 'vtkZLibDataCompressor', ValueError,
+              'ReadVtu: compressor %s in %s is not supported' % (_root.get('compressor'), filein))
+    _outputs = {}
+    _positions = []
+    _point_data = {}
+    for piece in _root.iter('Piece'):
+        n_points = int(piece.get('NumberOfPoints'))
+        _points = piece.find('Points')
+        _piece_data = piece.find('PointData')
+        if n_points == 0 or _points is None:
+            # deal.II writes an empty piece, without points, for a process that has no particles.
+            # nothing is decoded, arrays of zero length are given to point data
+            _positions.append(np.zeros((0, 3)))
+            _names = [data_array.get('Name') for data_array in (_piece_data if _piece_data is not None else [])]
+            for name in (names if names is not None else _names):
+                _point_data.setdefault(name, []).append(np.zeros(0))
+            continue
+        _positions.append(DecodeDataArray(_points.find('DataArray'), n_points, _options))
+        for data_array in (_piece_data if _piece_data is not None else []):
+            name = data_array.get('Name')
+            if names is None or name in names:
+                _point_data.setdefault(name, []).append(DecodeDataArray(data_array, n_points, _options))
+    _outputs['position'] = ConcatenateArrays(_positions) if len(_positions) > 0 else np.zeros((0, 3))
+    for name, _arrays in _point_data.items():
+        _outputs[name] = ConcatenateArrays(_arrays)
+    if names is not None:
+        for name in names:
+            my_assert(name in _outputs, KeyError, 'ReadVtu: point data %s is not in %s' % (name, filein))
+    return _outputs
+
+
+def DecodeDataArray(data_array, n_points, _options):
+    '''
+    Decode a DataArray element of a vtk file
+    Inputs:
+        data_array(Element): the DataArray element
+        n_points(int): number of points
+        _options(dict): options of the file, see ReadVtu
+    Returns:
+        _data(ndarray): 1d array for a single component, 2d array otherwise
+    '''
+    _dtype = np.dtype(_options['byte_order'] + VTK_TYPES[data_array.get('type')])
+    n_components = int(data_array.get('NumberOfComponents', '1'))
+    _format = data_array.get('format', 'ascii')
+    _text = (data_array.text or '').strip()
+    if _format in ['ascii', 'binary'] and _text == '':
+        # an empty element, e.g. <DataArray ...></DataArray> of an empty piece
+        _data = np.zeros(0, dtype=_dtype)
+    elif _format == 'ascii':
+        _data = np.array(_text.split(), dtype=_dtype)
+    elif _format == 'binary':
+        _data = np.frombuffer(DecodeBase64Block(_text.encode(), _options), dtype=_dtype)
+    elif _format == 'appended':
+        _offset = int(data_array.get('offset'))
+        if _options['encoding'] == 'base64':
+            _data = np.frombuffer(DecodeBase64Block(_options['appended'][_offset:], _options), dtype=_dtype)
+        else:
+            _data = np.frombuffer(DecodeRawBlock(_options['appended'], _offset, _options)[0], dtype=_dtype)
+    else:
+        raise ValueError('DecodeDataArray: unknown format %s' % _format)
+    my_assert(_data.size >= n_points * n_components, ValueError,
+              'DecodeDataArray: %s has %d values, %d are expected' % (data_array.get('Name'), _data.size, n_points * n_components))
+    _data = _data[: n_points * n_components]
+    if n_components > 1:
+        _data = _data.reshape((n_points, n_components))
+    return _data
+
+
+def DecodeRawBlock(_bytes, _offset, _options):
+    '''
+    Decode a block of raw bytes, which has a header before the data
+    Inputs:
+        _bytes(bytes): raw bytes
+        _offset(int): start of the block
+        _options(dict): options of the file, see ReadVtu
+    Returns:
+        _data(bytes): decoded data
+        _end(int): end of the block
+    '''
+    _header_dtype = np.dtype(_options['header'])
+    _size = _header_dtype.itemsize
+    if _options['compressed']:
+        # header of compressed data is:
+        # number of blocks, size of blocks, size of the last block, compressed sizes of blocks
+        n_blocks = int(np.frombuffer(_bytes, dtype=_header_dtype, count=1, offset=_offset)[0])
+        _header = np.frombuffer(_bytes, dtype=_header_dtype, count=3 + n_blocks, offset=_offset)
+        _start = _offset + (3 + n_blocks) * _size
+        _blocks = []
+        for _compressed_size in _header[3:]:
+            _blocks.append(zlib.decompress(_bytes[_start: _start + int(_compressed_size)]))
+            _start += int(_compressed_size)
+        return b''.join(_blocks), _start
+    n_bytes = int(np.frombuffer(_bytes, dtype=_header_dtype, count=1, offset=_offset)[0])
+    _start = _offset + _size
+    return _bytes[_start: _start + n_bytes], _start + n_bytes
+
+
+def DecodeBase64Block(_text, _options):
+    '''
+    Decode a block of base64 text, which has a header before the data.
+    The header and the data are either encoded together or encoded separately,
+    in the latter case, the header ends with padding.
+    Inputs:
+        _text(bytes): base64 text, starting from the block
+        _options(dict): options of the file, see ReadVtu
+    Returns:
+        _data(bytes): decoded data
+    '''
+    _header_dtype = np.dtype(_options['header'])
+    _size = _header_dtype.itemsize
+    # first value in the header
+    _length = 4 * (-(-_size // 3))
+    _first = int(np.frombuffer(base64.b64decode(_text[: _length])[: _size], dtype=_header_dtype)[0])
+    n_header = 3 + _first if _options['compressed'] else 1
+    _length = 4 * (-(-(n_header * _size) // 3))
+    if _text[_length - 1: _length] == b'=':
+        # encoded separately
+        _header = base64.b64decode(_text[: _length])
+        _body = base64.b64decode(_EndOfBase64(_text, _length))
+        return DecodeRawBlock(_header + _body, 0, _options)[0]
+    return DecodeRawBlock(base64.b64decode(_EndOfBase64(_text, 0)), 0, _options)[0]
+
+
+def _EndOfBase64(_text, _start):
+    '''
+    Cut base64 text starting from _start, at the end of encoded data
+    '''
+    return _text[_start: _BASE64_PATTERN.match(_text, _start).end()]
+
+
+def ReadParticles(filein, names=None):
+    '''
+    Read particles of a snapshot
+    Inputs:
+        filein(str or list): a .vtu file, a .pvtu file or a list of them (e.g. blocks of a
+            snapshot in particles.visit)
+        names(list): names of point data to read, default is None, which means all point data
+    Returns:
+        _outputs(dict): 'position' and point data of all pieces, see ReadVtu
+    '''
+    _pieces = [ReadVtu(_file, names=names) for _file in VtuFiles(filein)]
+    my_assert(len(_pieces) > 0, ValueError, 'ReadParticles: there is no vtu file in %s' % str(filein))
+    _outputs = {}
+    for _piece in _pieces:
+        for key in _piece:
+            _outputs.setdefault(key, []).append(_piece[key])
+    for key, _arrays in _outputs.items():
+        _outputs[key] = ConcatenateArrays(_arrays)
+    return _outputs
+
+
+def ConcatenateArrays(_arrays):
+    '''
+    Concatenate arrays of pieces, arrays of empty pieces are skipped
+    as their shapes don't have the number of components
+    Inputs:
+        _arrays(list): arrays of pieces
+    Returns:
+        _array(ndarray): concatenated array
+    '''
+    _nonempty = [_array for _array in _arrays if _array.size > 0]
+    return np.concatenate(_nonempty if len(_nonempty) > 0 else _arrays)
+
+
+def ParticleColumns(filein, keys):
+    '''
+    Read particles of a snapshot as columns, this is a replacement of the .xyz file
+    exported by visit
+    Inputs:
+        filein(str or list): see ReadParticles
+        keys(list): names of columns, 'x', 'y' and 'z' are components of the position,
+            others are names of point data
+    Returns:
+        _data(ndarray): n_particles x len(keys)
+    '''
+    _components = {'x': 0, 'y': 1, 'z': 2}
+    _outputs = ReadParticles(filein, names=[key for key in keys if key not in _components])
+    _columns = []
+    for key in keys:
+        if key in _components:
+            _columns.append(_outputs['position'][:, _components[key]])
+        else:
+            _columns.append(_outputs[key])
+    return np.column_stack(_columns).astype(np.float64)
+
+
+def main():
+    '''
+    main function of this module
+    Inputs:
+        sys.arg[1](str):
+            commend
+        sys.arg[2, :](str):
+            options
+    '''
+    _commend = sys.argv[1]
+    # parse options
+    parser = argparse.ArgumentParser(description='Read particle output of aspect')
+    parser.add_argument('-i', '--inputs', type=str,
+                        default=None,
+                        help='A .visit, .pvtu or .vtu file')
+    parser.add_argument('-s', '--step', type=int,
+                        default=0,
+                        help='snapshot in a .visit file')
+    parser.add_argument('-o', '--output', type=str,
+                        default=None,
+                        help='file to output')
+    _options = []
+    try:
+        _options = sys.argv[2: ]
+    except IndexError:
+        pass
+    arg = parser.parse_args(_options)
+
+    if _commend == 'export_xyz':
+        # export particles of a snapshot in the columns of the .xyz file from visit
+        # example usage:
+        #   python -m shilofue.ParticleOutput export_xyz -i output/particles.visit -s 3 -o particles.txt
+        filein = arg.inputs
+        if filein.endswith('.visit'):
+            _, snapshots = ReadVisitRecord(filein)
+            filein = snapshots[arg.step]
+        _data = ParticleColumns(filein, ['x', 'y', 'z', 'id'])
+        np.savetxt(arg.output if arg.output is not None else sys.stdout, _data, fmt='%.8e')
+
+
+# run script
+if __name__ == '__main__':
+    main()
@@ -7,9 +7,13 @@ import warnings
 import argparse
 import subprocess
 import pathlib
+import hashlib
+import functools
+import concurrent.futures
 import numpy as np
 from importlib import resources
-from shilofue.Utilities import JsonOptions, ReadHeader, ReadHeader2, UNITCONVERT, my_assert
+from shilofue.Utilities import JsonOptions, ReadHeader, ReadHeader2, UNITCONVERT, my_assert,\
+    ReadHeaderTexts, ProjectHeader, LoadTable, LoadTableCache, SaveTableCache, FileFingerprint
 from matplotlib import pyplot as plt
 
 
@@ -30,6 +34,8 @@ class LINEARPLOT():
         kwargs:
             unit_convert(fun):
                 a unit_convert function, default is None
+            cache(True or False):
+                use a sidecar cache of data files, default is True
         '''
         self.name = _name
         _json_dir = kwargs.get('json_dir', None)
@@ -37,6 +43,9 @@ class LINEARPLOT():
         self.UnitConvert = kwargs.get('unit_convert', None)
         self.dim = kwargs.get('dim', 2)  # dimension
         assert(self.dim in [1, 2, 3])  # dimension must be 1, 2, 3
+        self.cache = kwargs.get('cache', True)
+        # function to interpret the header
+        self.header_reader = ReadHeader
 
         # reset the options with a option in the kwargs
         with resources.open_text(shilofue.json, 'post_process.json') as fin:
@@ -89,34 +98,63 @@ class LINEARPLOT():
             _filename(str):
                 filename for data file
         '''
+        self.header = self.header_reader(self.ReadHeaderTexts(_filename))
+
+    def ReadHeaderTexts(self, _filename):
+        '''
+        Read the text of the file header, from the sidecar cache if it is valid
+        Args:
+            _filename(str):
+                filename for data file
+        Returns:
+            _texts(list<string>): lines of the file header
+        '''
         assert(os.access(_filename, os.R_OK))
-        with open(_filename, 'r') as fin:
-            _texts = fin.readlines()  # read the text of the file header
-        self.header = ReadHeader(_texts)
+        if self.cache:
+            _cache = LoadTableCache(_filename, data=False)
+            if _cache is not None:
+                return _cache[0]
+        return ReadHeaderTexts(_filename)
 
-    def ReadData(self, _filename):
+    def ReadData(self, _filename, **kwargs):
         '''
         Read Data
+        If self.cache is True, data is loaded from a sidecar cache if the file
+        is not changed since the cache is saved, otherwise the cache is saved
+        after data is read.
         Attributes:
             _filename(string):
                 filename for data file
+            kwargs:
+                usecols(list of str): only read these columns, entries are keys in the header.
+                    If this is given, self.header is changed to the header of these columns
+        Returns:
+            0: normal
+            1: there is no data in the file
         '''
+        usecols = kwargs.get('usecols', None)
         assert(os.access(_filename, os.R_OK))  # read in data
-        # self.data = np.genfromtxt(_filename, comments='#')
-        
-        # import data via numpy buid in method
-        # catch warning of empty file and return 1
-        with warnings.catch_warnings(record=True) as w:
-            self.data = np.genfromtxt(_filename, comments='#')
-            if (len(w) > 0):
-                assert(issubclass(w[-1].category, UserWarning))
-                assert('Empty input file' in str(w[-1].message))
-                warnings.warn('ReadData: %s, abort' % str(w[-1].message))
-                return 1
+        if self.cache:
+            _cache = LoadTableCache(_filename)
+            if _cache is not None:
+                self.data = _cache[1]
+                if usecols is not None:
+                    _cols, self.header = ProjectHeader(self.header, usecols)
+                    self.data = self.data[:, _cols]
+                return 0
+        _stat = os.stat(_filename)
         
-        if len(self.data.shape) == 1:
-            # only one row, expand it too 2-d array
-            self.data = np.array([self.data])
+        # import data, catch empty file and return 1
+        _header, self.data = LoadTable(_filename, header_reader=self.header_reader, usecols=usecols)
+        if self.data.shape[0] == 0:
+            warnings.warn('ReadData: Empty input file: "%s", abort' % _filename)
+            return 1
+
+        if usecols is not None:
+            self.header = _header
+        elif self.cache:
+            # only cache the whole table
+            SaveTableCache(_filename, _stat, ReadHeaderTexts(_filename), self.data)
         return 0
         
 
@@ -153,6 +191,64 @@ class LINEARPLOT():
             AssertionError:
                 if size of canvas doesn't match number of plottings
         '''
+        _title = kwargs.get('title', None)  # get title
+        fig, _ = self.PlotCanvas(_data_list)
+        fig.tight_layout()
+        fig.savefig(_fileout)
+        plt.close(fig)
+        return _fileout
+
+    def PlotCombineBatch(self, _data_lists, _fileouts):
+        '''
+        Combine all plottings, for a batch of data.
+        The figure is generated once with the first member in _data_lists,
+        then for every other member, only data of lines are changed.
+        Arguments:
+            _data_lists(list<list<ndarray>>):
+                a list, each member is a _data_list for PlotCombine
+            _fileouts(list<str>):
+                names of the output files
+        Returns:
+            _filenames(list<string>):
+                names of the plottings created
+        '''
+        assert(len(_data_lists) == len(_fileouts))
+        if len(_data_lists) == 0:
+            return []
+        fig, _lines = self.PlotCanvas(_data_lists[0])
+        fig.tight_layout()
+        for j in range(len(_data_lists)):
+            if j > 0:
+                # swap data of lines
+                _axs = []
+                for _ax, _opt, _line in _lines:
+                    _line.set_data(*self.PlotLineData(_data_lists[j], _opt))
+                    if _ax not in _axs:
+                        _axs.append(_ax)
+                for _ax in _axs:
+                    _ax.relim()
+                    _ax.autoscale_view()
+            fig.savefig(_fileouts[j])
+        plt.close(fig)
+        return list(_fileouts)
+
+    def PlotCanvas(self, _data_list):
+        '''
+        Generate a figure and plot on the canvas
+        Arguments:
+            _data_list(list<ndarray>):
+                list of data, each member is a set of data for
+                some variable
+        Returns:
+            fig(figure):
+                a figure object from matplotlib
+            _lines(list):
+                lines in this figure, each member is the axis, the plot options
+                and the line object
+        Raises:
+            AssertionError:
+                if size of canvas doesn't match number of plottings
+        '''
         # plot configuration
         assert(type(_data_list) is list)
         _canvas = self.options.get('canvas', [1, 1])
@@ -161,9 +257,9 @@ class LINEARPLOT():
         assert(type(_types) is list and
             _canvas[0] * _canvas[1] >= len(_types))  # size of canvas match size of _types
         _size = self.options.get('size', (5, 5))  # size of the plot
-        _title = kwargs.get('title', None)  # get title
 
         # plot
+        _lines = []
         fig, axs = plt.subplots(_canvas[0], _canvas[1], figsize=_size)
         for i in range(len(_types)):
             # find the right axis
@@ -181,18 +277,21 @@ class LINEARPLOT():
             # find options for plot
             _type = _types[i]
             if type(_type) == str:
-                _opt = self.options[_type]  # get the plot options
-                self.Plot(_data_list, _ax, _opt)
+                _subtypes = [_type]
             elif type(_type) == list:
                 # when _type is a list, plot multiple lines in a subplot
-                for _subtype in _type:
-                    assert(type(_subtype) == str)
-                    _opt = self.options[_subtype]  # get the plot options
-                    self.Plot(_data_list, _ax, _opt)
-        fig.tight_layout()
-        fig.savefig(_fileout)
-        plt.close(fig)
-        return _fileout
+                _subtypes = _type
+            else:
+                _subtypes = []
+            for _subtype in _subtypes:
+                assert(type(_subtype) == str)
+                _opt = self.options[_subtype]  # get the plot options
+                _n_lines = len(_ax.lines)
+                self.Plot(_data_list, _ax, _opt)
+                if len(_ax.lines) > _n_lines:
+                    # a line is plotted
+                    _lines.append((_ax, _opt, _ax.lines[-1]))
+        return fig, _lines
 
     def Plot(self, _data_list, _ax, _opt):
         '''
@@ -224,34 +323,20 @@ class LINEARPLOT():
         _invert_y = _opt.get('invert_y', 0)
         _log_x = _opt.get('log_x', 0)  # plot x as log
         _log_y = _opt.get('log_y', 0)  # plot y as log
-        # then column is determined
-        # by header information
-        _colx = self.header[_xname]['col']
-        try:
-            _coly = self.header[_yname]['col']
-        except KeyError:
+        # check fields in the header,
+        # columns are determined by PlotLineData
+        my_assert(_xname in self.header, KeyError, "Plot: the field %s doesn't exist" % _xname)
+        if _yname not in self.header:
             # there is no such field in the file
             # give out a warning, continue with the next plot
             warnings.warn('The field %s doesn\'t exist. We will keep ploting,\
 but you will get a blank one for this field name' % _yname,
                            self.DataNotFoundWarning)
             return
-        _unitx = self.header[_xname]['unit']
-        _unity = self.header[_yname]['unit']
-        _x = _data_list[_colx]
-        _y = _data_list[_coly]
         # get the unit for plot
-        _unit_x_plot = _opt.get('xunit', _unitx)
-        _unit_y_plot = _opt.get('yunit', _unity)
-        # convert the unit
-        if self.UnitConvert is not None and _unit_x_plot != _unitx:
-            x_convert_ratio = self.UnitConvert(_unitx, _unit_x_plot)
-        else:
-            x_convert_ratio = 1.0
-        if self.UnitConvert is not None and _unit_y_plot != _unity:
-            y_convert_ratio = self.UnitConvert(_unity, _unit_y_plot)
-        else:
-            y_convert_ratio = 1.0
+        _unit_x_plot = _opt.get('xunit', self.header[_xname]['unit'])
+        _unit_y_plot = _opt.get('yunit', self.header[_yname]['unit'])
+        _x, _y = self.PlotLineData(_data_list, _opt)
         # construct label from xname and yname
         # put in unit
         if _unit_x_plot is not None:
@@ -263,13 +348,13 @@ but you will get a blank one for this field name' % _yname,
         else:
             _ylabel = re.sub("_", " ", _yname)
         if _log_x and _log_y:
-            _ax.loglog(_x*x_convert_ratio, _y*y_convert_ratio, _line, color=_color, label=_label)
+            _ax.loglog(_x, _y, _line, color=_color, label=_label)
         elif _log_x:
-            _ax.semilogx(_x*x_convert_ratio, _y*y_convert_ratio, _line, color=_color, label=_label)
+            _ax.semilogx(_x, _y, _line, color=_color, label=_label)
         elif _log_y:
-            _ax.semilogy(_x*x_convert_ratio, _y*y_convert_ratio, _line, color=_color, label=_label)
+            _ax.semilogy(_x, _y, _line, color=_color, label=_label)
         else:
-            _ax.plot(_x*x_convert_ratio, _y*y_convert_ratio, _line, color=_color, label=_label)
+            _ax.plot(_x, _y, _line, color=_color, label=_label)
         _ax.set(xlabel=_xlabel, ylabel=_ylabel)
         if _invert_x and ~_ax.xaxis_inverted():
             _ax.invert_xaxis()
@@ -281,6 +366,43 @@ but you will get a blank one for this field name' % _yname,
             _ax.legend()
 
 
+    def PlotLineData(self, _data_list, _opt):
+        '''
+        Get data of a line plotting, with units converted
+        Arguments:
+            _data_list(list<ndarray>):
+                list of data, each member is a set of data for
+                some variable
+            _opt(dict):
+                dictionary for plot options
+        Returns:
+            _x(ndarray), _y(ndarray):
+                data on the x and y axis, None if the field of y doesn't exist
+        '''
+        _xname = _opt.get('xname', 'Time')
+        _yname = _opt.get('yname', 'Number_of_mesh_cells')
+        _colx = self.header[_xname]['col']
+        try:
+            _coly = self.header[_yname]['col']
+        except KeyError:
+            return None
+        _unitx = self.header[_xname]['unit']
+        _unity = self.header[_yname]['unit']
+        # get the unit for plot
+        _unit_x_plot = _opt.get('xunit', _unitx)
+        _unit_y_plot = _opt.get('yunit', _unity)
+        # convert the unit
+        if self.UnitConvert is not None and _unit_x_plot != _unitx:
+            x_convert_ratio = self.UnitConvert(_unitx, _unit_x_plot)
+        else:
+            x_convert_ratio = 1.0
+        if self.UnitConvert is not None and _unit_y_plot != _unity:
+            y_convert_ratio = self.UnitConvert(_unity, _unit_y_plot)
+        else:
+            y_convert_ratio = 1.0
+        return _data_list[_colx] * x_convert_ratio, _data_list[_coly] * y_convert_ratio
+
+
 class STATISTICS_PLOT(LINEARPLOT):
     '''
     Class for plotting depth average file.
@@ -330,12 +452,19 @@ class DEPTH_AVERAGE_PLOT(LINEARPLOT):
     '''
     def __init__(self, _name, **kwargs):
         LINEARPLOT.__init__(self, _name, kwargs)  # call init from base function
+        self.header_reader = ReadHeader2
         self.time_step_length = None
         # both these two arrays have the length of total time steps
         # the first records the time for each time step
         # the second points to the actual step within data
         self.time_step_times = None
         self.time_step_indexes = None
+        # data reshaped to (n_times, n_depths, n_cols), and the block used for each time step
+        self.time_step_data = None
+        self.time_step_lasts = None
+        # sorted times and their indexes in time_step_times
+        self.time_step_order = None
+        self.time_step_sorted_times = None
 
     def __call__(self, _filename, **kwargs):
         '''
@@ -366,15 +495,15 @@ class DEPTH_AVERAGE_PLOT(LINEARPLOT):
         else:
             raise TypeError('type of time needs to be in [float, int, list, np.ndarrayy]')
         for _t in _time_list:
-            if type(_t) not in [float, int]:
+            if type(_t) not in [float, int, np.float64]:
                 raise TypeError('type of values in time needs to be in [float, int, list, np.ndarrayy]')
-            _data_list = self.ManageData(_t)  # manage output data
             _t_in_myr = _t * self.UnitConvert(self.header['time']['unit'], 'myr')
-            _fname = "%s_t%.8e.%s" % (_fname_base, _t_in_myr, _fname_type)
-            _figure_title = "Detph Average, t = %.10f myr" % _t_in_myr
-            _fname = self.PlotCombine(_data_list, _fname, title=_figure_title)
-            _fname_list.append(_fname)
-        if len(_fname_list) == 0:
+            _fname_list.append("%s_t%.8e.%s" % (_fname_base, _t_in_myr, _fname_type))
+        # manage output data for all the times at once, and plot them on the same figure
+        _data = self.ManageDataBatch(_time_list)
+        _data_lists = [[_data[j, :, i] for i in range(_data.shape[2])] for j in range(_data.shape[0])]
+        _fname_list = self.PlotCombineBatch(_data_lists, _fname_list)
+        if len(_fname_list) == 1:
             # if there is only one name, just return this name
             return _fname_list[0]
         else:
@@ -414,57 +543,54 @@ class DEPTH_AVERAGE_PLOT(LINEARPLOT):
             return _data_list_o
 
 
-    def ReadHeader(self, _filename):
-        '''
-        Read header information from file.
-        overload base function, use ReadHeader2
-        function in utilities.py
-        Args:
-            _filename(str):
-                filename for data file
-        '''
-        assert(os.access(_filename, os.R_OK))
-        with open(_filename, 'r') as fin:
-            _texts = fin.readlines()  # read the text of the file header
-        self.header = ReadHeader2(_texts)
-
     def SplitTimeStep(self):
         '''
-        split time steps, since the data is a big chunck
+        split time steps, since the data is a big chunck.
+        Data is reshaped to a (n_times, n_depths, n_cols) view (self.time_step_data),
+        rows in an incomplete block at the end of the file are dropped.
         '''
-        _time_step_times = []  # initialize
-        _time_step_indexes = []
         _col_time = self.header['time']['col']
         _col_depth = self.header['depth']['col']
-        _times = self.data[:, _col_time]
         _depths = self.data[:, _col_depth]
-        # get the lenght of a single time step
-        for i in range(1, _depths.size):
-            if _depths[i] < _depths[i-1]:
-                self.time_step_length = i
-                break
-            elif i == _depths.size - 1:
-                # as the exiting value from python is simply _depths.size - 1
-                self.time_step_length = i + 1
-        # make a ndarray of different value of time
-        _step_times = [_times[_idx] for _idx in range(0, _times.size, self.time_step_length)]
-        i = 0  # first sub list for first step
-        _time_step_times.append(_step_times[0])
-        _time_step_indexes.append([0])
-        # loop to group data at the same step
-        for j in range(1, len(_step_times)):
-            _time = _step_times[j]
-            if abs(_time - _step_times[j-1]) > 1e-16:
-                _time_step_indexes.append([])
-                _time_step_times.append(_time)
-                i += 1
-            _time_step_indexes[i].append(j)
+        # get the lenght of a single time step, depth decreases at the start of the next step
+        _decreases = np.nonzero(np.diff(_depths) < 0)[0]
+        if _decreases.size > 0:
+            self.time_step_length = _decreases[0] + 1
+        else:
+            self.time_step_length = _depths.size
+        _blocks = _depths.size // self.time_step_length
+        self.time_step_data = self.data[: _blocks * self.time_step_length].reshape(
+            (_blocks, self.time_step_length, self.data.shape[1]))
+        # group data at the same time, the last block in a group is used
+        _step_times = self.time_step_data[:, 0, _col_time]
+        _is_new = np.concatenate(([True], np.abs(np.diff(_step_times)) > 1e-16))
+        _firsts = np.nonzero(_is_new)[0]
         # both these two arrays have the length of total time steps
         # the first records the time for each time step
         # the second points to the actual step within data
-        self.time_step_times = np.array(_time_step_times)
-        self.time_step_indexes = _time_step_indexes
-    
+        self.time_step_times = _step_times[_firsts]
+        self.time_step_indexes = np.split(np.arange(_blocks), _firsts[1:])
+        self.time_step_lasts = np.append(_firsts[1:] - 1, _blocks - 1)
+        # sorted index of times, for looking up
+        self.time_step_order = np.argsort(self.time_step_times, kind='stable')
+        self.time_step_sorted_times = self.time_step_times[self.time_step_order]
+
+    def GetTimeSteps(self, _times):
+        '''
+        Get the time steps closest to times
+        Inputs:
+            _times(float or array-like): times to look up
+        Returns:
+            _time_steps(int or ndarray): index of time steps, in self.time_step_times
+        '''
+        _sorted_times = self.time_step_sorted_times
+        if _sorted_times.size == 1:
+            return self.time_step_order[np.zeros(np.shape(_times), dtype=int)]
+        _indexes = np.clip(np.searchsorted(_sorted_times, _times), 1, _sorted_times.size - 1)
+        # choose the closer one between two neighbors, the former one if they tie
+        _is_former = np.abs(_times - _sorted_times[_indexes - 1]) <= np.abs(_sorted_times[_indexes] - _times)
+        return self.time_step_order[_indexes - _is_former]
+
     def ManageData(self, _time):
         '''
         manage data, get new data for this class
@@ -474,26 +600,45 @@ class DEPTH_AVERAGE_PLOT(LINEARPLOT):
             _time(float):
                 time of plotting
         '''
-        _data_list = []
-        _time_step = np.argmin(abs(self.time_step_times - _time))  # time_step
-        _index0 = self.time_step_indexes[_time_step][-1] * self.time_step_length
-        if _time_step == len(self.time_step_times) - 1:
-            # this is the last step
-            _index1 = self.data.shape[0]
-        else:
-            _index1 = self.time_step_indexes[_time_step + 1][0] * self.time_step_length
-        for i in range(self.data.shape[1]):
-            _data_list.append(self.data[_index0 : _index1, i])
+        _time_step = self.GetTimeSteps(_time)  # time_step
+        _data = self.time_step_data[self.time_step_lasts[_time_step]]
+        _data_list = [_data[:, i] for i in range(_data.shape[1])]
         # get the super adiabatic temperature
         _col_temperature = self.header['temperature']['col']
         _col_adiabatic_temperature = self.header['adiabatic_temperature']['col']
-        _super_adiabatic_temperature = self.data[_index0 : _index1, _col_temperature] - self.data[_index0 : _index1, _col_adiabatic_temperature]
+        _super_adiabatic_temperature = _data[:, _col_temperature] - _data[:, _col_adiabatic_temperature]
         _data_list.append(_super_adiabatic_temperature)
-        self.header['super_adiabatic_temperature'] = {}
-        self.header['super_adiabatic_temperature']['col'] = self.header['total_col']
-        self.header['super_adiabatic_temperature']['unit'] = 'K'
-        self.header['total_col'] += 1
+        self.AddSuperAdiabaticHeader()
         return _data_list
+
+    def ManageDataBatch(self, _times):
+        '''
+        manage data for a list of times at once
+        Inputs:
+            _times(list or ndarray): times of plotting
+        Returns:
+            _data(ndarray):
+                data at these times, the shape is (n_times, n_depths, n_cols + 1),
+                the last column is the super adiabatic temperature
+        '''
+        _time_steps = self.GetTimeSteps(np.asarray(_times, dtype=float))
+        _data = self.time_step_data[self.time_step_lasts[_time_steps]]
+        # get the super adiabatic temperature
+        _col_temperature = self.header['temperature']['col']
+        _col_adiabatic_temperature = self.header['adiabatic_temperature']['col']
+        _super_adiabatic_temperature = _data[:, :, _col_temperature] - _data[:, :, _col_adiabatic_temperature]
+        self.AddSuperAdiabaticHeader()
+        return np.concatenate((_data, _super_adiabatic_temperature[:, :, np.newaxis]), axis=2)
+
+    def AddSuperAdiabaticHeader(self):
+        '''
+        add the super adiabatic temperature to the header, as the last column
+        '''
+        if 'super_adiabatic_temperature' not in self.header:
+            self.header['super_adiabatic_temperature'] = {}
+            self.header['super_adiabatic_temperature']['col'] = self.header['total_col']
+            self.header['super_adiabatic_temperature']['unit'] = 'K'
+            self.header['total_col'] += 1
     
     def ManageUnits(self):
         '''
@@ -611,11 +756,12 @@ class NEWTON_SOLVER_PLOT(LINEARPLOT):
         # get number of nonlinear iteration
         nni = np.array([i for i in range(self.data.shape[0])])
         _data_list.append(nni)
-        # mend header
-        self.header['Number_of_nonlinear_iteration'] = {}
-        self.header['Number_of_nonlinear_iteration']['col'] = self.header['total_col']
-        self.header['Number_of_nonlinear_iteration']['unit'] = None
-        self.header['total_col'] += 1
+        # mend header, only once if this is called again for the same data
+        if 'Number_of_nonlinear_iteration' not in self.header:
+            self.header['Number_of_nonlinear_iteration'] = {}
+            self.header['Number_of_nonlinear_iteration']['col'] = self.header['total_col']
+            self.header['Number_of_nonlinear_iteration']['unit'] = None
+            self.header['total_col'] += 1
         return _data_list
 
 
@@ -689,15 +835,137 @@ class MACHINE_TIME_PLOT(LINEARPLOT):
         return machine_time_at_step * number_of_cpu, number_of_cpu
 
 
+class PLOT_MANIFEST():
+    '''
+    PLOT_MANIFEST():
+    A manifest of figures generated for a case, saved in the img directory
+    as '.plot_manifest.json'. For every figure, fingerprints of input files
+    and a hash of plot options are recorded, thus a figure is only generated again
+    when its inputs or options are changed.
+
+    Attributes:
+        filename(str): file of this manifest
+        figures(dict): records of figures, keys are names of figures
+    '''
+    def __init__(self, _img_dir):
+        '''
+        Inputs:
+            _img_dir(str): img directory of a case
+        '''
+        self.filename = os.path.join(_img_dir, '.plot_manifest.json')
+        self.figures = {}
+        if os.path.isfile(self.filename):
+            try:
+                with open(self.filename, 'r') as fin:
+                    self.figures = json.load(fin)
+            except ValueError:
+                # a broken manifest, start over
+                self.figures = {}
+
+    def IsUpToDate(self, _ofile, _inputs, _options):
+        '''
+        Inputs:
+            _ofile(str): figure
+            _inputs(list of str): input files of this figure
+            _options(dict): options of plotting
+        Returns:
+            True if the figure exists and inputs and options are the same
+            as when it was generated
+        '''
+        _record = self.figures.get(os.path.basename(_ofile), None)
+        if _record is None or not os.path.isfile(_ofile):
+            return False
+        if _record['options'] != OptionsHash(_options):
+            return False
+        _old_inputs = _record['inputs']
+        _is_touched = False
+        for _input in _inputs:
+            _key = os.path.basename(_input)
+            _old = _old_inputs.get(_key, None)
+            if _old is None:
+                return False
+            _new = FileFingerprint(_input, _old)
+            if _new['md5'] != _old['md5']:
+                return False
+            if _new != _old:
+                # contents are the same, only update the fingerprint
+                _old_inputs[_key] = _new
+                _is_touched = True
+        if _is_touched:
+            self.Save()
+        return True
+
+    def Record(self, _ofile, _inputs, _options):
+        '''
+        Record a figure generated and save the manifest,
+        so that figures generated before an error are still recorded
+        Inputs:
+            _ofile(str): figure
+            _inputs(list of str): input files of this figure
+            _options(dict): options of plotting
+        '''
+        _old_inputs = self.figures.get(os.path.basename(_ofile), {}).get('inputs', {})
+        _fingerprints = {}
+        for _input in _inputs:
+            _key = os.path.basename(_input)
+            _fingerprints[_key] = FileFingerprint(_input, _old_inputs.get(_key, None))
+        self.figures[os.path.basename(_ofile)] = {'inputs': _fingerprints, 'options': OptionsHash(_options)}
+        self.Save()
+
+    def Save(self):
+        '''
+        Save the manifest
+        '''
+        with open(self.filename, 'w') as fout:
+            json.dump(self.figures, fout, indent=2)
+
+
+def OptionsHash(_options):
+    '''
+    Hash of options of plotting
+    Inputs:
+        _options(dict): options
+    Returns:
+        _hash(str): md5 hash of options
+    '''
+    return hashlib.md5(json.dumps(_options, sort_keys=True, default=str).encode()).hexdigest()
+
+
 def ProjectPlot(case_dirs, _file_type, **kwargs):
     '''
     Plot figures for all cases in this project
     Inputs:
         kwargs:
             update(True or False): if True, update existing figures
+            pdict(dict): options for plotting
+            workers(int): number of processes to plot with, default is 1
+    Returns:
+        _failures(dict): cases failed, values are error messages
+    '''
+    update = kwargs.get('update', False)
+    pdict = kwargs.get('pdict', {})
+    workers = kwargs.get('workers', 1)
+    _plot_case = functools.partial(PlotCase, file_type=_file_type, update=update, pdict=pdict)
+    return ProjectPlotCases(_plot_case, case_dirs, workers=workers)
+
+
+def PlotCase(_case_dir, **kwargs):
+    '''
+    Plot figures for a case
+    Inputs:
+        _case_dir(str): directory of case
+        kwargs:
+            file_type(str): type of figures, default is 'png'
+            update(True or False): if True, update existing figures, otherwise figures
+                are generated only if their inputs or options have changed
+            pdict(dict): options for plotting
+    Returns:
+        _ofiles(list): figures generated
     '''
+    _file_type = kwargs.get('file_type', 'png')
     update = kwargs.get('update', False)
     pdict = kwargs.get('pdict', {})
+    _ofiles = []
     # Init the UnitConvert class
     UnitConvert = UNITCONVERT()
 
@@ -718,125 +986,184 @@ def ProjectPlot(case_dirs, _file_type, **kwargs):
     plot_options = pdict.get('MachineTime', {})
     MachineTime = MACHINE_TIME_PLOT('MachineTime', options=plot_options)
 
-    # loop for cases and post process
-    for _case_dir in case_dirs:
-        # cases
-        _case_output_dir = os.path.join(_case_dir, 'output')
-        _case_img_dir = os.path.join(_case_dir, 'img')
-        if not os.path.isdir(_case_img_dir):
-            # make img folder if not exists
-            os.mkdir(_case_img_dir)
-
-        # plot statistic
-        _statistic_file = os.path.join(_case_output_dir, 'statistics')
-        _ofile = os.path.join(_case_img_dir, 'Statistics.'+ _file_type)
-        # compare the dates of files, determine whether to plot
-        is_plot = False
-        if os.path.isfile(_statistic_file):
-            if not os.path.isfile(_ofile) or \
-               os.stat(_statistic_file)[8] > os.stat(_ofile)[8]:
-                is_plot = True
-        # plot
-        if is_plot:
-            try:
-                Statistics(_statistic_file, fileout=_ofile)
-            except Exception as e:
-                raise Exception("Plot statistics file failed for %s, please chech file content.\
+    # cases
+    _case_output_dir = os.path.join(_case_dir, 'output')
+    _case_img_dir = os.path.join(_case_dir, 'img')
+    if not os.path.isdir(_case_img_dir):
+        # make img folder if not exists
+        os.mkdir(_case_img_dir)
+    # record of figures generated
+    _manifest = PLOT_MANIFEST(_case_img_dir)
+
+    # plot statistic
+    _statistic_file = os.path.join(_case_output_dir, 'statistics')
+    _ofile = os.path.join(_case_img_dir, 'Statistics.'+ _file_type)
+    if os.path.isfile(_statistic_file) and \
+       (update is True or not _manifest.IsUpToDate(_ofile, [_statistic_file], Statistics.options)):
+        try:
+            Statistics(_statistic_file, fileout=_ofile)
+        except Exception as e:
+            raise Exception("Plot statistics file failed for %s, please chech file content.\
 One option is to delete incorrect file before running again" % _statistic_file) from e
-            else:
-                print('Plot has been generated: ', _ofile)  # screen output
-
-        # plot depth-average
-        _depth_average_file = os.path.join(_case_output_dir, 'depth_average.txt')
-        _time = 0.0
-        _ofile_route = os.path.join(_case_img_dir, 'DepthAverage.%s' % _file_type)
-        _ofile = os.path.join(_case_img_dir, 'DepthAverage_t%.8e.%s' % (_time, _file_type))  # ofile has the exact time
-        if os.path.isfile(_depth_average_file) and (not os.path.isfile(_ofile) or update is True):
-            # check for ofile here is not precist, not intuitive. future: change the implementation
-            try:
-                _ofile_exact = DepthAverage(_depth_average_file, fileout=_ofile_route, time=_time)
-            except Exception as e:
-                raise Exception("Plot DepthAverage file failed for %s, please chech file content.\
+        else:
+            _manifest.Record(_ofile, [_statistic_file], Statistics.options)
+            _ofiles.append(_ofile)
+
+    # plot depth-average
+    _depth_average_file = os.path.join(_case_output_dir, 'depth_average.txt')
+    _time = 0.0
+    _ofile_route = os.path.join(_case_img_dir, 'DepthAverage.%s' % _file_type)
+    _ofile = os.path.join(_case_img_dir, 'DepthAverage_t%.8e.%s' % (_time, _file_type))  # ofile has the exact time
+    if os.path.isfile(_depth_average_file) and \
+       (update is True or not _manifest.IsUpToDate(_ofile, [_depth_average_file], DepthAverage.options)):
+        try:
+            _ofile_exact = DepthAverage(_depth_average_file, fileout=_ofile_route, time=_time)
+        except Exception as e:
+            raise Exception("Plot DepthAverage file failed for %s, please chech file content.\
 One option is to delete incorrect file before running again" % _depth_average_file) from e
-            else:
-                if _ofile_exact is not None:
-                    # output when there is file generated
-                    print('Plot has been generated: ', _ofile_exact)  # screen output
-        
-        # add solver output
-        # plot newton solver output
-        _solver_file = os.path.join(_case_output_dir, 'solver_output')
-        _ofile_route = os.path.join(_case_img_dir, 'NewtonSolverStep.%s' % _file_type)
-        # plot step0
-        _step = 0
-        NewtonSolverStep.GetStep(_step)
-        _ofile = os.path.join(_case_img_dir, 'NewtonSolverStep_s%07d.%s' % (_step, _file_type))
-        if os.path.isfile(_solver_file) and (not os.path.isfile(_ofile) or update is True):
-            # check for ofile here is not precist, not intuitive. future: change the implementation
-            try:
-                _ofile_exact = NewtonSolverStep(_solver_file, fileout=_ofile_route)
-            except Exception as e:
-                raise Exception("Plot NewtonSolver file failed for %s, please chech file content.\
+        else:
+            if _ofile_exact is not None:
+                # output when there is file generated
+                _manifest.Record(_ofile_exact, [_depth_average_file], DepthAverage.options)
+                _ofiles.append(_ofile_exact)
+    
+    # add solver output
+    # plot newton solver output
+    _solver_file = os.path.join(_case_output_dir, 'solver_output')
+    _ofile_route = os.path.join(_case_img_dir, 'NewtonSolverStep.%s' % _file_type)
+    # plot step0
+    _step = 0
+    NewtonSolverStep.GetStep(_step)
+    _ofile = os.path.join(_case_img_dir, 'NewtonSolverStep_s%07d.%s' % (_step, _file_type))
+    if os.path.isfile(_solver_file) and \
+       (update is True or not _manifest.IsUpToDate(_ofile, [_solver_file], NewtonSolverStep.options)):
+        try:
+            _ofile_exact = NewtonSolverStep(_solver_file, fileout=_ofile_route)
+        except Exception as e:
+            raise Exception("Plot NewtonSolver file failed for %s, please chech file content.\
 One option is to delete incorrect file before running again" % _solver_file) from e
-            else:
-                if _ofile_exact is not None:
-                    # output when there is file generated
-                    print('Plot has been generated: ', _ofile_exact)  # screen output
-        # plot step 1
-        _step = 1
-        NewtonSolverStep.GetStep(_step)
-        _ofile = os.path.join(_case_img_dir, 'NewtonSolverStep_s%07d.%s' % (_step, _file_type))
-        if os.path.isfile(_solver_file) and (not os.path.isfile(_ofile) or update is True):
-            # check for ofile here is not precist, not intuitive. future: change the implementation
-            try:
-                _ofile_exact = NewtonSolverStep(_solver_file, fileout=_ofile_route)
-            except Exception as e:
-                raise Exception("Plot NewtonSolver file failed for %s, please chech file content.\
+        else:
+            if _ofile_exact is not None:
+                # output when there is file generated
+                _manifest.Record(_ofile_exact, [_solver_file], NewtonSolverStep.options)
+                _ofiles.append(_ofile_exact)
+    # plot step 1
+    _step = 1
+    NewtonSolverStep.GetStep(_step)
+    _ofile = os.path.join(_case_img_dir, 'NewtonSolverStep_s%07d.%s' % (_step, _file_type))
+    if os.path.isfile(_solver_file) and \
+       (update is True or not _manifest.IsUpToDate(_ofile, [_solver_file], NewtonSolverStep.options)):
+        try:
+            _ofile_exact = NewtonSolverStep(_solver_file, fileout=_ofile_route)
+        except Exception as e:
+            raise Exception("Plot NewtonSolver file failed for %s, please chech file content.\
 One option is to delete incorrect file before running again" % _solver_file) from e
-            else:
-                if _ofile_exact is not None:
-                    # output when there is file generated
-                    print('Plot has been generated: ', _ofile_exact)  # screen output
-        # plot whole history
-        _ofile = os.path.join(_case_img_dir, 'NewtonSolver.%s' % _file_type)
-        if os.path.isfile(_solver_file) and (not os.path.isfile(_ofile) or update is True):
-            # check for ofile here is not precist, not intuitive. future: change the implementation
-            try:
-                _ofile_exact = NewtonSolver(_solver_file, fileout=_ofile)
-            except Exception as e:
-                raise Exception("Plot NewtonSolver file failed for %s, please chech file content.\
+        else:
+            if _ofile_exact is not None:
+                # output when there is file generated
+                _manifest.Record(_ofile_exact, [_solver_file], NewtonSolverStep.options)
+                _ofiles.append(_ofile_exact)
+    # plot whole history
+    _ofile = os.path.join(_case_img_dir, 'NewtonSolver.%s' % _file_type)
+    if os.path.isfile(_solver_file) and \
+       (update is True or not _manifest.IsUpToDate(_ofile, [_solver_file], NewtonSolver.options)):
+        try:
+            _ofile_exact = NewtonSolver(_solver_file, fileout=_ofile)
+        except Exception as e:
+            raise Exception("Plot NewtonSolver file failed for %s, please chech file content.\
 One option is to delete incorrect file before running again" % _solver_file) from e
-            else:
-                if _ofile_exact is not None:
-                    # output when there is file generated
-                    print('Plot has been generated: ', _ofile_exact)  # screen output
-        
-        # plot machine_time
-        _machine_time_file = os.path.join(_case_output_dir, 'machine_time')
-        _time = 0.0
-        _ofile = os.path.join(_case_img_dir, 'MachineTime.%s' % _file_type)  # ofile has the exact time
-        # compare the dates of files, determine whether to plot
-        is_plot = False
-        if os.path.isfile(_machine_time_file):
-            if not os.path.isfile(_ofile) or \
-               os.stat(_machine_time_file)[8] > os.stat(_ofile)[8]:
-                is_plot = True
-        # plot
-        if is_plot:
-            # check for ofile here is not precist, not intuitive. future: change the implementation
-            try:
-                _ofile_exact = MachineTime(_machine_time_file, fileout=_ofile)
-            except Exception as e:
-                raise Exception("Plot MachineTime file failed for %s, please chech file content.\
-One option is to delete incorrect file before running again" % _machine_time_file) from e
-            else:
-                if _ofile_exact is not None:
-                    # output when there is file generated
-                    print('Plot has been generated: ', _ofile_exact)  # screen output
+        else:
+            if _ofile_exact is not None:
+                # output when there is file generated
+                _manifest.Record(_ofile_exact, [_solver_file], NewtonSolver.options)
+                _ofiles.append(_ofile_exact)
     
+    # plot machine_time
+    _machine_time_file = os.path.join(_case_output_dir, 'machine_time')
+    _time = 0.0
+    _ofile = os.path.join(_case_img_dir, 'MachineTime.%s' % _file_type)  # ofile has the exact time
+    if os.path.isfile(_machine_time_file) and \
+       (update is True or not _manifest.IsUpToDate(_ofile, [_machine_time_file], MachineTime.options)):
+        try:
+            _ofile_exact = MachineTime(_machine_time_file, fileout=_ofile)
+        except Exception as e:
+            raise Exception("Plot MachineTime file failed for %s, please chech file content.\
+One option is to delete incorrect file before running again" % _machine_time_file) from e
+        else:
+            if _ofile_exact is not None:
+                # output when there is file generated
+                _manifest.Record(_ofile_exact, [_machine_time_file], MachineTime.options)
+                _ofiles.append(_ofile_exact)
+    return _ofiles
+
+
+class ProjectPlotWarning(UserWarning):
+    # handle the circumstance that plotting for some cases failed
     pass
 
 
+def ProjectPlotCases(_plot_case, case_dirs, **kwargs):
+    '''
+    Plot for cases in serial or with a pool of processes.
+    A failure in one case doesn't stop plotting for other cases. Figures generated
+    are printed in the order of cases and failures are summarized in the end.
+    Inputs:
+        _plot_case(function): plot for one case, it takes the directory of the case and returns
+            a list of figures generated. To be used with a pool of processes, this has to be
+            a function at module level (or a functools.partial of one)
+        case_dirs(list): directories of cases
+        kwargs:
+            workers(int): number of processes, default is 1, which means plotting in serial
+    Returns:
+        _failures(dict): cases failed, values are error messages
+    '''
+    workers = kwargs.get('workers', 1)
+    my_assert(type(workers) == int and workers >= 1, ValueError,
+              'ProjectPlotCases: workers must be a positive int')
+    _try_plot_case = functools.partial(_TryPlotCase, _plot_case)
+    if workers == 1 or len(case_dirs) <= 1:
+        _results = map(_try_plot_case, case_dirs)
+    else:
+        # use the non-interactive backend in processes
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_InitPlotWorker) as executor:
+            _results = list(executor.map(_try_plot_case, case_dirs))
+    _failures = {}
+    for _case_dir, (_ofiles, _error) in zip(case_dirs, _results):
+        for _ofile in _ofiles:
+            print('Plot has been generated: ', _ofile)  # screen output
+        if _error is not None:
+            _failures[_case_dir] = _error
+    if len(_failures) > 0:
+        _summary = '\n'.join(['%s: %s' % (_case_dir, _error) for _case_dir, _error in _failures.items()])
+        warnings.warn('ProjectPlotCases: plot failed for %d cases\n%s' % (len(_failures), _summary),
+                      ProjectPlotWarning)
+    return _failures
+
+
+def _InitPlotWorker():
+    '''
+    initiate a process for plotting, use the non-interactive backend
+    '''
+    plt.switch_backend('Agg')
+
+
+def _TryPlotCase(_plot_case, _case_dir):
+    '''
+    Plot for a case and catch the error
+    Returns:
+        _ofiles(list): figures generated
+        _error(str): error message, None if there is no error
+    '''
+    try:
+        _ofiles = _plot_case(_case_dir)
+    except Exception as e:
+        _error = str(e)
+        if e.__cause__ is not None:
+            _error += ' (%s: %s)' % (type(e.__cause__).__name__, str(e.__cause__))
+        return [], _error
+    return _ofiles, None
+
+
 # a main function
 # todo
 def main():
@@ -0,0 +1,457 @@
+import re
+import os
+import sys
+import json
+import hashlib
+import argparse
+import warnings
+import numpy as np
+from shilofue.Utilities import my_assert, WriteFileHeader, ReadHeader, ReadHeaderTexts, LoadTable,\
+    LoadTableCache, SaveTableCache
+
+'''
+Parse solver information from the stdout file of aspect.
+The stdout file is read once as a stream, instead of searching for every timestep
+in the file, which makes the cost linear in the size of the file.
+A checkpoint is saved next to the output, so that a refresh of a running case
+only parses the bytes appended to the stdout file.
+The solver_output files of cases are loaded into one table to analyze the
+newton solver for all cases at once.
+'''
+
+# header of the solver_output file
+SOLVER_OUTPUT_HEADER = {
+    'Time step number': {'col': 0},
+    'Index of nonlinear iteration': {'col': 1},
+    'Relative nonlinear residual': {'col': 2},
+    'Norms of the rhs': {'col': 3},
+    'Newton Derivative Scaling Factor': {'col': 4}
+}
+
+# columns of the table of solver outputs of cases, see LoadSolverOutputs
+SOLVER_TABLE_COLUMNS = ['Case', 'Time_step_number', 'Index_of_nonlinear_iteration', 'Relative_nonlinear_residual']
+
+# precompiled patterns, the stdout file is read in binary mode
+_TIMESTEP_PATTERN = re.compile(rb'Timestep (\d+)')
+_RESIDUAL_PATTERN = re.compile(rb'nonlinear iteration \d+: ([^,\s]+)')
+_RHS_PATTERN = re.compile(rb'norm of the rhs: ([^,\s]+)')
+_NDSF_PATTERN = re.compile(rb'newton_derivative_scaling_factor: ([^,\s]+)')
+
+# a block of solver output starts with this key word and ends with a vacant line
+_BLOCK_KEY = b'Rebuilding Stokes'
+
+
+class SolverOutputNotFoundWarning(UserWarning):
+    # handle the circumstance that a block of solver output
+    # doesn't have a nonlinear residual in it
+    pass
+
+
+def ParseSolverBlock(_lines):
+    '''
+    Parse one block of solver output, which starts with 'Rebuilding Stokes'
+    and ends with a vacant line
+    Inputs:
+        _lines(list of bytes): lines in this block
+    Returns:
+        _row(list of str): relative nonlinear residual, norm of the rhs and
+            newton derivative scaling factor. None if there is no nonlinear residual
+            in this block
+    '''
+    for _line in _lines:
+        if b'Relative nonlinear' in _line and b'residual' in _line:
+            _match_obj = _RESIDUAL_PATTERN.search(_line)
+            if _match_obj is None:
+                return None
+            _rnr = _match_obj.group(1).decode()
+            _match_obj = _RHS_PATTERN.search(_line)
+            _nor = _match_obj.group(1).decode() if _match_obj else ''
+            # if value is not present, append by 0
+            _match_obj = _NDSF_PATTERN.search(_line)
+            _ndsf = _match_obj.group(1).decode() if _match_obj else '0'
+            return [_rnr, _nor, _ndsf]
+    return None
+
+
+def SolverOutputSteps(fin, **kwargs):
+    '''
+    A generator that reads a stdout file as a stream and yields outputs
+    from the solver for each complete time step.
+    A time step is complete when the line of the next time step is read,
+    thus the last time step in the file is not yielded.
+    Inputs:
+        fin(file object): stdout file opened for read in binary mode ('rb')
+        kwargs:
+            end(int): stop reading when this step is reached
+    Yields:
+        _timestep(int): time step
+        _rows(list of list): solver outputs at every nonlinear iteration
+            of this step, each member is the return value of ParseSolverBlock
+        _offset(int): byte offset of the line that starts the next step,
+            reading could be resumed from there
+    '''
+    end = kwargs.get('end', None)
+    _timestep = None
+    _rows = []
+    _block = None
+    _offset = fin.tell()
+    for _line in fin:
+        _line_offset = _offset
+        _offset += len(_line)
+        if b'Timestep' in _line:
+            _match_obj = _TIMESTEP_PATTERN.search(_line)
+            if _match_obj is not None:
+                # hit the next step, the previous step is complete
+                if _timestep is not None:
+                    yield _timestep, _rows, _line_offset
+                _timestep = int(_match_obj.group(1))
+                _rows = []
+                _block = None
+                if end is not None and _timestep >= end:
+                    return
+                continue
+        if _timestep is None:
+            # skip contents before the first step
+            continue
+        if _block is None:
+            if _BLOCK_KEY in _line:
+                _block = [_line]
+        elif _line == b'\n':
+            # hit vacant line, finish this block
+            _row = ParseSolverBlock(_block)
+            if _row is None:
+                warnings.warn('SolverOutputSteps: %s doesn\'t have solver outputs' % fin.name,
+                              SolverOutputNotFoundWarning)
+                return
+            _rows.append(_row)
+            _block = None
+        else:
+            _block.append(_line)
+
+
+def WriteSolverRows(fout, _timestep, _rows):
+    '''
+    Write outputs of a step to a solver_output file
+    Inputs:
+        fout(file object): file opened for write
+        _timestep(int): time step
+        _rows(list of list): outputs from SolverOutputSteps
+    '''
+    _contents = ''
+    for i in range(len(_rows)):
+        _contents += "%-15s %-15s %-15s %-15s %s\n" % (_timestep, i, _rows[i][0], _rows[i][1], _rows[i][2])
+    fout.write(_contents)
+
+
+def ParseSolverOutput(filein, fileout, **kwargs):
+    '''
+    Parse solver outputs from a stdout file to a solver_output file
+    Inputs:
+        filein(str): stdout file from aspect
+        fileout(str): file to output to
+        kwargs:
+            start(int): first step to output
+            interval(int): interval between steps to output
+            end(int): output steps before this step
+    Returns:
+        _total(int): number of steps written
+    '''
+    start = kwargs.get('start', 0)
+    interval = kwargs.get('interval', 1)
+    end = kwargs.get('end', None)
+    my_assert(os.access(filein, os.R_OK), FileNotFoundError,
+              'ParseSolverOutput: stdout file - %s cannot be read' % filein)
+    my_assert(type(interval) == int and interval > 0, ValueError,
+              'ParseSolverOutput: interval must be a positive int')
+    WriteFileHeader(fileout, SOLVER_OUTPUT_HEADER)
+    _total = 0
+    with open(filein, 'rb') as fin, open(fileout, 'a') as fout:
+        for _timestep, _rows, _ in SolverOutputSteps(fin, end=end):
+            if _timestep < start or (_timestep - start) % interval != 0:
+                continue
+            WriteSolverRows(fout, _timestep, _rows)
+            _total += 1
+    return _total
+
+
+def StdoutHeader(filein):
+    '''
+    Get the header of a stdout file, i.e. contents before the first time step.
+    This header includes job information and is used to recognize a stdout file.
+    Inputs:
+        filein(str): stdout file from aspect
+    Returns:
+        _length(int): length of the header in bytes
+        _hash(str): md5 hash of the header
+        Both are None if the first time step is not reached yet
+    '''
+    _md5 = hashlib.md5()
+    _length = 0
+    with open(filein, 'rb') as fin:
+        for _line in fin:
+            if b'Timestep' in _line and _TIMESTEP_PATTERN.search(_line):
+                return _length, _md5.hexdigest()
+            _md5.update(_line)
+            _length += len(_line)
+    return None, None
+
+
+def ReadSolverCheckpoint(filein, fileout, _checkpoint_file, _options):
+    '''
+    Read a checkpoint and check it is still valid for filein and fileout
+    Inputs:
+        filein(str): stdout file from aspect
+        fileout(str): solver_output file
+        _checkpoint_file(str): checkpoint file
+        _options(dict): start, interval and end used to parse
+    Returns:
+        _checkpoint(dict): the checkpoint, None if it is not valid
+    '''
+    if not (os.path.isfile(_checkpoint_file) and os.path.isfile(fileout)):
+        return None
+    try:
+        with open(_checkpoint_file, 'r') as fin:
+            _checkpoint = json.load(fin)
+        # the output must be the same as it was left,
+        # and the stdout file must only get appended
+        _valid = (_checkpoint['stdout'] == os.path.abspath(filein) and
+                  _checkpoint['options'] == _options and
+                  _checkpoint['output_size'] == os.path.getsize(fileout) and
+                  _checkpoint['offset'] <= os.path.getsize(filein))
+    except (ValueError, KeyError):
+        return None
+    if not _valid:
+        return None
+    with open(filein, 'rb') as fin:
+        _header = fin.read(_checkpoint['header_length'])
+    if hashlib.md5(_header).hexdigest() != _checkpoint['header_hash']:
+        return None
+    return _checkpoint
+
+
+def UpdateSolverOutput(filein, fileout, **kwargs):
+    '''
+    Parse solver outputs from a stdout file to a solver_output file incrementally.
+    A checkpoint (fileout + '.checkpoint') records the byte offset to resume from,
+    the last complete time step and a hash of the header of the stdout file.
+    If the checkpoint is valid, only the newly appended part of the stdout file is parsed
+    and rows are appended to fileout, otherwise the whole file is parsed again.
+    Inputs:
+        filein(str): stdout file from aspect
+        fileout(str): file to output to
+        kwargs:
+            start(int): first step to output
+            interval(int): interval between steps to output
+            end(int): output steps before this step
+    Returns:
+        _total(int): number of steps written in this update
+    '''
+    start = kwargs.get('start', 0)
+    interval = kwargs.get('interval', 1)
+    end = kwargs.get('end', None)
+    my_assert(os.access(filein, os.R_OK), FileNotFoundError,
+              'UpdateSolverOutput: stdout file - %s cannot be read' % filein)
+    my_assert(type(interval) == int and interval > 0, ValueError,
+              'UpdateSolverOutput: interval must be a positive int')
+    _options = {'start': start, 'interval': interval, 'end': end}
+    _checkpoint_file = fileout + '.checkpoint'
+    _checkpoint = ReadSolverCheckpoint(filein, fileout, _checkpoint_file, _options)
+    if _checkpoint is None:
+        # start over
+        _header_length, _header_hash = StdoutHeader(filein)
+        _checkpoint = {'stdout': os.path.abspath(filein), 'options': _options,
+                       'header_length': _header_length, 'header_hash': _header_hash,
+                       'offset': 0, 'last_step': None}
+        WriteFileHeader(fileout, SOLVER_OUTPUT_HEADER)
+    _total = 0
+    with open(filein, 'rb') as fin, open(fileout, 'a') as fout:
+        fin.seek(_checkpoint['offset'])
+        for _timestep, _rows, _offset in SolverOutputSteps(fin, end=end):
+            if _timestep >= start and (_timestep - start) % interval == 0:
+                WriteSolverRows(fout, _timestep, _rows)
+                _total += 1
+            _checkpoint['offset'] = _offset
+            _checkpoint['last_step'] = _timestep
+    # save checkpoint, only when the header of the stdout file is complete
+    if _checkpoint['header_hash'] is not None:
+        _checkpoint['output_size'] = os.path.getsize(fileout)
+        with open(_checkpoint_file, 'w') as fout:
+            json.dump(_checkpoint, fout)
+    return _total
+
+
+def LoadSolverOutput(filein, **kwargs):
+    '''
+    Load the columns in SOLVER_TABLE_COLUMNS (except for 'Case') of a solver_output file
+    Inputs:
+        filein(str): a solver_output file
+        kwargs:
+            cache(bool): use the sidecar cache of the file, default is True
+    Returns:
+        _data(ndarray): 2-d array of data, this has 0 rows if the file doesn't exist or has no data
+    '''
+    cache = kwargs.get('cache', True)
+    _n_cols = len(SOLVER_TABLE_COLUMNS) - 1
+    if not os.path.isfile(filein):
+        return np.zeros((0, _n_cols))
+    _cached = LoadTableCache(filein) if cache else None
+    if _cached is not None:
+        _header = ReadHeader(_cached[0])
+        _table = _cached[1]
+    else:
+        _stat = os.stat(filein)
+        _header, _table = LoadTable(filein)
+        if cache and _table.shape[0] > 0:
+            SaveTableCache(filein, _stat, ReadHeaderTexts(filein), _table)
+    if _table.shape[0] == 0:
+        return np.zeros((0, _n_cols))
+    return _table[:, [_header[key]['col'] for key in SOLVER_TABLE_COLUMNS[1:]]]
+
+
+def LoadSolverOutputs(files, **kwargs):
+    '''
+    Load solver_output files of cases into one table, with the index of case in the first column
+    Inputs:
+        files(list of str): solver_output files of cases, files that don't exist are taken as vacant
+        kwargs:
+            cache(bool): use the sidecar caches of files, default is True
+    Returns:
+        _data(ndarray): columns are SOLVER_TABLE_COLUMNS, rows of a case are contiguous
+            and cases are in the order of files
+    '''
+    cache = kwargs.get('cache', True)
+    _tables = [np.zeros((0, len(SOLVER_TABLE_COLUMNS)))]
+    for i, filein in enumerate(files):
+        _table = LoadSolverOutput(filein, cache=cache)
+        _tables.append(np.column_stack((np.full(_table.shape[0], float(i)), _table)))
+    return np.concatenate(_tables)
+
+
+def CaseBounds(_data, n_cases):
+    '''
+    Rows of cases in a table from LoadSolverOutputs
+    Inputs:
+        _data(ndarray): table from LoadSolverOutputs
+        n_cases(int): number of cases
+    Returns:
+        _bounds(ndarray): rows of case i are _bounds[i]: _bounds[i+1]
+    '''
+    return np.searchsorted(_data[:, 0], np.arange(n_cases + 1))
+
+
+def NonlinearIterationNumbers(_data, n_cases):
+    '''
+    Number of nonlinear iteration in a case, counted from the first row of every case
+    Inputs:
+        _data(ndarray): table from LoadSolverOutputs
+        n_cases(int): number of cases
+    Returns:
+        _numbers(ndarray): for every row in _data
+    '''
+    _bounds = CaseBounds(_data, n_cases)
+    return np.arange(_data.shape[0]) - _bounds[_data[:, 0].astype(int)]
+
+
+def NewtonSolverStats(_data, n_cases, **kwargs):
+    '''
+    Statistics of the newton solver of every case, computed for all cases at once.
+    A step is a run of rows with the same case and time step number.
+    Inputs:
+        _data(ndarray): table from LoadSolverOutputs
+        n_cases(int): number of cases
+        kwargs:
+            max_iterations(float or array): maximum number of nonlinear iterations in a step,
+                for all cases or for every case. Steps with this number of iterations hit the cap.
+                nan means the maximum is unknown, default is nan.
+    Returns:
+        _stats(dict): arrays of length n_cases
+            steps: number of steps
+            iterations: number of nonlinear iterations
+            mean_iterations: mean number of nonlinear iterations in a step
+            max_iterations: maximum number of nonlinear iterations in a step
+            reduction_rate: reduction of the residual in an iteration, i.e. the geometric mean of
+                ratios of residuals of adjacent iterations in a step, averaged over steps
+            steps_at_cap: number of steps that hit the cap, nan if the cap is unknown
+    '''
+    max_iterations = np.broadcast_to(np.asarray(kwargs.get('max_iterations', np.nan), dtype=float), (n_cases,))
+    _case = _data[:, 0].astype(int)
+    _step = _data[:, 1]
+    _residual = _data[:, 3]
+    # first rows of steps
+    _is_first = np.ones(_data.shape[0], dtype=bool)
+    _is_first[1:] = (_case[1:] != _case[:-1]) | (_step[1:] != _step[:-1])
+    _starts = np.flatnonzero(_is_first)
+    _counts = np.diff(np.append(_starts, _data.shape[0]))
+    _step_case = _case[_starts]
+    _first = _residual[_starts]
+    _last = _residual[_starts + _counts - 1]
+    # reduction rate of steps with more than one iteration and positive residuals
+    _valid = (_counts > 1) & (_first > 0.0) & (_last > 0.0)
+    _rates = np.ones(_starts.size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        _rates[_valid] = np.exp(np.log(_last[_valid] / _first[_valid]) / (_counts[_valid] - 1))
+        _stats = {}
+        _stats['steps'] = np.bincount(_step_case, minlength=n_cases)
+        _stats['iterations'] = np.bincount(_step_case, weights=_counts, minlength=n_cases).astype(int)
+        _stats['mean_iterations'] = _stats['iterations'] / _stats['steps']
+        _stats['max_iterations'] = np.zeros(n_cases, dtype=int)
+        np.maximum.at(_stats['max_iterations'], _step_case, _counts)
+        _stats['reduction_rate'] = np.bincount(_step_case[_valid], weights=_rates[_valid], minlength=n_cases) /\
+            np.bincount(_step_case[_valid], minlength=n_cases)
+    _at_cap = _counts >= max_iterations[_step_case]
+    _stats['steps_at_cap'] = np.bincount(_step_case[_at_cap], minlength=n_cases).astype(float)
+    _stats['steps_at_cap'][np.isnan(max_iterations)] = np.nan
+    return _stats
+
+
+def main():
+    '''
+    main function of this module
+    Inputs:
+        sys.arg[1](str):
+            commend
+        sys.arg[2, :](str):
+            options
+    '''
+    _commend = sys.argv[1]
+    # parse options
+    parser = argparse.ArgumentParser(description='Parse solver outputs')
+    parser.add_argument('-i', '--inputs', type=str,
+                        default='',
+                        help='A stdout file from aspect')
+    parser.add_argument('-o', '--outputs', type=str,
+                        default='solver_output',
+                        help='File to output to')
+    parser.add_argument('-l', '--vlist', type=int, nargs=3,
+                        default=None,
+                        help='start step, interval and end step')
+    _options = []
+    try:
+        _options = sys.argv[2: ]
+    except IndexError:
+        pass
+    arg = parser.parse_args(_options)
+
+    # commands
+    if _commend == 'parse_solver_output':
+        # example:
+        #   python -m shilofue.SolverOutput parse_solver_output -i task.stdout -o solver_output -l 0 1 20
+        if arg.vlist is None:
+            ParseSolverOutput(arg.inputs, arg.outputs)
+        else:
+            ParseSolverOutput(arg.inputs, arg.outputs, start=arg.vlist[0], interval=arg.vlist[1], end=arg.vlist[2])
+    elif _commend == 'update_solver_output':
+        # only parse outputs appended to the stdout file since the last call
+        # example:
+        #   python -m shilofue.SolverOutput update_solver_output -i task.stdout -o output/solver_output -l 0 1 20
+        if arg.vlist is None:
+            UpdateSolverOutput(arg.inputs, arg.outputs)
+        else:
+            UpdateSolverOutput(arg.inputs, arg.outputs, start=arg.vlist[0], interval=arg.vlist[1], end=arg.vlist[2])
+    else:
+        raise ValueError('Commend %s is not available.' % _commend)
+
+
+# run script
+if __name__ == '__main__':
+    main()
@@ -5,14 +5,16 @@ import argparse
 import re
 import warnings
 import pdb
+import functools
+import concurrent.futures
 import numpy as np
 import shilofue.Parse as Parse
 import shilofue.Doc as Doc
 import shilofue.Plot as Plot
 import shilofue.Rheology as Rheology
-from numpy import linalg as LA
+import shilofue.ParticleOutput as ParticleOutput
 from matplotlib import pyplot as plt
-from shilofue.Utilities import my_assert, ggr2cart2, cart2sph2, Make2dArray, UNITCONVERT
+from shilofue.Utilities import my_assert, ggr2cart, ggr2cart2, cart2sph2, UNITCONVERT, WriteFileHeader
 
 
 # global varibles
@@ -224,6 +226,121 @@ class MY_PARSE_OPERATIONS(Parse.PARSE_OPERATIONS):
         Inputs["Initial temperature model"] = initial_temperature
 
 
+class SLAB_PARTICLES():
+    '''
+    Generate particles in the initial slab, all particles are generated at once with numpy.
+    The slab follows the geometry of the initial temperature model: it is flat until
+    slab_phi_c and then bends down along an arc of radius Rc, to the tip at slab_to.
+    Particles are put on layers at several depths through the slab and, in 3d, on
+    rows at several latitudes in a chunk.
+    Attributes:
+        slab_phi_c(float): longitude where the slab starts to bend, in radians
+        R0(float): radius of the surface
+        Rc(float): radius of curvature of the slab
+        slab_to(float): depth of the slab tip
+        number(int): number of particles along the slab in each layer and row
+        depths(ndarray): depths of layers
+        spacing(str): 'angle' (uniform in longitude) or 'arc_length' (uniform along the slab,
+            thus denser in longitude where the slab bends)
+        latitudes(ndarray): latitudes of rows, in radians, only used in 3d
+        dimension(int): 2 or 3
+    '''
+    def __init__(self, _config, **kwargs):
+        '''
+        Inputs:
+            _config(dict): configurations, keys are:
+                slab_phi_c, R0, Rc, slab_to: geometry of the slab
+                number_particle_in_slab(int): number of particles along the slab in each layer and row
+                depth_particle_in_slab(float): depth of the first layer
+                layers_particle_in_slab(int): number of layers, default is 1
+                thickness_particle_in_slab(float): distance from the first layer to the last, default is 0.0
+                spacing_particle_in_slab(str): 'angle' (default) or 'arc_length'
+                number_particle_in_latitude(int): number of rows in latitude in 3d, default is 1
+                latitude_particle_in_slab(list): minimum and maximum latitudes of rows in 3d, in radians,
+                    default is [0.0, 0.0]
+            kwargs:
+                dimension(int): 2 or 3, default is 2
+        '''
+        self.slab_phi_c = _config.get("slab_phi_c", 0.628319)
+        self.R0 = _config.get("R0", 6.371e6)
+        self.Rc = _config.get("Rc", 4.0e5)
+        self.slab_to = _config.get("slab_to", 2.0e5)
+        self.number = _config.get("number_particle_in_slab", 1000)
+        my_assert(type(self.number)==int, TypeError, "number_particle_in_slab must be an int value")
+        depth = _config.get("depth_particle_in_slab", 100.0)
+        layers = _config.get("layers_particle_in_slab", 1)
+        my_assert(type(layers)==int and layers >= 1, TypeError, "layers_particle_in_slab must be a positive int value")
+        thickness = _config.get("thickness_particle_in_slab", 0.0)
+        self.depths = np.linspace(depth, depth + thickness, layers)
+        self.spacing = _config.get("spacing_particle_in_slab", "angle")
+        my_assert(self.spacing in ['angle', 'arc_length'], ValueError,
+                  "spacing_particle_in_slab must be 'angle' or 'arc_length'")
+        self.dimension = kwargs.get('dimension', 2)
+        my_assert(self.dimension in [2, 3], ValueError, "dimension must be 2 or 3")
+        rows = _config.get("number_particle_in_latitude", 1)
+        my_assert(type(rows)==int and rows >= 1, TypeError, "number_particle_in_latitude must be a positive int value")
+        lat_min, lat_max = _config.get("latitude_particle_in_slab", [0.0, 0.0])
+        self.latitudes = np.linspace(lat_min, lat_max, rows)
+
+    def PhiSt(self):
+        '''
+        Returns:
+            phi value at the tip of initial slab
+        '''
+        return self.slab_phi_c + (2 * self.Rc * self.slab_to - self.slab_to**2.0)**0.5 / self.R0
+
+    def Radius(self, phi, depth):
+        '''
+        Inputs:
+            phi(ndarray): longitudes, in radians
+            depth(float): depth of a layer
+        Returns:
+            r(ndarray): radius of the layer at phi
+        '''
+        r = np.full(phi.shape, self.R0 - depth)
+        _in_slab = (phi >= self.slab_phi_c)
+        r[_in_slab] = self.R0 + (self.Rc**2.0 - self.R0**2.0 * (phi[_in_slab] - self.slab_phi_c)**2.0)**0.5  - self.Rc - depth
+        return r
+
+    def Phi(self, depth):
+        '''
+        Inputs:
+            depth(float): depth of a layer
+        Returns:
+            phi(ndarray): longitudes of particles in the layer
+        '''
+        phi_st = self.PhiSt()
+        if self.spacing == 'angle':
+            # angle is divided uniformly.
+            return np.arange(self.number) * phi_st / self.number
+        # arc length is divided uniformly, the arc length is integrated on a finer mesh
+        # and inverted by interpolation
+        _phi = np.linspace(0.0, phi_st, 4 * self.number + 1)
+        x, y = ggr2cart2(_phi, self.Radius(_phi, depth))
+        _s = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+        return np.interp(np.arange(self.number) * _s[-1] / self.number, _s, _phi)
+
+    def __call__(self):
+        '''
+        Returns:
+            particle_data(ndarray): coordinates of particles, one particle per row, ordered
+                by layer, then by row in latitude (3d) and then by longitude
+        '''
+        _layers = []
+        for depth in self.depths:
+            phi = self.Phi(depth)
+            r = self.Radius(phi, depth)
+            # apply transform to cartisian coordinates
+            if self.dimension == 2:
+                x, y = ggr2cart2(phi, r)
+                _layers.append(np.column_stack((x, y)))
+            else:
+                lat = np.repeat(self.latitudes, self.number)
+                x, y, z = ggr2cart(lat, np.tile(phi, self.latitudes.size), np.tile(r, self.latitudes.size))
+                _layers.append(np.column_stack((x, y, z)))
+        return np.concatenate(_layers)
+
+
 class MYCASE(Parse.CASE):
     '''
     Inherit from class CASE in Parse.py
@@ -231,36 +348,12 @@ class MYCASE(Parse.CASE):
     def process_particle_data(self):
         '''
         process the coordinates of particle, doing nothing here.
-        Reload here to add particles in the crust
+        Reload here to add particles in the crust, see SLAB_PARTICLES for the options
         '''
         # all configurations
         _config = { **self.config, **self.test, **self.extra }
-        # import values
-        slab_phi_c = _config.get("slab_phi_c", 0.628319)
-        R0 = _config.get("R0", 6.371e6)
-        Rc = _config.get("Rc", 4.0e5)
-        slab_to = _config.get("slab_to", 2.0e5)
-        depth_particle_in_slab = _config.get("depth_particle_in_slab", 100.0)
-        number_particle_in_slab = _config.get("number_particle_in_slab", 1000)
-        my_assert(type(number_particle_in_slab)==int, TypeError, "number_particle_in_slab must be an int value")
-        # initiate particle_data
-        self.particle_data = np.zeros((number_particle_in_slab, 2))
-        # get phi value at the tip of initial slab
-        phi_st = slab_phi_c + (2 * Rc * slab_to - slab_to**2.0)**0.5 / R0
-        for i in range(number_particle_in_slab):
-            # get particle coordinates
-            # First, angle is divided uniformly.
-            # Then, radius is computed accordingly.
-            phi = i * phi_st / number_particle_in_slab
-            if phi < slab_phi_c:
-                r = R0 - depth_particle_in_slab
-            else:
-                r = R0 + (Rc**2.0 - R0**2.0 * (phi - slab_phi_c)**2.0)**0.5  - Rc - depth_particle_in_slab
-            # apply transform to cartisian coordinates
-            x, y = ggr2cart2(phi, r)
-            # assign value in particle_data
-            self.particle_data[i, 0] = x
-            self.particle_data[i, 1] = y
+        dimension = int(self.idict.get('Dimension', '2'))
+        self.particle_data = SLAB_PARTICLES(_config, dimension=dimension)()
 
 
 class VISIT_OPTIONS(Parse.VISIT_OPTIONS):
@@ -319,60 +412,100 @@ class VISIT_XYZ(Parse.VISIT_XYZ):
                 radius(float): radius of the earth
                 depth_ranges(float): ranges of depth to compute dip angle
         """
+        # sort by id
+        col_id = self.column_indexes['id']
+        self.data = self.data[self.data[:, col_id].argsort()]
+        # analyze as a series of a single snapshot
+        _kwargs = dict(kwargs)
+        try:
+            _kwargs['time'] = np.array([kwargs['time']])
+        except KeyError:
+            pass
+        self.output_data = self.AnalyzeSnapshots(self.data[np.newaxis], _kwargs)
+
+    def AnalyzeSnapshots(self, data, kwargs):
+        """
+        analyze data of a series of snapshots, all snapshots are computed at once
+        Args:
+            data(nparray): data stacked by snapshots, particles in every snapshot
+                are sorted by id, see ReadSnapshots
+            kwargs(dict): options
+                radius(float): radius of the earth
+                depth_ranges(float): ranges of depth to compute dip angle
+                time(nparray): times of snapshots
+        Returns:
+            output_data(nparray): one row per snapshot
+        """
         # get options
         col_x = self.column_indexes['x']
         col_y = self.column_indexes['y']
-        col_id = self.column_indexes['id']
         radius = kwargs.get("radius", 6371e3)
 
-        # sort by id
-        self.data = self.data[self.data[:, col_id].argsort()]
-
         # transfer to sph
-        x = self.data[:, col_x]
-        y = self.data[:, col_y]
+        x = data[:, :, col_x]
+        y = data[:, :, col_y]
         r, ph = cart2sph2(x, y)
         depth = radius - r
 
         # get maximum depth
-        max_depth = np.max(depth)
+        max_depth = np.max(depth, axis=1)
 
         # get trench position
         # a depth for trench, in m
         trench_depth = kwargs.get('trench_depth', 1e3)
         mask_slab = (depth > trench_depth)
-        trench_position = ph[mask_slab][0]
+        my_assert(np.all(np.any(mask_slab, axis=1)), ValueError,
+                  "VISIT_XYZ.AnalyzeSnapshots: no particle is deeper than trench_depth")
+        trench_position = ph[np.arange(data.shape[0]), np.argmax(mask_slab, axis=1)]
 
         # get length of slab
         # both length and dip has n-1 component because they are computed on the intervals between 2 points
-        length = ((r[0: -1] - r[1:])**2.0 + r[0: -1]**2.0*(ph[0: -1] - ph[1:])**2.0)**0.5
-        slab_length = LA.norm(length, 1)
+        length = ((r[:, 0: -1] - r[:, 1:])**2.0 + r[:, 0: -1]**2.0*(ph[:, 0: -1] - ph[:, 1:])**2.0)**0.5
+        slab_length = np.sum(length, axis=1)
 
         # get dip angle
-        dip = SlabDip(r[0: -1], ph[0: -1], r[1:], ph[1:])
+        dip = SlabDip(r[:, 0: -1], ph[:, 0: -1], r[:, 1:], ph[:, 1:])
 
         # get average curvature in depth range
         depth_ranges = kwargs.get('depth_ranges', [[0.0, 6371e3]])
         my_assert(type(depth_ranges) is list, TypeError, "VISIT_XYZ.Analyze: depth_ranges must be a list")
-        dips_in_ranges = np.zeros(len(depth_ranges))
+        dips_in_ranges = np.zeros((data.shape[0], len(depth_ranges)))
         limit = 1e-6
         for i in range(len(depth_ranges)):
             depth_range = depth_ranges[i]
             mask_range = (dip > depth_range[0]) * (dip < depth_range[1])
-            total = dip[mask_range].dot(length[mask_range])
-            weight = LA.norm(length[mask_range], 1)
-            if weight < limit:
-                # i.e. max_depth < depth_range[1]
-                dips_in_ranges[i] = 0.0
-            else:
-                dips_in_ranges[i] = total / weight
+            length_in_range = np.where(mask_range, length, 0.0)
+            total = np.sum(dip * length_in_range, axis=1)
+            weight = np.sum(length_in_range, axis=1)
+            # weight < limit, i.e. max_depth < depth_range[1]
+            dips_in_ranges[:, i] = np.divide(total, weight, out=np.zeros(data.shape[0]), where=(weight >= limit))
     
         # construct header
+        self.output_header = self.OutputHeader(kwargs)
+
+        # manage output
         # append time if present
         try:
             _time = kwargs['time']
         except KeyError:
-            self.output_header = {
+            output_data = np.column_stack((max_depth, trench_position, slab_length, dips_in_ranges))
+        else:
+            output_data = np.column_stack((_time, max_depth, trench_position, slab_length, dips_in_ranges))
+        return output_data
+
+
+    def OutputHeader(self, kwargs):
+        """
+        header of output
+        Args:
+            kwargs(dict): options, see AnalyzeSnapshots
+        Returns:
+            output_header(dict)
+        """
+        depth_ranges = kwargs.get('depth_ranges', [[0.0, 6371e3]])
+        # append time if present
+        if 'time' not in kwargs:
+            output_header = {
              'Maximum depth': {'col': 0, 'unit': self.header['x']['unit']},
              'Trench position': {'col': 1, 'unit': 'rad'},
              'Slab length': {'col': 2, 'unit': self.header['x']['unit']}
@@ -380,7 +513,7 @@ class VISIT_XYZ(Parse.VISIT_XYZ):
             total_cols = 3
         else:
             _time_unit = kwargs.get('time_unit', 'yr')
-            self.output_header = {
+            output_header = {
              'Time': {'col': 0, 'unit': _time_unit},
              'Maximum depth': {'col': 1, 'unit': self.header['x']['unit']},
              'Trench position': {'col': 2, 'unit': 'rad'},
@@ -389,19 +522,8 @@ class VISIT_XYZ(Parse.VISIT_XYZ):
             total_cols = 4
         for i in range(len(depth_ranges)):
             key = 'Dip angle %d_%d (rad)' % (int(depth_ranges[i][0]), int(depth_ranges[i][1]))
-            self.output_header[key] = {'col': i+total_cols}
-
-        # manage output
-        # append time if present
-        try:
-            _time = kwargs['time']
-        except KeyError:
-            output_data_temp = [max_depth, trench_position, slab_length]
-        else:
-            output_data_temp = [_time, max_depth, trench_position, slab_length]
-        for i in range(len(depth_ranges)):
-            output_data_temp.append(dips_in_ranges[i])
-        self.output_data = Make2dArray(output_data_temp)
+            output_header[key] = {'col': i+total_cols}
+        return output_header
 
 
 class SLAB_MORPH_PLOT(Plot.LINEARPLOT):
@@ -460,9 +582,23 @@ def SlabDip(r0, ph0, r1, ph1):
 def SlabMorph(case_dir, kwargs={}):
     """
     Slab morphology
+    Snapshots are analyzed by a pool of processes and results are written in the order
+    of snapshots, to a temporary file that then replaces the output, thus the output is
+    never truncated. Snapshots already in the output are not analyzed again, and the
+    output is complete up to the first snapshot that fails.
     Inputs:
         case_dir(str): directory of case
         kwargs(dict): options
+            depth_ranges(list): ranges of depth to compute dip angle
+            cache(int): cache data read next to the files, default is 1
+            workers(int): number of processes, default is 1
+            resume(int): keep results of snapshots in the output, default is 1.
+                The output is generated again if its header or times don't match.
+            reader(str): 'vtu' reads particle output of aspect (output/particles.visit) directly,
+                'xyz' reads .xyz files exported by visit (output/slab_morphs). default is 'auto',
+                which uses 'vtu' if the particle output is there
+    Returns:
+        number of snapshots in the output
     """
     case_output_dir = os.path.join(case_dir, 'output')
     case_morph_dir = os.path.join(case_output_dir, 'slab_morphs')
@@ -477,23 +613,185 @@ def SlabMorph(case_dir, kwargs={}):
         'y': {'col': 2, 'unit': 'm' },
         'id': {'col': 4}
     }
+    Visit_Xyz.header = header
 
     # depth range
     # this is for computing dip angles with different ranges
     depth_ranges = kwargs.get('depth_ranges', [[0, 100e3], [100e3, 400e3], [400e3, 6371e3]])
     my_assert(type(depth_ranges) == list, TypeError, "depth_ranges mush be a list")
+    workers = kwargs.get('workers', 1)
+    my_assert(type(workers) == int and workers >= 1, ValueError, "workers must be a positive int")
+    cache = bool(kwargs.get('cache', 1))
+
+    reader = kwargs.get('reader', 'auto')
+    my_assert(reader in ['auto', 'vtu', 'xyz'], ValueError, "reader must be 'auto', 'vtu' or 'xyz'")
+    particle_file = os.path.join(case_output_dir, 'particles.visit')
+    if reader == 'auto':
+        reader = 'vtu' if ParticleOutputExists(particle_file) else 'xyz'
+    if reader == 'vtu':
+        # read particle output of aspect directly
+        snap_times, visit_xyz_files = ParticleOutput.ReadVisitRecord(particle_file)
+        if snap_times is None:
+            # times are not in particles.visit, take them from the statistics file
+            _, times, _ = Parse.GetSnapsSteps(case_dir, 'particle')
+            my_assert(len(times) >= len(visit_xyz_files), ValueError,
+                      'SlabMorph: %s has %d snapshots, only %d times of particle output are found in the statistics file'
+                      % (particle_file, len(visit_xyz_files), len(times)))
+            snap_times = times[: len(visit_xyz_files)]
+        snaps = list(range(len(visit_xyz_files)))
+    else:
+        # .xyz files exported by visit
+        snaps, times, _= Parse.GetSnapsSteps(case_dir, 'particle')
+        visit_xyz_files = [os.path.join(case_morph_dir, 'visit_particles_%06d.xyz' % i) for i in snaps]
+        snap_times = [times[i] for i in snaps]
 
-    # remove older results 
+    # write header to a temporary file
     ofile = os.path.join(case_output_dir, 'slab_morph') 
-    if os.path.isfile(ofile):
-        os.remove(ofile)
-    
-    #   loop for every snap and call function
-    snaps, times, _= Parse.GetSnapsSteps(case_dir, 'particle')
+    _temp_file = '%s.%d.tmp' % (ofile, os.getpid())
+    WriteFileHeader(_temp_file, Visit_Xyz.OutputHeader({'depth_ranges': depth_ranges, 'time': None}))
+    try:
+        with open(_temp_file, 'r') as fin:
+            _header_lines = fin.readlines()
+
+        # results in the output
+        _lines = []
+        if kwargs.get('resume', 1):
+            _lines = SlabMorphLines(ofile, _header_lines, snap_times)
+        n_done = len(_lines)
+
+        # analyze snapshots not in the output
+        _rows, _error = SlabMorphSnapshots(visit_xyz_files[n_done:], snap_times[n_done:], header=header,
+                                           depth_ranges=depth_ranges, cache=cache, workers=workers)
+        with open(_temp_file, 'a') as fout:
+            fout.writelines(_lines)
+            if _rows.shape[0] > 0:
+                np.savetxt(fout, _rows, fmt='%-20.8e')
+        os.replace(_temp_file, ofile)
+    except BaseException:
+        if os.path.isfile(_temp_file):
+            os.remove(_temp_file)
+        raise
+    if _error is not None:
+        warnings.warn('SlabMorph: output stops at snapshot %d of %d, %s' % (n_done + _rows.shape[0], len(snaps), _error),
+                      SlabMorphWarning)
+    return n_done + _rows.shape[0]
+
+
+def ParticleOutputExists(particle_file):
+    """
+    Inputs:
+        particle_file(str): particles.visit of a case
+    Returns:
+        True if particle_file and files of its first snapshot exist
+    """
+    if not os.path.isfile(particle_file):
+        return False
+    _, snapshots = ParticleOutput.ReadVisitRecord(particle_file)
+    return len(snapshots) > 0 and all(os.path.isfile(_file) for _file in snapshots[0])
+
+
+class SlabMorphWarning(UserWarning):
+    # handle the circumstance that some snapshots couldn't be analyzed
+    pass
+
 
-    for i in snaps:
-        visit_xyz_file = os.path.join(case_morph_dir, 'visit_particles_%06d.xyz' % i)
-        Visit_Xyz(visit_xyz_file, header=header, ofile=ofile, depth_ranges=depth_ranges, time=times[i])
+def SlabMorphLines(ofile, _header_lines, snap_times):
+    """
+    Lines of results in an existing output of SlabMorph
+    Inputs:
+        ofile(str): output of SlabMorph
+        _header_lines(list): lines of the header expected
+        snap_times(list): times of snapshots
+    Returns:
+        _lines(list): lines of results, one line for each snapshot from the first.
+            This is empty if the header doesn't match, or times don't match.
+    """
+    if not os.path.isfile(ofile):
+        return []
+    with open(ofile, 'r') as fin:
+        _file_lines = [line for line in fin if line.strip() != '']
+    if _file_lines[: len(_header_lines)] != _header_lines:
+        return []
+    _lines = _file_lines[len(_header_lines):]
+    if len(_lines) == 0 or len(_lines) > len(snap_times):
+        return []
+    try:
+        _times = np.array([float(line.split(maxsplit=1)[0]) for line in _lines])
+    except ValueError:
+        return []
+    if not np.allclose(_times, snap_times[: len(_lines)], rtol=1e-7):
+        return []
+    return _lines
+
+
+def SlabMorphSnapshots(visit_xyz_files, snap_times, **kwargs):
+    """
+    Analyze snapshots for SlabMorph, in chunks with a pool of processes
+    Inputs:
+        visit_xyz_files(list): files of snapshots
+        snap_times(list): times of snapshots
+        kwargs:
+            header(dict), depth_ranges(list), cache(bool): options for VISIT_XYZ.Batch
+            workers(int): number of processes, default is 1
+    Returns:
+        _rows(ndarray): results, one row for each snapshot, up to the first snapshot that fails
+        _error(str): error message for the snapshot that fails, None if there is no error
+    """
+    workers = kwargs.get('workers', 1)
+    _options = {key: kwargs[key] for key in ['header', 'depth_ranges', 'cache']}
+    # chunks of snapshots, several chunks for each process to balance the load
+    _size = max(1, min(64, -(-len(visit_xyz_files) // (4 * workers))))
+    _chunks = [(visit_xyz_files[i: i + _size], snap_times[i: i + _size], _options)
+               for i in range(0, len(visit_xyz_files), _size)]
+    _all_rows = []
+    _error = None
+    if workers == 1:
+        _results = map(_SlabMorphChunk, _chunks)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        _results = executor.map(_SlabMorphChunk, _chunks)
+    try:
+        # results are collected in order, until a chunk fails
+        for _rows, _error in _results:
+            _all_rows.append(_rows)
+            if _error is not None:
+                break
+    finally:
+        if workers > 1:
+            executor.shutdown(wait=True, cancel_futures=True)
+    _columns = 4 + len(kwargs['depth_ranges'])
+    _all_rows = [_rows for _rows in _all_rows if _rows.size > 0]
+    if len(_all_rows) == 0:
+        return np.zeros((0, _columns)), _error
+    return np.concatenate(_all_rows), _error
+
+
+def _SlabMorphChunk(_chunk):
+    """
+    Analyze a chunk of snapshots, if it fails, snapshots are analyzed one by one
+    to get results before the snapshot that fails
+    Inputs:
+        _chunk(tuple): files, times and options for VISIT_XYZ.Batch
+    Returns:
+        _rows(ndarray): results
+        _error(str): error message, None if there is no error
+    """
+    visit_xyz_files, snap_times, _options = _chunk
+    Visit_Xyz = VISIT_XYZ()
+    try:
+        Visit_Xyz.Batch(visit_xyz_files, times=snap_times, **_options)
+        return Visit_Xyz.output_data, None
+    except Exception:
+        pass
+    _all_rows = []
+    for visit_xyz_file, snap_time in zip(visit_xyz_files, snap_times):
+        try:
+            Visit_Xyz.Batch([visit_xyz_file], times=[snap_time], **_options)
+        except Exception as e:
+            _rows = np.array(_all_rows) if len(_all_rows) > 0 else np.zeros((0, 0))
+            return _rows, '%s: %s' % (type(e).__name__, str(e))
+        _all_rows.append(Visit_Xyz.output_data[0])
+    return np.array(_all_rows), None
 
 
 def ProjectPlot(case_dirs, _file_type, **kwargs):
@@ -502,10 +800,32 @@ def ProjectPlot(case_dirs, _file_type, **kwargs):
     Inputs:
         kwargs:
             update(True or False): if True, update existing figures
+            pdict(dict): options for plotting
+            workers(int): number of processes to plot with, default is 1
+    Returns:
+        _failures(dict): cases failed, values are error messages
     '''
     # future: not used, may remove
     update = kwargs.get('update', False)
     pdict = kwargs.get('pdict', {})
+    workers = kwargs.get('workers', 1)
+    _plot_case = functools.partial(PlotCase, file_type=_file_type, pdict=pdict)
+    return Plot.ProjectPlotCases(_plot_case, case_dirs, workers=workers)
+
+
+def PlotCase(case_dir, **kwargs):
+    '''
+    Plot figures defined in this project for a case
+    Inputs:
+        case_dir(str): directory of case
+        kwargs:
+            file_type(str): type of figures, not used yet, figures are saved as png
+            pdict(dict): options for plotting
+    Returns:
+        ofiles(list): figures generated
+    '''
+    pdict = kwargs.get('pdict', {})
+    ofiles = []
     # Init the UnitConvert class
     UnitConvert = UNITCONVERT()
 
@@ -513,38 +833,38 @@ def ProjectPlot(case_dirs, _file_type, **kwargs):
     plot_options = pdict.get('slab_morph', {})
     Slab_morph_plot = SLAB_MORPH_PLOT('slab_morph', unit_convert=UnitConvert, options=plot_options)
 
-    # loop for cases and post process
-    for case_dir in case_dirs:
-        # first generate slab_morph output
-        img_dir = os.path.join(case_dir, 'img')
-        if not os.path.isdir(img_dir):
-            os.mkdir(img_dir)
-        
-        # conditional plot for slab morph
-        # future extra options
-        # with open(arg.json_file, 'r') as fin:
-        #     dict_in = json.load(fin)
-        #     extra_options = dict_in.get('slab_morph', {})
-        particle_file = os.path.join(case_dir, 'output', 'particles.visit')
-        ofile = os.path.join(img_dir, 'slab_morph.png')
-        is_plot = False
-        if os.path.isfile(particle_file):
-            if not os.path.isfile(ofile) or \
-               os.stat(particle_file)[8] > os.stat(ofile)[8]:
-                is_plot = True
-        if is_plot:
-            # process slab morph with extra options
-            extra_options = {}
-            try:
-                SlabMorph(case_dir, extra_options)
-            except FileNotFoundError:
-                warnings.warn('process_slab_morph: file existence requirements are not met')
-            # then plot the slab morph figure
-            filein = os.path.join(case_dir, 'output', 'slab_morph')
-            # Get options
-            # plot
-            if os.path.isfile(filein):
-                Slab_morph_plot(filein, fileout=ofile)
+    # first generate slab_morph output
+    img_dir = os.path.join(case_dir, 'img')
+    if not os.path.isdir(img_dir):
+        os.mkdir(img_dir)
+
+    # conditional plot for slab morph
+    # future extra options
+    # with open(arg.json_file, 'r') as fin:
+    #     dict_in = json.load(fin)
+    #     extra_options = dict_in.get('slab_morph', {})
+    particle_file = os.path.join(case_dir, 'output', 'particles.visit')
+    filein = os.path.join(case_dir, 'output', 'slab_morph')
+    ofile = os.path.join(img_dir, 'slab_morph.png')
+    if os.path.isfile(particle_file):
+        # process slab morph with extra options,
+        # snapshots already in the output are not analyzed again
+        extra_options = {}
+        try:
+            SlabMorph(case_dir, extra_options)
+        except FileNotFoundError:
+            warnings.warn('process_slab_morph: file existence requirements are not met')
+    # then plot the slab morph figure,
+    # when the slab morph output or the options have changed
+    manifest = Plot.PLOT_MANIFEST(img_dir)
+    if os.path.isfile(filein) and \
+       not manifest.IsUpToDate(ofile, [filein], Slab_morph_plot.options):
+        _ofile = Slab_morph_plot(filein, fileout=ofile)
+        if _ofile is not None:
+            # nothing is plotted for an empty output
+            ofiles.append(_ofile)
+            manifest.Record(ofile, [filein], Slab_morph_plot.options)
+    return ofiles
 
 
 def PlotTestResults(source_dir, **kwargs):
@@ -636,18 +956,25 @@ def main():
     parser.add_argument('-ex', '--extension', type=str,
                         default='png',
                         help='extension for output')
+    parser.add_argument('-w', '--workers', type=int,
+                        default=None,
+                        help='number of processes for creating cases or plotting, default is 1')
     _options = []
     try:
         _options = sys.argv[2: ]
     except IndexError:
         pass
     arg = parser.parse_args(_options)
+    # options in json files are only overridden when -w is given
+    workers = arg.workers if arg.workers is not None else 1
 
     # execute commend
     if _commend == 'create_group':
         # create a group
         # example usage:
         #    python -m shilofue.TwoDSubduction create_group -j config_group.json 2>&1 > .temp
+        # with -w, cases are created with a pool of processes
+        #    python -m shilofue.TwoDSubduction create_group -j config_group.json -w 8 2>&1 > .temp
         # create a group of cases
         # read files
         # read configuration
@@ -683,7 +1010,10 @@ def main():
         _extra = _config.get('extra', {})
         # add an entry for parse_operations
         parse_operations = MY_PARSE_OPERATIONS()
-        _case_names = MyGroup(parse_operations, _odir, extra=_extra, basename=_base_name, update=update_)
+        # particle files are written in ascii by default, set "particle_format": "binary" to opt in a binary format
+        particle_format = _config.get('particle_format', 'ascii')
+        _case_names = MyGroup(parse_operations, _odir, extra=_extra, basename=_base_name, update=update_, workers=workers,
+                              particle_format=particle_format)
         # generate auto.md
         # check if there is alread a preexisting group
         Parse.AutoMarkdownGroup(_group_name, _config, dirname=_odir)
@@ -771,6 +1101,8 @@ def main():
         # update a case
         # example usage:
         #   python -m shilofue.TwoDSubduction update -o /home/lochy/ASPECT_PROJECT/TwoDSubduction -j post_process.json
+        # with -w, plots for cases are generated with a pool of processes
+        #   python -m shilofue.TwoDSubduction update -o /home/lochy/ASPECT_PROJECT/TwoDSubduction -j post_process.json -w 8
         _project_dir = arg.output_dir
         _project_dict = Parse.UpdateProjectJson(_project_dir)  # update project json file
         
@@ -803,9 +1135,9 @@ def main():
         for pp_source_dir_base in pp_source_dirs:
             pp_source_dir = os.path.join(_project_dir, pp_source_dir_base)
             pp_case_dirs = Parse.GetSubCases(pp_source_dir)
-            Plot.ProjectPlot(pp_case_dirs, _format, update=False, pdict=pdict)
+            Plot.ProjectPlot(pp_case_dirs, _format, update=False, pdict=pdict, workers=workers)
             # deal with project defined plots
-            ProjectPlot(pp_case_dirs, _format, update=False, pdict=pdict)
+            ProjectPlot(pp_case_dirs, _format, update=False, pdict=pdict, workers=workers)
 
     elif _commend == 'plot_newton_solver_step':
         # Plot one step from Newton solver
@@ -885,6 +1217,9 @@ def main():
         with open(arg.json_file, 'r') as fin:
             dict_in = json.load(fin)
             extra_options = dict_in.get('slab_morph', {})
+        # with -w, snapshots are analyzed with a pool of processes
+        if arg.workers is not None:
+            extra_options['workers'] = arg.workers
         try:
             SlabMorph(case_dir, extra_options)
         except FileNotFoundError:
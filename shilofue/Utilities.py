@@ -1,6 +1,7 @@
 import json
 import re
 import os
+import hashlib
 import shilofue.json
 import numpy as np
 from importlib import resources
@@ -130,6 +131,208 @@ def ReadHeader2(_texts):
     return _header
 
 
+def ReadHeaderTexts(_filename):
+    """
+    Read the header of a data file, i.e. the leading lines starting with '#'.
+    The rest of the file is not read.
+    Inputs:
+        _filename(str): data file
+    Returns:
+        _texts(list<string>): lines of the header
+    """
+    _texts = []
+    with open(_filename, 'r') as fin:
+        for _line in fin:
+            if not _line.startswith('#'):
+                break
+            _texts.append(_line)
+    return _texts
+
+
+def ProjectHeader(_header, usecols):
+    """
+    Get the header of a subset of columns, columns are renumbered
+    in the order of usecols
+    Inputs:
+        _header(dict): header information, from ReadHeader or ReadHeader2
+        usecols(list of str): keys in header
+    Returns:
+        _cols(list of int): columns of these keys in file
+        _header_o(dict): header of these columns
+    """
+    _cols = []
+    _header_o = {'total_col': len(usecols)}
+    for i in range(len(usecols)):
+        _key = usecols[i]
+        my_assert(_key in _header and _key != 'total_col', KeyError,
+                  'ProjectHeader: %s is not in the header' % _key)
+        _cols.append(_header[_key]['col'])
+        _header_o[_key] = {'col': i, 'unit': _header[_key]['unit']}
+    return _cols, _header_o
+
+
+def _IsFloat(_word):
+    """
+    If a word could be converted to float
+    """
+    try:
+        float(_word)
+    except ValueError:
+        return False
+    return True
+
+
+def LoadTable(_filename, **kwargs):
+    """
+    Load a data table with a header, e.g. 'statistics' or 'depth_average.txt'
+    from aspect. Only the header is read as text, and numbers are parsed with np.loadtxt,
+    which is implemented in c. Columns of strings are loaded as nan, and
+    np.genfromtxt is used if np.loadtxt fails (e.g. there are missing values).
+    Inputs:
+        _filename(str): data file
+        kwargs:
+            header_reader(function): function to interpret the header,
+                ReadHeader (default) or ReadHeader2
+            usecols(list of str): only load these columns, entries are keys in header.
+                default is None, which means loading all columns
+    Returns:
+        _header(dict): header information, if usecols is given, columns are
+            renumbered in the order of usecols
+        _data(ndarray): 2-d array of data, this has 0 rows if there is no data
+    """
+    header_reader = kwargs.get('header_reader', ReadHeader)
+    usecols = kwargs.get('usecols', None)
+    my_assert(os.access(_filename, os.R_OK), FileNotFoundError,
+              'LoadTable: data file - %s cannot be read' % _filename)
+    _header = header_reader(ReadHeaderTexts(_filename))
+    _cols = None
+    if usecols is not None:
+        _cols, _header = ProjectHeader(_header, usecols)
+    # read the first row of data
+    _words = []
+    with open(_filename, 'r') as fin:
+        for _line in fin:
+            if not _line.startswith('#') and _line.strip() != '':
+                _words = _line.split()
+                break
+    if len(_words) == 0:
+        # no data
+        return _header, np.empty((0, _header['total_col']))
+    if _cols is None:
+        _cols = list(range(len(_words)))
+    # columns of strings (e.g. names of visualization files in statistics) are
+    # loaded as nan, as np.genfromtxt does
+    _numeric_cols = [_col for _col in _cols if _col < len(_words) and _IsFloat(_words[_col])]
+    try:
+        my_assert(len(_numeric_cols) > 0, ValueError, 'LoadTable: no numeric columns')
+        _numeric_data = np.loadtxt(_filename, comments='#', usecols=_numeric_cols, ndmin=2)
+    except ValueError:
+        # e.g. missing values in a row
+        _data = np.genfromtxt(_filename, comments='#', usecols=_cols, ndmin=2)
+    else:
+        _data = np.full((_numeric_data.shape[0], len(_cols)), np.nan)
+        _data[:, [_cols.index(_col) for _col in _numeric_cols]] = _numeric_data
+    return _header, _data
+
+
+def TableCacheFiles(_filename):
+    """
+    Names of the sidecar cache files of a data table, e.g. 'output/statistics'
+    is cached in 'output/.statistics.cache.npy' and 'output/.statistics.cache.json'
+    Inputs:
+        _filename(str): data file
+    Returns:
+        _data_file(str): cache of data, a .npy file
+        _meta_file(str): cache of header lines, file size and mtime, a .json file
+    """
+    _dir, _base = os.path.split(_filename)
+    _data_file = os.path.join(_dir, '.%s.cache.npy' % _base)
+    _meta_file = os.path.join(_dir, '.%s.cache.json' % _base)
+    return _data_file, _meta_file
+
+
+def LoadTableCache(_filename, **kwargs):
+    """
+    Load the sidecar cache of a data table, the cache is valid
+    only if the size and mtime of the data file are unchanged
+    Inputs:
+        _filename(str): data file
+        kwargs:
+            data(True or False): load data, default is True. If False, only
+                header lines are loaded
+    Returns:
+        _header_lines(list of str): lines of the header, starting with '#'
+        _data(ndarray): data, memory mapped and copy on write. None if data is False
+        None is returned if there is no valid cache
+    """
+    load_data = kwargs.get('data', True)
+    _data_file, _meta_file = TableCacheFiles(_filename)
+    try:
+        _stat = os.stat(_filename)
+        with open(_meta_file, 'r') as fin:
+            _meta = json.load(fin)
+        if _meta['size'] != _stat.st_size or _meta['mtime'] != _stat.st_mtime_ns:
+            return None
+        _data = None
+        if load_data:
+            # changes in memory are not written to the cache
+            _data = np.load(_data_file, mmap_mode='c')
+    except (OSError, ValueError, KeyError):
+        return None
+    return _meta['header_lines'], _data
+
+
+def SaveTableCache(_filename, _stat, _header_lines, _data):
+    """
+    Save the sidecar cache of a data table. Nothing is saved if the
+    directory is not writable or the file changed since _stat
+    Inputs:
+        _filename(str): data file
+        _stat(os.stat_result): stat of the data file before it is read
+        _header_lines(list of str): lines of the header
+        _data(ndarray): data
+    """
+    _data_file, _meta_file = TableCacheFiles(_filename)
+    _meta = {'size': _stat.st_size, 'mtime': _stat.st_mtime_ns, 'header_lines': _header_lines}
+    try:
+        if os.stat(_filename).st_mtime_ns != _stat.st_mtime_ns:
+            # file is changed while reading
+            return
+        # write to temporary files first, so that a cache is never partially written
+        with open(_data_file + '.tmp', 'wb') as fout:
+            np.save(fout, _data)
+        os.replace(_data_file + '.tmp', _data_file)
+        with open(_meta_file + '.tmp', 'w') as fout:
+            json.dump(_meta, fout)
+        os.replace(_meta_file + '.tmp', _meta_file)
+    except OSError:
+        pass
+
+
+def FileFingerprint(_filename, _old=None):
+    """
+    Fingerprint of a file, which includes size, mtime and md5 hash of the contents.
+    If size and mtime are the same as those in _old, the hash is taken from _old
+    instead of reading the file again.
+    Inputs:
+        _filename(str): file
+        _old(dict): a previous fingerprint of this file
+    Returns:
+        _fingerprint(dict): fingerprint of the file
+    """
+    _stat = os.stat(_filename)
+    _fingerprint = {'size': _stat.st_size, 'mtime': _stat.st_mtime_ns}
+    if _old is not None and _old.get('size') == _stat.st_size and _old.get('mtime') == _stat.st_mtime_ns:
+        _fingerprint['md5'] = _old['md5']
+        return _fingerprint
+    _md5 = hashlib.md5()
+    with open(_filename, 'rb') as fin:
+        for _chunk in iter(lambda: fin.read(1 << 20), b''):
+            _md5.update(_chunk)
+    _fingerprint['md5'] = _md5.hexdigest()
+    return _fingerprint
+
+
 def my_assert(_condition, _errortype, _message):
     '''
     an assert function for runtime use
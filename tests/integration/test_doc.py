@@ -2,7 +2,8 @@ import pytest
 import os
 import filecmp
 import shilofue.Doc as Doc
-from shutil import rmtree, copyfile
+from shilofue.Utilities import touch
+from shutil import rmtree, copyfile, copy2, copytree, ignore_patterns
 
 
 # test files are in this directory
@@ -150,5 +151,144 @@ def test_mkdoc():
     mkdocs_file_std = os.path.join(source_dir, 'mkdocs_std1.yml')
     assert(filecmp.cmp(mkdocs_file, mkdocs_file_std))
 
-            
 
+def test_update_project_doc():
+    '''
+    test UpdateProjectDoc from shilofue.Doc, entries not changed are skipped
+    '''
+    source_dir = os.path.join(test_source_dir, 'doc')
+    project_dir = os.path.join(test_dir, 'doc_project')
+    if os.path.isdir(project_dir):
+        rmtree(project_dir)
+    copytree(source_dir, project_dir, ignore=ignore_patterns('docs', 'mkdocs*.yml'))
+    mkdocs_dir = os.path.join(project_dir, 'mkdocs_project')
+    os.makedirs(os.path.join(mkdocs_dir, 'docs'))
+    mkdocs_file = os.path.join(mkdocs_dir, 'mkdocs.yml')
+    copyfile(os.path.join(source_dir, 'mkdocs.yml'), mkdocs_file)
+    project_dict = {'cases': ['foo'], 'foo_group': ['foo1', 'foo2', 'foo3']}
+    analysis = {'test_analysis': {'case_dirs': ['foo', 'foo_group/foo1'], 'images': ['DepthAverage'],
+                                  'extra_analysis': {'machine_time': {'step': 2}, 'newton_solver': {}}}}
+    Doc.UpdateProjectDoc(project_dict, project_dir, images=['DepthAverage'], analysis=analysis)
+    # all changes to the nav are written at once
+    assert(filecmp.cmp(mkdocs_file, os.path.join(source_dir, 'mkdocs_std1.yml')))
+    assert(os.path.isfile(os.path.join(mkdocs_dir, '.doc_manifest.json')))
+    docs_dir = os.path.join(mkdocs_dir, 'docs')
+    summary_files = [os.path.join(docs_dir, 'foo', 'summary.md'),
+                     os.path.join(docs_dir, 'foo_group', 'foo1', 'summary.md'),
+                     os.path.join(docs_dir, 'test_analysis', 'summary.md')]
+    assert(filecmp.cmp(summary_files[0], os.path.join(source_dir, 'foo', 'summary_std.md')))
+    # mark files generated as old ones
+    for _file in summary_files + [mkdocs_file]:
+        os.utime(_file, ns=(0, 0))
+    # nothing is changed, nothing is generated again
+    Doc.UpdateProjectDoc(project_dict, project_dir, images=['DepthAverage'], analysis=analysis)
+    for _file in summary_files + [mkdocs_file]:
+        assert(os.stat(_file).st_mtime_ns == 0)
+    # change a case, only that case is generated again
+    with open(os.path.join(project_dir, 'foo', 'extra.md'), 'a') as fout:
+        fout.write('\nmore notes\n')
+    Doc.UpdateProjectDoc(project_dict, project_dir, images=['DepthAverage'], analysis=analysis)
+    assert(os.stat(summary_files[0]).st_mtime_ns > 0)
+    with open(summary_files[0], 'r') as fin:
+        assert('more notes' in fin.read())
+    for _file in summary_files[1:]:
+        assert(os.stat(_file).st_mtime_ns == 0)
+
+
+def test_sync_images():
+    '''
+    test SyncImages from shilofue.Doc
+    '''
+    sync_dir = os.path.join(test_dir, 'sync_images')
+    if os.path.isdir(sync_dir):
+        rmtree(sync_dir)
+    img_dir = os.path.join(sync_dir, 'img')
+    target_dir = os.path.join(sync_dir, 'target')
+    os.makedirs(img_dir)
+    os.mkdir(target_dir)
+    links = []
+    for i in range(8):
+        _file = os.path.join(img_dir, 'foo_%d.png' % i)
+        with open(_file, 'w') as fout:
+            fout.write('image %d\n' % i)
+        links.append((_file, os.path.join(target_dir, 'foo_%d.png' % i)))
+    # new links
+    assert(Doc.SyncImages(links, workers=4) == 8)
+    for _file, _target_file in links:
+        assert(os.stat(_file).st_ino == os.stat(_target_file).st_ino)
+    # links are already there
+    assert(Doc.SyncImages(links, workers=4) == 0)
+    # a copy with the same contents is kept
+    os.remove(links[0][1])
+    copy2(links[0][0], links[0][1])
+    # an image generated again is linked again
+    os.remove(links[1][0])
+    with open(links[1][0], 'w') as fout:
+        fout.write('new image\n')
+    assert(Doc.SyncImages(links) == 1)
+    assert(os.stat(links[0][0]).st_ino != os.stat(links[0][1]).st_ino)
+    assert(os.stat(links[1][0]).st_ino == os.stat(links[1][1]).st_ino)
+    with open(links[1][1], 'r') as fin:
+        assert(fin.read() == 'new image\n')
+
+
+def test_return_file_list():
+    '''
+    test ReturnFileList from shilofue.Doc
+    '''
+    img_dir = os.path.join(test_dir, 'return_file_list')
+    if os.path.isdir(img_dir):
+        rmtree(img_dir)
+    os.makedirs(os.path.join(img_dir, 'visit', 'frames'))
+    names = ['Statistics.png', 'DepthAverage_t1.png', 'DepthAverage_t0.png', 'Depth.png',
+             os.path.join('visit', 'visit_0001.png'), os.path.join('visit', 'frames', 'visit_0000.png')]
+    for _name in names:
+        touch(os.path.join(img_dir, _name))
+    # files in subdirectories are included, files matching a name are sorted
+    assert(Doc.ReturnFileList(img_dir, ['DepthAverage', 'visit']) ==
+           ['DepthAverage_t0.png', 'DepthAverage_t1.png', 'visit_0000.png', 'visit_0001.png'])
+    assert(Doc.ReturnFileList(img_dir, ['Depth']) == ['Depth.png', 'DepthAverage_t0.png', 'DepthAverage_t1.png'])
+    assert(Doc.ReturnFileList(img_dir, ['foo']) == [])
+    assert(Doc.ReturnFileList(os.path.join(img_dir, 'foo'), ['Depth']) == [])
+    # an index is made once for a directory
+    index = {}
+    assert(Doc.ReturnFileList(img_dir, ['Statistics'], index=index) == ['Statistics.png'])
+    assert(img_dir in index)
+    touch(os.path.join(img_dir, 'Statistics_1.png'))
+    assert(Doc.ReturnFileList(img_dir, ['Statistics'], index=index) == ['Statistics.png'])
+    assert(Doc.ReturnFileList(img_dir, ['Statistics']) == ['Statistics.png', 'Statistics_1.png'])
+
+
+def test_mkdocs_nav():
+    '''
+    test class MKDOCS_NAV from shilofue.Doc
+    '''
+    nav_dir = os.path.join(test_dir, 'mkdocs_nav')
+    if os.path.isdir(nav_dir):
+        rmtree(nav_dir)
+    os.mkdir(nav_dir)
+    mkdocs_file = os.path.join(nav_dir, 'mkdocs.yml')
+    # the last line doesn't end with a new line
+    with open(mkdocs_file, 'w') as fout:
+        fout.write('site_name: My Project\nnav:\n  - Home: index.md\n\ntheme: readthedocs\nrepo_url: foo')
+    Nav = Doc.MKDOCS_NAV(mkdocs_file)
+    for i in range(1000):
+        Nav.Merge({'case%d' % i: {'Summary': 'case%d/summary.md' % i}})
+    Nav.Merge({'case0': {'Parameters': 'case0/case.prm'}})
+    Nav.Save()
+    with open(mkdocs_file, 'r') as fin:
+        lines = fin.read().split('\n')
+    assert(lines[0:3] == ['site_name: My Project', 'nav:', '  - Home: index.md'])
+    assert(lines[3:6] == ['  - case0:', '      - Summary: case0/summary.md', '      - Parameters: case0/case.prm'])
+    assert(lines[-4:] == ['', 'theme: readthedocs', 'repo_url: foo', ''])
+    assert(len(lines) == 2 + 1 + 2001 + 4)
+    # the nav part at the end of file is read back
+    with open(mkdocs_file, 'w') as fout:
+        fout.write('site_name: My Project\nnav:\n    - Home: index.md\n    - foo:\n        - Summary: foo/summary.md\n')
+    Nav = Doc.MKDOCS_NAV(mkdocs_file)
+    assert(Nav.nav == {'Home': 'index.md', 'foo': {'Summary': 'foo/summary.md'}})
+    assert(Nav.tail == [])
+    # nothing is written without changes
+    os.utime(mkdocs_file, ns=(0, 0))
+    Nav.Save()
+    assert(os.stat(mkdocs_file).st_mtime_ns == 0)
@@ -1,7 +1,9 @@
 import os
 import json
+import pytest
+import numpy as np
 import shilofue.Parse as Parse
-from shutil import rmtree
+from shutil import rmtree, copy2
 
 _test_dir = ".test"
 test_source_dir = os.path.join(os.path.dirname(__file__), 'fixtures', 'parse')
@@ -114,4 +116,182 @@ def test_get_sub_cases():
     case_dirs = Parse.GetSubCases(test_source_dir)
     assert(case_dirs == 
            ['/home/lochy/ASPECT_PROJECT/aspectLib/tests/integration/fixtures/parse/foo1',
-           '/home/lochy/ASPECT_PROJECT/aspectLib/tests/integration/fixtures/parse/foo'])
\ No newline at end of file
+           '/home/lochy/ASPECT_PROJECT/aspectLib/tests/integration/fixtures/parse/foo'])
+
+
+def test_project_index():
+    '''
+    test PROJECT_INDEX and discovery of groups and cases with it
+    '''
+    project_dir = os.path.join(_test_dir, 'project_index')
+    if os.path.isdir(project_dir):
+        rmtree(project_dir)
+    for _dir in ['case0', 'group0/case1', 'group0/case2', 'foo/case3', 'case4/output']:
+        os.makedirs(os.path.join(project_dir, _dir))
+    for _file in ['case0/case.prm', 'case0/config.json', 'group0/config.json', 'group0/case1/case.prm',
+                  'group0/case1/config.json', 'group0/case2/case.prm', 'foo/case3/case.prm', 'case4/case.prm']:
+        with open(os.path.join(project_dir, _file), 'w') as fout:
+            fout.write('\n')
+    project_dir_abs = os.path.abspath(project_dir)
+    # GetSubCases walks through all sub-folders
+    case_dirs = Parse.GetSubCases(project_dir)
+    assert(case_dirs == [os.path.join(project_dir_abs, _dir) for _dir in
+                         ['case0', 'case4', 'foo/case3', 'group0/case1', 'group0/case2']])
+    assert(os.path.isfile(os.path.join(project_dir, '.project_index.json')))
+    # outputs of cases are not walked into
+    assert('case4/output' not in Parse.PROJECT_INDEX(project_dir).nodes)
+    # UpdateProjectJson only looks at groups
+    _odict = Parse.UpdateProjectJson(project_dir)
+    assert(_odict == {'cases': ['case0', 'case4'], 'group0': ['case1', 'case2']})
+    # cases need both case.prm and config.json here
+    group_dirs, case_dirs = Parse.SearchGroupsCases(project_dir)
+    assert(group_dirs == [os.path.join(project_dir, 'group0')])
+    assert(case_dirs == [os.path.join(project_dir, 'case0'), os.path.join(project_dir, 'group0', 'case1')])
+    group_dirs, case_dirs = Parse.SearchGroupsCases(os.path.join(project_dir, 'case0'))
+    assert(group_dirs == [] and case_dirs == [os.path.join(project_dir, 'case0')])
+    group_dirs, case_dirs = Parse.SearchGroupsCases(os.path.join(project_dir, 'group0'))
+    assert(group_dirs == [os.path.join(project_dir, 'group0')])
+    # the index is only saved at the root of a project
+    for _dir in ['case0', 'group0']:
+        assert(not os.path.isfile(os.path.join(project_dir, _dir, '.project_index.json')))
+    # the index is refreshed with changes of directories, make
+    # mtimes old so that directories could be reused from the index
+    for _dir, _, _ in os.walk(project_dir):
+        os.utime(_dir, ns=(0, 0))
+    Parse.PROJECT_INDEX(project_dir).Refresh()
+    _index = Parse.PROJECT_INDEX(project_dir)  # read from the saved index
+    assert(_index.Node('group0')['mtime'] == 0)
+    os.makedirs(os.path.join(project_dir, 'group0', 'case5'))
+    with open(os.path.join(project_dir, 'group0', 'case5', 'case.prm'), 'w') as fout:
+        fout.write('\n')
+    rmtree(os.path.join(project_dir, 'foo'))
+    _index.Refresh()
+    assert(_index.Cases() == ['case0', 'case4', 'group0/case1', 'group0/case2', 'group0/case5'])
+    assert(_index.Node('case0')['mtime'] == 0)  # reused
+    assert('foo/case3' not in _index.nodes)
+    # a walk with a limit of depth keeps deeper directories in the index
+    os.makedirs(os.path.join(project_dir, 'foo', 'bar', 'case6'))
+    with open(os.path.join(project_dir, 'foo', 'bar', 'case6', 'case.prm'), 'w') as fout:
+        fout.write('\n')
+    Parse.PROJECT_INDEX(project_dir).Refresh()
+    _index = Parse.PROJECT_INDEX(project_dir).Refresh(depth=1)
+    assert('foo/bar/case6' in _index.Cases())
+
+
+class FAILING_CASE(Parse.CASE):
+    '''
+    a case that fails when writing particles, with max_nonlinear_iterations = 20
+    '''
+    def process_particle_data(self):
+        self.particle_data = np.zeros((1, 2))
+
+    def output_particle_ascii(self, fout):
+        if self.config['max_nonlinear_iterations'] == 20:
+            raise ValueError('failed to write particles')
+        Parse.CASE.output_particle_ascii(self, fout)
+
+
+def test_group_case_workers():
+    '''
+    test creating cases in a group with a pool of processes, and failures in creating cases
+    '''
+    test_file = os.path.join(os.path.dirname(__file__), 'fixtures', 'parse_test.prm')
+    with open(test_file, 'r') as fin:
+        inputs = Parse.ParseFromDealiiInput(fin)
+    _json_inputs = {'config': {'max_nonlinear_iterations': [10, 20, 30], 'CFL': [0.2, 0.4]}}
+    parse_operations = Parse.PARSE_OPERATIONS()
+    _odirs = []
+    for workers in [1, 2]:
+        _odir = os.path.join(_test_dir, 'group_case_workers%d' % workers)
+        if os.path.isdir(_odir):
+            rmtree(_odir)
+        os.mkdir(_odir)
+        MyGroup = Parse.GROUP_CASE(Parse.CASE, inputs, _json_inputs)
+        _case_names = MyGroup(parse_operations, _odir, workers=workers)
+        assert(len(MyGroup) == 6)
+        assert(sorted(_case_names) == sorted([_name for _name in os.listdir(_odir) if _name != 'config.json']))
+        assert(len(_case_names) == 6 and MyGroup.failures == {})
+        _odirs.append(_odir)
+    # the same cases are created
+    for _case_name in os.listdir(_odirs[0]):
+        if _case_name != 'config.json':
+            with open(os.path.join(_odirs[0], _case_name, 'case.prm'), 'r') as fin0, \
+                 open(os.path.join(_odirs[1], _case_name, 'case.prm'), 'r') as fin1:
+                assert(fin0.read() == fin1.read())
+    # failures are reported and leave nothing behind
+    _odir = os.path.join(_test_dir, 'group_case_failures')
+    if os.path.isdir(_odir):
+        rmtree(_odir)
+    os.mkdir(_odir)
+    os.mkdir(os.path.join(_odir, 'C2.000e-01MNI10'))  # case exists, and update is not allowed
+    MyGroup = Parse.GROUP_CASE(FAILING_CASE, inputs, _json_inputs)
+    with pytest.warns(Parse.GroupCaseWarning):
+        _case_names = MyGroup(parse_operations, _odir)
+    assert(sorted(MyGroup.failures.keys()) == ['C2.000e-01MNI10', 'C2.000e-01MNI20', 'C4.000e-01MNI20'])
+    assert(len(_case_names) == 3)
+    assert(sorted(os.listdir(_odir)) == sorted(_case_names + ['C2.000e-01MNI10', 'config.json']))
+    assert(os.listdir(os.path.join(_odir, 'C2.000e-01MNI10')) == [])
+
+
+def test_read_prm_file():
+    '''
+    test ReadPrmFile and PRM_CACHE
+    '''
+    _dir = os.path.join(_test_dir, 'read_prm_file')
+    if os.path.isdir(_dir):
+        rmtree(_dir)
+    os.mkdir(_dir)
+    prm_file = os.path.join(_dir, 'case.prm')
+    copy2(os.path.join(os.path.dirname(__file__), 'fixtures', 'parse_test.prm'), prm_file)
+    with open(prm_file, 'r') as fin:
+        inputs = Parse.ParseFromDealiiInput(fin)
+    # parsed once and then reused
+    _inputs = Parse.ReadPrmFile(prm_file)
+    assert(Parse.ReadPrmFile(prm_file) is _inputs)
+    assert(Parse.PRM_OVERLAY(_inputs).ToDict() == inputs)
+    # views are read-only
+    with pytest.raises(TypeError):
+        _inputs['Dimension'] = '3'
+    with pytest.raises(TypeError):
+        _inputs['Material model']['Visco Plastic']['Reset corner viscosity constant'] = '1e21'
+    # parsed again when the file is changed
+    with open(prm_file, 'r') as fin:
+        _contents = fin.read()
+    with open(prm_file, 'w') as fout:
+        fout.write(_contents.replace('set Dimension', 'set Dimension = 3\n#', 1))
+    assert(Parse.ReadPrmFile(prm_file)['Dimension'] == '3')
+    # use a pickle file, which is then reused by another cache
+    _inputs = Parse.PRM_CACHE()(prm_file, sidecar=True)
+    assert(os.path.isfile(os.path.join(_dir, '.case.prm.cache.pkl')))
+    _inputs1 = Parse.PRM_CACHE()(prm_file, sidecar=True)
+    assert(_inputs1 == _inputs and _inputs1 is not _inputs)
+    # least recently used files are dropped
+    _cache = Parse.PRM_CACHE(maxsize=1)
+    _cache(prm_file)
+    _cache(os.path.join(os.path.dirname(__file__), 'fixtures', 'parse_test.prm'))
+    assert(len(_cache.entries) == 1)
+
+
+def test_write_dealii_input():
+    '''
+    test WriteDealiiInput and that unchanged files are kept when a case is updated
+    '''
+    _dir = os.path.join(_test_dir, 'write_dealii_input')
+    if os.path.isdir(_dir):
+        rmtree(_dir)
+    os.mkdir(_dir)
+    with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'parse_test.prm'), 'r') as fin:
+        inputs = Parse.ParseFromDealiiInput(fin)
+    prm_file = os.path.join(_dir, 'case.prm')
+    assert(Parse.WriteDealiiInput(prm_file, inputs))
+    _mtime = os.stat(prm_file).st_mtime_ns
+    assert(Parse.WriteDealiiInput(prm_file, inputs) is False)
+    assert(os.stat(prm_file).st_mtime_ns == _mtime)
+    # update a case
+    _case = Parse.CASE(inputs)
+    _case_name = _case(Parse.PARSE_OPERATIONS(), dirname=_dir, basename='test')
+    _case_prm = os.path.join(_dir, _case_name, 'case.prm')
+    _mtime = os.stat(_case_prm).st_mtime_ns
+    Parse.CASE(inputs)(Parse.PARSE_OPERATIONS(), dirname=_dir, basename='test', update=1)
+    assert(os.stat(_case_prm).st_mtime_ns == _mtime)
+    assert(sorted(os.listdir(_dir)) == sorted(['case.prm', _case_name]))
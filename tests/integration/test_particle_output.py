@@ -0,0 +1,142 @@
+import os
+import zlib
+import base64
+import filecmp
+import numpy as np
+import shilofue.ParticleOutput as ParticleOutput
+import shilofue.TwoDSubduction as TwoDSubduction
+from shutil import rmtree, copy2
+
+test_source_dir = os.path.join(os.path.dirname(__file__), 'fixtures')
+test_dir = '.test'
+
+if not os.path.isdir(test_dir):
+    # check we have the directory to store test result
+    os.mkdir(test_dir)
+
+
+def WriteVtu(filename, position, point_data, _format):
+    '''
+    write a .vtu file in the way of deal.ii: 'binary' is base64 encoded and compressed
+    with zlib, the header and the data encoded separately; 'appended' is raw bytes
+    without compression; 'ascii' is text
+    '''
+    _arrays = [('Float64', None, position)] + [('Float64', name, value) for name, value in point_data.items()]
+    _appended = b''
+    _lines = []
+    _compressor = ' compressor="vtkZLibDataCompressor"' if _format == 'binary' else ''
+    _lines.append('<?xml version="1.0" ?>\n<VTKFile type="UnstructuredGrid" version="0.1"%s byte_order="LittleEndian">\n' % _compressor)
+    _lines.append('<UnstructuredGrid>\n<Piece NumberOfPoints="%d" NumberOfCells="0">\n' % position.shape[0])
+    for _type, name, value in _arrays:
+        if name is None:
+            _lines.append('<Points>\n')
+        elif name == list(point_data.keys())[0]:
+            _lines.append('<PointData Scalars="scalars">\n')
+        _attributes = 'type="%s"' % _type
+        if name is not None:
+            _attributes += ' Name="%s"' % name
+        if value.ndim > 1:
+            _attributes += ' NumberOfComponents="%d"' % value.shape[1]
+        _bytes = value.astype('<f8').tobytes()
+        if _format == 'binary':
+            _compressed = zlib.compress(_bytes)
+            _header = np.array([1, len(_bytes), len(_bytes), len(_compressed)], dtype='<u4').tobytes()
+            _text = base64.b64encode(_header).decode() + base64.b64encode(_compressed).decode()
+            _lines.append('<DataArray %s format="binary">\n%s\n</DataArray>\n' % (_attributes, _text))
+        elif _format == 'appended':
+            _lines.append('<DataArray %s format="appended" offset="%d"/>\n' % (_attributes, len(_appended)))
+            _appended += np.array([len(_bytes)], dtype='<u4').tobytes() + _bytes
+        else:
+            _lines.append('<DataArray %s format="ascii">\n%s\n</DataArray>\n' % (_attributes, ' '.join(['%.17e' % x for x in value.ravel()])))
+        if name is None:
+            _lines.append('</Points>\n')
+    _lines.append('</PointData>\n</Piece>\n</UnstructuredGrid>\n')
+    with open(filename, 'wb') as fout:
+        fout.write(''.join(_lines).encode())
+        if _format == 'appended':
+            fout.write(b'<AppendedData encoding="raw">\n_' + _appended + b'\n</AppendedData>\n')
+        fout.write(b'</VTKFile>\n')
+
+
+def test_particle_output():
+    '''
+    test reading particle output of aspect, and SlabMorph with it
+    '''
+    test_file = os.path.join(test_source_dir, 'TwoDSubduction', 'visit_xyz', 'visit_particles.xyz')
+    xyz = np.loadtxt(test_file, usecols=(1, 2, 3, 4), skiprows=2)
+    case_dir = os.path.join(test_dir, 'particle_output')
+    if os.path.isdir(case_dir):
+        # remove older files
+        rmtree(case_dir)
+    particle_dir = os.path.join(case_dir, 'output', 'particles')
+    os.makedirs(particle_dir)
+    # 2 snapshots in 2 blocks, the second one in a different order
+    _lines = ['!TIME 0\n', '!TIME 1e5\n', '!NBLOCKS 2\n']
+    for i, _format in enumerate(['binary', 'appended']):
+        _xyz = xyz if i == 0 else xyz[::-1]
+        for j, _block in enumerate([_xyz[:400], _xyz[400:]]):
+            _file = 'particles-%05d.%04d.vtu' % (i, j)
+            WriteVtu(os.path.join(particle_dir, _file), _block[:, :3], {'id': _block[:, 3], 'p': _block[:, 0]}, _format)
+            _lines.append('particles/%s\n' % _file)
+    with open(os.path.join(case_dir, 'output', 'particles.visit'), 'w') as fout:
+        fout.writelines(_lines)
+    # a piece without particles, written by deal.ii for a process that has no particles
+    empty_file = os.path.join(particle_dir, 'particles-00000.0002.vtu')
+    with open(empty_file, 'w') as fout:
+        fout.write('<?xml version="1.0" ?>\n<VTKFile type="UnstructuredGrid" version="0.1" compressor="vtkZLibDataCompressor" byte_order="LittleEndian">\n'
+                   '<UnstructuredGrid>\n<Piece NumberOfPoints="0" NumberOfCells="0">\n<PointData Scalars="scalars">\n'
+                   '<DataArray type="Float64" Name="id" format="binary"></DataArray>\n'
+                   '<DataArray type="Float64" Name="p" format="binary"></DataArray>\n'
+                   '</PointData>\n</Piece>\n</UnstructuredGrid>\n</VTKFile>\n')
+    _outputs = ParticleOutput.ReadVtu(empty_file, names=['id'])
+    assert(_outputs['position'].shape == (0, 3) and _outputs['id'].shape == (0,))
+    assert(ParticleOutput.ParticleColumns(empty_file, ['x', 'y', 'id']).shape == (0, 3))
+    # a pvtu file of the first snapshot
+    pvtu_file = os.path.join(particle_dir, 'particles-00000.pvtu')
+    with open(pvtu_file, 'w') as fout:
+        fout.write('<?xml version="1.0"?>\n<VTKFile type="PUnstructuredGrid" version="0.1" byte_order="LittleEndian">\n'
+                   '<PUnstructuredGrid GhostLevel="0">\n<Piece Source="particles-00000.0000.vtu"/>\n'
+                   '<Piece Source="particles-00000.0002.vtu"/>\n'
+                   '<Piece Source="particles-00000.0001.vtu"/>\n</PUnstructuredGrid>\n</VTKFile>\n')
+    # read a record
+    times, snapshots = ParticleOutput.ReadVisitRecord(os.path.join(case_dir, 'output', 'particles.visit'))
+    assert(times == [0.0, 1e5])
+    assert(snapshots[1] == [os.path.join(case_dir, 'output', 'particles', 'particles-00001.%04d.vtu' % j) for j in range(2)])
+    # read data
+    assert(np.array_equal(ParticleOutput.ParticleColumns(pvtu_file, ['x', 'y', 'id']), xyz[:, [0, 1, 3]]))
+    assert(np.array_equal(ParticleOutput.ParticleColumns(snapshots[1], ['x', 'y', 'id']), xyz[::-1][:, [0, 1, 3]]))
+    _ascii_file = os.path.join(case_dir, 'ascii.vtu')
+    WriteVtu(_ascii_file, xyz[:, :3], {'id': xyz[:, 3]}, 'ascii')
+    _outputs = ParticleOutput.ReadParticles(_ascii_file)
+    assert(np.array_equal(_outputs['position'], xyz[:, :3]) and np.array_equal(_outputs['id'], xyz[:, 3]))
+    # slab morph, the same as analyzing the .xyz file
+    assert(TwoDSubduction.SlabMorph(case_dir) == 2)
+    ofile = os.path.join(case_dir, 'slab_morph')
+    header = {
+        'x': {'col': 1, 'unit': 'm'},
+        'y': {'col': 2, 'unit': 'm' },
+        'id': {'col': 4}
+    }
+    depth_ranges = [[0, 100e3], [100e3, 400e3], [400e3, 6371e3]]
+    for _time in [0.0, 1e5]:
+        TwoDSubduction.VISIT_XYZ()(test_file, header=header, ofile=ofile, depth_ranges=depth_ranges, time=_time)
+    assert(filecmp.cmp(ofile, os.path.join(case_dir, 'output', 'slab_morph')))
+    # without times in particles.visit, times are taken from the statistics file
+    parse_dir = os.path.join(test_source_dir, 'parse', 'foo')
+    copy2(os.path.join(parse_dir, 'case.prm'), case_dir)
+    copy2(os.path.join(parse_dir, 'output', 'statistics'), os.path.join(case_dir, 'output'))
+    with open(os.path.join(case_dir, 'output', 'particles.visit'), 'w') as fout:
+        fout.writelines([_line for _line in _lines if not _line.startswith('!TIME')])
+    assert(TwoDSubduction.SlabMorph(case_dir, {'resume': 0}) == 2)
+    _times = np.loadtxt(os.path.join(case_dir, 'output', 'slab_morph'), ndmin=2)[:, 0]
+    assert(np.allclose(_times, [0.0, 2e5]))
+    # the figure is plotted again only when the slab morph output is changed
+    img_file = os.path.join(case_dir, 'img', 'slab_morph.png')
+    assert(TwoDSubduction.PlotCase(case_dir) == [img_file])
+    assert(TwoDSubduction.PlotCase(case_dir) == [])
+    os.remove(os.path.join(case_dir, 'output', 'slab_morph'))
+    assert(TwoDSubduction.SlabMorph(case_dir) == 2)
+    assert(TwoDSubduction.PlotCase(case_dir) == [])
+    with open(os.path.join(case_dir, 'output', 'particles.visit'), 'w') as fout:
+        fout.writelines(_lines[:1] + _lines[2:5])
+    assert(TwoDSubduction.PlotCase(case_dir) == [img_file])
@@ -1,8 +1,10 @@
 import os
 import pytest
+import shutil
 import json
 import numpy as np
 import shilofue.Plot as Plot
+import shilofue.Utilities as Utilities
 from shilofue.Utilities import UNITCONVERT
 from matplotlib import pyplot as plt
 
@@ -80,6 +82,21 @@ def test_plot_depth_average():
     assert(abs(DepthAverage.time_step_times[0]-0.0) < 1e-6)
     assert(abs(DepthAverage.time_step_times[-1]-2.63571e+06)/2.63571e+06 < 1e-6)
     assert(os.path.isfile(_ofile))  # assert that the file is generated successfully
+    # data of time steps is a view of data
+    assert(DepthAverage.time_step_data.shape == (377, 50, DepthAverage.data.shape[1]))
+    assert(np.shares_memory(DepthAverage.time_step_data, DepthAverage.data))
+    # look up time steps, the same as taking the closest one
+    times = np.linspace(-1e5, 3e6, 101)
+    time_steps_std = [np.argmin(abs(DepthAverage.time_step_times - _t)) for _t in times]
+    assert(np.array_equal(DepthAverage.GetTimeSteps(times), time_steps_std))
+    # plot a batch of times, the header is not changed by managing data again
+    total_col = DepthAverage.header['total_col']
+    DepthAverage.ManageData(0.0)
+    assert(DepthAverage.header['total_col'] == total_col)
+    _ofiles = DepthAverage(test_file, fileout=_ofile_route, time=[0.0, 1e6, 2e6])
+    assert(_ofiles == [os.path.join(_test_dir, 'DepthAverage_t%.8e.pdf' % _t) for _t in [0.0, 1.0, 2.0]])
+    for _ofile in _ofiles:
+        assert(os.path.isfile(_ofile))
 
 
 def test_plot_newton_solver():
@@ -165,4 +182,120 @@ def test_plot_machine_time():
     _ofile = os.path.join(_test_dir, 'MachineTime.pdf')
     MachineTime(test_file, fileout=_ofile)
     # assert that the file is generated successfull
-    assert(os.path.isfile(_ofile))
\ No newline at end of file
+    assert(os.path.isfile(_ofile))
+
+
+def test_read_data_cache():
+    '''
+    A test on reading data through the sidecar cache
+    Asserts:
+        cache files are generated
+        data and header read from cache are the same as those from the file
+        cache is renewed after the file is changed
+    '''
+    _source_file = os.path.join(_test_source_dir, 'statistics')
+    test_file = os.path.join(_test_dir, 'statistics')
+    with open(_source_file, 'r') as fin:
+        contents = fin.read()
+    with open(test_file, 'w') as fout:
+        fout.write(contents)
+    for _file in Utilities.TableCacheFiles(test_file):
+        if os.path.isfile(_file):
+            # remove previous files
+            os.remove(_file)
+    # read the file without cache
+    Statistics = Plot.STATISTICS_PLOT('Statistics', cache=False)
+    Statistics.ReadHeader(test_file)
+    Statistics.ReadData(test_file)
+    header_std = Statistics.header
+    data_std = np.array(Statistics.data)
+    # first read saves the cache, second read is from the cache
+    Statistics = Plot.STATISTICS_PLOT('Statistics')
+    for i in range(2):
+        Statistics.ReadHeader(test_file)
+        Statistics.ReadData(test_file)
+        for _file in Utilities.TableCacheFiles(test_file):
+            assert(os.path.isfile(_file))
+        assert(Statistics.header == header_std)
+        assert(np.array_equal(Statistics.data, data_std, equal_nan=True))
+    # append the last row to the file, the cache is renewed
+    with open(test_file, 'a') as fout:
+        fout.write(contents.splitlines(keepends=True)[-1])
+    Statistics.ReadData(test_file)
+    assert(Statistics.data.shape == (data_std.shape[0] + 1, data_std.shape[1]))
+
+
+def test_project_plot():
+    '''
+    A test on plotting for cases in a project, in serial and with a pool of processes
+    Asserts:
+        figures generated are the same
+        a case that fails doesn't stop the others
+    '''
+    project_dir = os.path.join(_test_dir, 'project_plot')
+    if os.path.isdir(project_dir):
+        # remove previous files
+        shutil.rmtree(project_dir)
+    case_dirs = []
+    for case_name in ['case0', 'case_broken']:
+        case_dir = os.path.join(project_dir, case_name)
+        os.makedirs(os.path.join(case_dir, 'output'))
+        for _file, _file_source in [('statistics', 'statistics'), ('depth_average.txt', 'depth_average.txt'),
+                                    ('solver_output', 'newton_solver'), ('machine_time', 'machine_time')]:
+            shutil.copy(os.path.join(_test_source_dir, _file_source), os.path.join(case_dir, 'output', _file))
+        case_dirs.append(case_dir)
+    # statistics file without time
+    with open(os.path.join(case_dirs[-1], 'output', 'statistics'), 'w') as fout:
+        fout.write('# 1: Time step number\n0\n1\n')
+    # plot in serial
+    with pytest.warns(Plot.ProjectPlotWarning):
+        failures = Plot.ProjectPlot(case_dirs, 'png')
+    assert(list(failures.keys()) == [case_dirs[-1]])
+    assert('Plot statistics file failed' in failures[case_dirs[-1]])
+    img_files = {}
+    for case_dir in case_dirs[: -1]:
+        img_files[case_dir] = sorted(os.listdir(os.path.join(case_dir, 'img')))
+        assert('Statistics.png' in img_files[case_dir])
+        assert('MachineTime.png' in img_files[case_dir])
+        shutil.rmtree(os.path.join(case_dir, 'img'))
+    # plot with 2 processes
+    with pytest.warns(Plot.ProjectPlotWarning):
+        failures_p = Plot.ProjectPlot(case_dirs, 'png', workers=2)
+    assert(failures_p == failures)
+    for case_dir in case_dirs[: -1]:
+        assert(sorted(os.listdir(os.path.join(case_dir, 'img'))) == img_files[case_dir])
+
+
+def test_plot_manifest():
+    '''
+    A test on the manifest of figures generated for a case
+    Asserts:
+        figures are not generated again if inputs and options are not changed
+        a figure is generated again if its input or options changed
+    '''
+    case_dir = os.path.join(_test_dir, 'plot_manifest')
+    if os.path.isdir(case_dir):
+        # remove previous files
+        shutil.rmtree(case_dir)
+    os.makedirs(os.path.join(case_dir, 'output'))
+    for _file in ['statistics', 'machine_time']:
+        shutil.copy(os.path.join(_test_source_dir, _file), os.path.join(case_dir, 'output', _file))
+    img_dir = os.path.join(case_dir, 'img')
+    ofiles = Plot.PlotCase(case_dir)
+    assert(ofiles == [os.path.join(img_dir, 'Statistics.png'), os.path.join(img_dir, 'MachineTime.png')])
+    assert(os.path.isfile(os.path.join(img_dir, '.plot_manifest.json')))
+    # nothing changes, no plotting
+    assert(Plot.PlotCase(case_dir) == [])
+    # the file is touched but contents are the same
+    os.utime(os.path.join(case_dir, 'output', 'statistics'))
+    assert(Plot.PlotCase(case_dir) == [])
+    # contents changed
+    with open(os.path.join(case_dir, 'output', 'machine_time'), 'a') as fout:
+        fout.write('\n')
+    assert(Plot.PlotCase(case_dir) == [os.path.join(img_dir, 'MachineTime.png')])
+    # options changed
+    pdict = {'Statistics': {'size': [6, 6]}}
+    assert(Plot.PlotCase(case_dir, pdict=pdict) == [os.path.join(img_dir, 'Statistics.png')])
+    # figure is removed
+    os.remove(os.path.join(img_dir, 'Statistics.png'))
+    assert(Plot.PlotCase(case_dir, pdict=pdict) == [os.path.join(img_dir, 'Statistics.png')])
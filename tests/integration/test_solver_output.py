@@ -0,0 +1,127 @@
+import os
+import json
+import filecmp
+import numpy as np
+import shilofue.SolverOutput as SolverOutput
+
+ASPECT_LAB_DIR = os.environ['ASPECT_LAB_DIR']
+# share the fixtures with the bash tests of parse_solver_output
+test_source_dir = os.path.join(ASPECT_LAB_DIR, 'bash_tests', 'test_aspect_lib', 'test_parse_solver_output')
+test_dir = '.test'
+
+if not os.path.isdir(test_dir):
+    # check we have the directory to store test result
+    os.mkdir(test_dir)
+
+
+def test_parse_solver_output():
+    '''
+    Test the function ParseSolverOutput
+    Asserts:
+        output is the same as the one generated by the bash script
+    '''
+    # test 1
+    filein = os.path.join(test_source_dir, 'task.stdout')
+    fileout = os.path.join(test_dir, 'solver_output')
+    fileout_std = os.path.join(test_source_dir, 'output_std')
+    if os.path.isfile(fileout):
+        # remove older file
+        os.remove(fileout)
+    SolverOutput.ParseSolverOutput(filein, fileout)
+    assert(filecmp.cmp(fileout, fileout_std))
+
+    # test 2: the first 20 steps, with an older file presents
+    filein = os.path.join(test_source_dir, 'task1.stdout')
+    fileout_std = os.path.join(test_source_dir, 'output1_std')
+    total = SolverOutput.ParseSolverOutput(filein, fileout, start=0, interval=1, end=20)
+    assert(total == 2)
+    assert(filecmp.cmp(fileout, fileout_std))
+
+
+def test_solver_output_steps():
+    '''
+    Test the generator SolverOutputSteps
+    Asserts:
+        steps and number of nonlinear iterations
+    '''
+    filein = os.path.join(test_source_dir, 'task.stdout')
+    with open(filein, 'rb') as fin:
+        steps = [(timestep, len(rows)) for timestep, rows, _ in SolverOutput.SolverOutputSteps(fin)]
+    # the last step (step 10) is incomplete, thus not included
+    assert(steps == [(i, 25) for i in range(10)])
+    # stop at a step
+    with open(filein, 'rb') as fin:
+        steps = [timestep for timestep, _, _ in SolverOutput.SolverOutputSteps(fin, end=3)]
+    assert(steps == [0, 1, 2])
+
+
+def test_update_solver_output():
+    '''
+    Test the function UpdateSolverOutput, with a stdout file that grows
+    Asserts:
+        output is the same as the one parsed at once
+        the checkpoint records the last complete step
+    '''
+    filein_std = os.path.join(test_source_dir, 'task.stdout')
+    fileout_std = os.path.join(test_source_dir, 'output_std')
+    filein = os.path.join(test_dir, 'update_solver_output.stdout')
+    fileout = os.path.join(test_dir, 'update_solver_output')
+    for _file in [filein, fileout, fileout + '.checkpoint']:
+        if os.path.isfile(_file):
+            # remove older file
+            os.remove(_file)
+    with open(filein_std, 'rb') as fin:
+        contents = fin.read()
+    # append to the stdout file in chunks, cutting through lines
+    chunk = len(contents) // 7 + 1
+    total = 0
+    for i in range(0, len(contents), chunk):
+        with open(filein, 'ab') as fout:
+            fout.write(contents[i: i + chunk])
+        total += SolverOutput.UpdateSolverOutput(filein, fileout)
+    assert(total == 10)
+    assert(filecmp.cmp(fileout, fileout_std))
+    with open(fileout + '.checkpoint', 'r') as fin:
+        checkpoint = json.load(fin)
+    assert(checkpoint['last_step'] == 9)
+    # nothing is appended, nothing changes
+    assert(SolverOutput.UpdateSolverOutput(filein, fileout) == 0)
+    assert(filecmp.cmp(fileout, fileout_std))
+    # a different job writes to the same file, parse again from the start
+    with open(filein, 'wb') as fout:
+        fout.write(contents.replace(b'SLURM_JOB_ID = 2542290', b'SLURM_JOB_ID = 2542291', 1))
+    assert(SolverOutput.UpdateSolverOutput(filein, fileout) == 10)
+    assert(filecmp.cmp(fileout, fileout_std))
+
+
+def test_newton_solver_stats():
+    '''
+    Test the functions LoadSolverOutputs and NewtonSolverStats
+    Asserts:
+        statistics of cases are the same as those computed step by step
+    '''
+    doc_dir = os.path.join(ASPECT_LAB_DIR, 'tests', 'integration', 'fixtures', 'doc')
+    files = [os.path.join(doc_dir, 'foo', 'output', 'solver_output'),
+             os.path.join(doc_dir, 'foo', 'output', 'foo'),  # a case without output
+             os.path.join(doc_dir, 'foo_group', 'foo1', 'output', 'solver_output')]
+    data = SolverOutput.LoadSolverOutputs(files, cache=False)
+    assert(data.shape[1] == len(SolverOutput.SOLVER_TABLE_COLUMNS))
+    assert(list(SolverOutput.CaseBounds(data, 3)) == [0, 548, 548, 1373])
+    numbers = SolverOutput.NonlinearIterationNumbers(data, 3)
+    assert(numbers[0] == 0 and numbers[547] == 547 and numbers[548] == 0)
+    stats = SolverOutput.NewtonSolverStats(data, 3, max_iterations=[50, np.nan, 100])
+    assert(list(stats['steps']) == [11, 0, 11])
+    assert(list(stats['iterations']) == [548, 0, 825])
+    assert(np.isnan(stats['steps_at_cap'][1]) and stats['steps_at_cap'][2] == 0)
+    # compute for the first case step by step
+    table = np.loadtxt(files[0])
+    counts = []
+    rates = []
+    for step in np.unique(table[:, 0]):
+        residuals = table[table[:, 0] == step, 2]
+        counts.append(residuals.size)
+        rates.append((residuals[-1] / residuals[0])**(1.0 / (residuals.size - 1)))
+    assert(stats['max_iterations'][0] == max(counts))
+    assert(abs(stats['mean_iterations'][0] - np.mean(counts)) < 1e-12)
+    assert(abs(stats['reduction_rate'][0] - np.mean(rates)) < 1e-12)
+    assert(stats['steps_at_cap'][0] == sum([count >= 50 for count in counts]))
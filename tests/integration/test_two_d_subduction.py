@@ -1,10 +1,12 @@
 import os
 import json
 import filecmp
+import pytest
+import numpy as np
 import shilofue.TwoDSubduction as TwoDSubduction
 import shilofue.Parse as Parse
 import shilofue.Utilities as Utilities
-from shutil import rmtree
+from shutil import rmtree, copy2
 
 ASPECT_LAB_DIR = os.environ['ASPECT_LAB_DIR']
 test_source_dir = os.path.join(os.path.dirname(__file__), 'fixtures')
@@ -148,6 +150,77 @@ def test_generate_group():
         assert(os.path.isfile(_prm_file))
 
 
+def test_particle_data():
+    '''
+    test particles generated in the slab, and particle files in ascii and binary formats
+    '''
+    _odir = os.path.join(test_dir, 'test_particle_data')
+    if os.path.isdir(_odir):
+        # remove older files
+        rmtree(_odir)
+    os.mkdir(_odir)
+    parse_dir = os.path.join(test_source_dir, 'TwoDSubduction', 'parse')
+    with open(os.path.join(parse_dir, 'base.prm'), 'r') as fin:
+        _inputs = Parse.ParseFromDealiiInput(fin)
+    with open(os.path.join(parse_dir, 'base_config.json'), 'r') as fin:
+        _config = json.load(fin)
+    _extra = {'T660': 1663.0, 'P660': 21e9, 'LowerV': 1.5e-6, 'number_particle_in_slab': 2000, 'depth_particle_in_slab': 1e3}
+    MyCase = TwoDSubduction.MYCASE(_inputs, config=_config, extra=_extra)
+    MyCase.process_particle_data()
+    particle_data = MyCase.particle_data
+    assert(particle_data.shape == (2000, 2))
+    # particles start from phi = 0, at a depth of depth_particle_in_slab
+    assert(np.allclose(particle_data[0], [6.371e6 - 1e3, 0.0]))
+    # particles bend into the slab
+    _r = (particle_data[:, 0]**2.0 + particle_data[:, 1]**2.0)**0.5
+    assert(np.allclose(_r[:1000], 6.371e6 - 1e3) and _r[-1] < 6.371e6 - 1e3 - 1e5)
+    # ascii and binary files
+    parse_operations = TwoDSubduction.MY_PARSE_OPERATIONS()
+    _case_name = MyCase(parse_operations, dirname=_odir, extra=_extra)
+    _particle_file = os.path.join(_odir, _case_name, 'particle.dat')
+    assert(np.allclose(Parse.ReadParticleFile(_particle_file), particle_data, rtol=1e-4))
+    _config = {**_config, 'if_particle_in_slab': 1}
+    _extra['if_particle_in_slab'] = 1
+    MyCase = TwoDSubduction.MYCASE(_inputs, config=_config, extra=_extra)
+    _binary_case_name = MyCase(parse_operations, dirname=_odir, basename='binary', extra=_extra, particle_format='binary')
+    _binary_case_dir = os.path.join(_odir, _binary_case_name)
+    _particle_file = os.path.join(_binary_case_dir, 'particle.npy')
+    assert(np.array_equal(Parse.ReadParticleFile(_particle_file), particle_data))
+    # convert to the ascii file named in the prm file before running the case
+    _generator = Parse.ReadPrmFile(os.path.join(_binary_case_dir, 'case.prm'))['Postprocess']['Particles']['Generator']['Ascii file']
+    _ascii_file = os.path.join(_binary_case_dir, _generator['Data directory'], _generator['Data file name'])
+    assert(not os.path.isfile(_ascii_file))
+    assert(Parse.ConvertParticleFile(_binary_case_dir) == _ascii_file)
+    assert(os.path.isfile(_ascii_file))
+    assert(np.allclose(Parse.ReadParticleFile(_ascii_file), particle_data, rtol=1e-4))
+
+
+def test_slab_particles():
+    '''
+    test SLAB_PARTICLES with layers, spacing by arc length and in 3d
+    '''
+    _config = {'number_particle_in_slab': 1000, 'depth_particle_in_slab': 1e3,
+               'layers_particle_in_slab': 3, 'thickness_particle_in_slab': 2e4}
+    particle_data = TwoDSubduction.SLAB_PARTICLES(_config)()
+    assert(particle_data.shape == (3000, 2))
+    # layers are ordered by depth
+    _r = (particle_data[:, 0]**2.0 + particle_data[:, 1]**2.0)**0.5
+    assert(np.allclose(_r[[0, 1000, 2000]], [6.371e6 - 1e3, 6.371e6 - 1.1e4, 6.371e6 - 2.1e4]))
+    # particles are evenly spaced along the slab
+    _config['spacing_particle_in_slab'] = 'arc_length'
+    particle_data = TwoDSubduction.SLAB_PARTICLES(_config)()
+    _ds = np.hypot(np.diff(particle_data[:1000, 0]), np.diff(particle_data[:1000, 1]))
+    assert(np.allclose(_ds, _ds[0], rtol=1e-2))
+    # 3d, rows in latitude
+    _config = {'number_particle_in_slab': 100, 'number_particle_in_latitude': 5,
+               'latitude_particle_in_slab': [-0.1, 0.1]}
+    particle_data = TwoDSubduction.SLAB_PARTICLES(_config, dimension=3)()
+    assert(particle_data.shape == (500, 3))
+    assert(np.allclose(particle_data[200], [6.371e6 - 100.0, 0.0, 0.0]))
+    _r = np.linalg.norm(particle_data, axis=1)
+    assert(np.allclose(np.arcsin(particle_data[:100, 2] / _r[:100]), -0.1))
+
+
 def test_bash_options():
     """
     test BASH_OPTIONS class
@@ -184,6 +257,81 @@ def test_visit_xyz():
     assert(filecmp.cmp(ofile, standard_output))
 
 
+def test_visit_xyz_batch():
+    """
+    test VISIT_XYZ.Batch, results are the same as analyzing snapshots one by one
+    """
+    test_file = os.path.join(test_source_dir, 'TwoDSubduction', 'visit_xyz', 'visit_particles.xyz')
+    _odir = os.path.join(test_dir, 'visit_xyz_batch')
+    if os.path.isdir(_odir):
+        # remove older files
+        rmtree(_odir)
+    os.mkdir(_odir)
+    # snapshots, particles in the last one are shuffled
+    with open(test_file, 'r') as fin:
+        _lines = fin.readlines()
+    files = []
+    for i in range(3):
+        _rows = _lines[2:]
+        if i == 2:
+            _rows = _rows[500:] + _rows[:500]
+        files.append(os.path.join(_odir, 'visit_particles_%06d.xyz' % i))
+        with open(files[-1], 'w') as fout:
+            fout.writelines(_lines[:2] + _rows)
+    header = {
+        'x': {'col': 1, 'unit': 'm'},
+        'y': {'col': 2, 'unit': 'm' },
+        'id': {'col': 4}
+    }
+    depth_ranges = [[0, 100e3], [100e3, 400e3], [400e3, 6371e3]]
+    ofile = os.path.join(_odir, 'slab_morph')
+    for i in range(3):
+        TwoDSubduction.VISIT_XYZ()(files[i], header=header, ofile=ofile, depth_ranges=depth_ranges, time=i*1e6)
+    ofile_batch = os.path.join(_odir, 'slab_morph_batch')
+    for cache in [False, True, True]:
+        TwoDSubduction.VISIT_XYZ().Batch(files, header=header, ofile=ofile_batch, depth_ranges=depth_ranges,
+                                         times=[0.0, 1e6, 2e6], chunk=2, cache=cache)
+        assert(filecmp.cmp(ofile, ofile_batch))
+
+
+def test_slab_morph_resume():
+    """
+    test SlabMorph with a pool of processes, with snapshots missing and then resumed
+    """
+    case_dir = os.path.join(test_dir, 'slab_morph_resume')
+    if os.path.isdir(case_dir):
+        # remove older files
+        rmtree(case_dir)
+    case_morph_dir = os.path.join(case_dir, 'output', 'slab_morphs')
+    os.makedirs(case_morph_dir)
+    # particles are output every 5e5 yr, there are 6 snapshots in statistics
+    with open(os.path.join(case_dir, 'case.prm'), 'w') as fout:
+        fout.write('subsection Postprocess\n  subsection Particles\n    set Time between data output = 5e5\n  end\nend\n')
+    copy2(os.path.join(test_source_dir, 'test-plot', 'statistics'), os.path.join(case_dir, 'output', 'statistics'))
+    test_file = os.path.join(test_source_dir, 'TwoDSubduction', 'visit_xyz', 'visit_particles.xyz')
+    # the last 2 snapshots are not there yet
+    for i in range(4):
+        copy2(test_file, os.path.join(case_morph_dir, 'visit_particles_%06d.xyz' % i))
+    ofile = os.path.join(case_dir, 'output', 'slab_morph')
+    with pytest.warns(TwoDSubduction.SlabMorphWarning):
+        assert(TwoDSubduction.SlabMorph(case_dir, {'workers': 2}) == 4)
+    with open(ofile, 'r') as fin:
+        _lines = fin.readlines()
+    # resume with new snapshots
+    for i in range(4, 6):
+        copy2(test_file, os.path.join(case_morph_dir, 'visit_particles_%06d.xyz' % i))
+    assert(TwoDSubduction.SlabMorph(case_dir, {'workers': 2}) == 6)
+    with open(ofile, 'r') as fin:
+        _lines_resumed = fin.readlines()
+    assert(_lines_resumed[: len(_lines)] == _lines)
+    # the same as analyzing all snapshots again
+    assert(TwoDSubduction.SlabMorph(case_dir, {'resume': 0}) == 6)
+    with open(ofile, 'r') as fin:
+        assert(fin.readlines() == _lines_resumed)
+    assert(os.listdir(os.path.join(case_dir, 'output')).count('slab_morph') == 1)
+    assert([_file for _file in os.listdir(os.path.join(case_dir, 'output')) if _file.endswith('.tmp')] == [])
+
+
 def test_slab_morph():
     """
     test SLAB_MORPH_PLOT class
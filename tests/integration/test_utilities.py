@@ -66,4 +66,39 @@ def test_average_phase_function_inputs():
     fig.savefig(filename)
 
     assert(os.path.isfile(filename))
-    pass
\ No newline at end of file
+    pass
+
+
+def test_load_table():
+    '''
+    Test the LoadTable function
+    Asserts:
+        data is the same as the one from np.genfromtxt
+        header and data of a subset of columns
+        a file with only a header
+    '''
+    _test_source_dir = os.path.join(os.path.dirname(__file__), 'fixtures', 'test-plot')
+    # statistics file
+    filein = os.path.join(_test_source_dir, 'statistics')
+    header, data = Utilities.LoadTable(filein)
+    data_std = np.genfromtxt(filein, comments='#')
+    assert(header['Time']['col'] == 1)
+    assert(header['total_col'] == data_std.shape[1])
+    assert(np.array_equal(data, data_std, equal_nan=True))
+    # only load two columns
+    header, data = Utilities.LoadTable(filein, usecols=['Time_step_number', 'Time'])
+    assert(header == {'total_col': 2, 'Time_step_number': {'col': 0, 'unit': None},
+                      'Time': {'col': 1, 'unit': 'years'}})
+    assert(np.array_equal(data, data_std[:, [0, 1]]))
+    # depth_average file, with a header of one line
+    filein = os.path.join(_test_source_dir, 'depth_average.txt')
+    header, data = Utilities.LoadTable(filein, header_reader=Utilities.ReadHeader2, usecols=['depth'])
+    assert(data.shape[1] == 1 and header['depth']['col'] == 0)
+    # a file with only a header
+    if not os.path.isdir(_test_dir):
+        os.mkdir(_test_dir)
+    filein = os.path.join(_test_dir, 'load_table_empty')
+    with open(filein, 'w') as fout:
+        fout.write('# 1: Time step number\n# 2: Time (years)\n')
+    header, data = Utilities.LoadTable(filein)
+    assert(data.shape == (0, 2))
@@ -1,3 +1,4 @@
+import io
 import pytest
 import shilofue.Parse as Parse
 
@@ -104,6 +105,28 @@ def test_get_group_case_from_dict1():
     #          'test': {'foo2': [0, 1]}}
 
 
+def test_group_case_configs():
+    '''
+    Test the class GROUP_CASE_CONFIGS
+    '''
+    _idict = {'config': {'foo': [0, 1], 'foo1': [0, 1], 'foo2': 'bar'},
+              'test': {'foo3': [0, 1, 2]}}
+    _config_tests = Parse.GROUP_CASE_CONFIGS(_idict)
+    assert(len(_config_tests) == 12)
+    assert(list(_config_tests)[:2] == [{'config': {'foo': 0, 'foo1': 0, 'foo2': 'bar'}, 'test': {'foo3': 0}},
+                                       {'config': {'foo': 1, 'foo1': 0, 'foo2': 'bar'}, 'test': {'foo3': 0}}])
+    # filter with a predicate
+    _config_tests = Parse.GROUP_CASE_CONFIGS(_idict, predicate=lambda config, test: config['foo'] == test['foo3'])
+    assert(len(_config_tests) == 4)
+    assert([(_config_test['config']['foo'], _config_test['test']['foo3']) for _config_test in _config_tests]
+           == [(0, 0), (0, 0), (1, 1), (1, 1)])
+    # combinations are generated lazily
+    _idict = {'config': {'foo%d' % i: list(range(10)) for i in range(8)}}
+    _config_tests = Parse.GROUP_CASE_CONFIGS(_idict)
+    assert(len(_config_tests) == 10**8)
+    assert(next(iter(_config_tests)) == {'config': {'foo%d' % i: 0 for i in range(8)}, 'test': {}})
+
+
 def test_change_disc_values():
     '''
     Test the function ChangeDiscValues()
@@ -150,4 +173,119 @@ def test_parse_phase_input():
         "xc" : [0.55, 0.55, 0.05, 0.55, 0.4, 0.4, 0.4]
     }
     output = Parse.ParsePhaseInput(Inputs)
-    assert(output == "3300.0|3586.0|3723.5|3757.0|4219.0|4443.0|4681.8|5149.8")
\ No newline at end of file
+    assert(output == "3300.0|3586.0|3723.5|3757.0|4219.0|4443.0|4681.8|5149.8")
+
+
+def test_prm_overlay():
+    '''
+    Test the class PRM_OVERLAY
+    '''
+    _base = {'Dimension': '2', 'Material model': {'Model name': 'visco plastic', 'Visco Plastic': {'Grain size': '1e-2'}},
+             'Postprocess': {'List of postprocessors': 'velocity statistics'}}
+    _idict = Parse.PRM_OVERLAY(_base)
+    _idict['Dimension'] = '3'
+    _idict['Material model']['Visco Plastic']['Grain size'] = '1e-3'
+    _idict['Postprocess']['Particles'] = {'Number of particles': '1000'}
+    del _idict['Material model']['Model name']
+    Parse.ChangeDiscValues(_idict, [['End time']], ['1e6'])
+    # the base is not changed
+    assert(_base == {'Dimension': '2', 'Material model': {'Model name': 'visco plastic', 'Visco Plastic': {'Grain size': '1e-2'}},
+                     'Postprocess': {'List of postprocessors': 'velocity statistics'}})
+    # only changes are saved, subsections not accessed are not copied
+    assert(list(_idict.overrides.keys()) == ['Dimension', 'Material model', 'Postprocess', 'End time'])
+    assert('Model name' not in _idict['Material model'])
+    assert(_idict.ToDict() == {'Dimension': '3', 'Material model': {'Visco Plastic': {'Grain size': '1e-3'}},
+                               'Postprocess': {'List of postprocessors': 'velocity statistics',
+                                               'Particles': {'Number of particles': '1000'}},
+                               'End time': '1e6'})
+    # views are written out the same as a dict
+    _out = io.StringIO()
+    _out_dict = io.StringIO()
+    Parse.ParseToDealiiInput(_out, _idict)
+    Parse.ParseToDealiiInput(_out_dict, _idict.ToDict())
+    assert(_out.getvalue() == _out_dict.getvalue())
+    # cases don't change the dictionary they are initiated from
+    _case = Parse.CASE(_base)
+    _case.UpdatePrmDict([['Dimension']], ['3'])
+    assert(_case.idict['Dimension'] == '3' and _base['Dimension'] == '2')
+
+
+def test_parse_from_dealii_input():
+    '''
+    Test the function ParseFromDealiiInput
+    '''
+    _contents = '''# comment
+set Dimension = 2  # dimension
+set Additional shared libraries =
+subsection Material model
+    set Model name = visco plastic
+    subsection Visco Plastic
+        set Densities = background: 3300, \\
+                        spcrust: 3000 # comment
+    end
+end
+subsection Material model
+    set Material averaging = none
+end
+subsection Postprocess
+    set List of postprocessors = velocity statistics
+'''
+    _inputs = Parse.ParseFromDealiiInput(io.StringIO(_contents))
+    assert(_inputs == {'Dimension': '2', 'Additional shared libraries': '',
+                       'Material model': {'Model name': 'visco plastic',
+                                          'Visco Plastic': {'Densities': 'background: 3300, \\\n                        spcrust: 3000'},
+                                          'Material averaging': 'none'},
+                       'Postprocess': {'List of postprocessors': 'velocity statistics'}})
+
+
+def test_dealii_input_text():
+    '''
+    Test the function DealiiInputText
+    '''
+    _contents = '''# comment
+set Dimension = 2  # dimension
+subsection Material model
+    set Model name = visco plastic
+    set Material averaging = none
+    subsection Visco Plastic
+        set Densities = background: 3300, \\
+                        spcrust: 3000 # comment
+    end
+end
+subsection Postprocess
+    set List of postprocessors = velocity statistics
+end
+'''
+    _inputs = Parse.ParseFromDealiiInput(io.StringIO(_contents))
+    # default form is the same as before
+    _out = io.StringIO()
+    Parse.ParseToDealiiInput(_out, _inputs)
+    assert(_out.getvalue().startswith('set Dimension = 2\n\nsubsection Material model\n'))
+    # canonical form is sorted and round trips
+    _canonical = Parse.DealiiInputText(_inputs, canonical=True)
+    assert(_canonical.startswith('set Dimension = 2\n\nsubsection Material model\n'
+                                 '    set Material averaging = none\n    set Model name = visco plastic\n'))
+    assert(Parse.DealiiInputText(Parse.ParseFromDealiiInput(io.StringIO(_canonical)), canonical=True) == _canonical)
+    with pytest.raises(ValueError):
+        Parse.DealiiInputText({'a': 'b # c'}, canonical=True)
+    # template keeps comments and unchanged lines
+    assert(Parse.DealiiInputText(_inputs, template=_contents) == _contents)
+    _case = Parse.CASE(_inputs)
+    _case.idict['Dimension'] = 3
+    del _case.idict['Material model']['Material averaging']
+    _case.idict['Material model']['Visco Plastic']['Viscosity averaging scheme'] = 'harmonic'
+    _case.idict['Postprocess'] = {}
+    _text = Parse.DealiiInputText(_case.idict, template=_contents)
+    assert(_text == '''# comment
+set Dimension = 3
+subsection Material model
+    set Model name = visco plastic
+    subsection Visco Plastic
+        set Densities = background: 3300, \\
+                        spcrust: 3000 # comment
+        set Viscosity averaging scheme = harmonic
+    end
+end
+subsection Postprocess
+end
+''')
@@ -697,39 +697,23 @@ flip_rc(){
 #   group_dirs(array): list of full routes to groups
 #   case_dirs(array)
 search_for_groups_cases(){
-    # configurations
-    local config_file="config.json"
-    local prm_file="case.prm"
-
-    # loop for groups and case
-    local object; local contents; local sub_object; local sub_contents
+    # groups and cases are looked up from the index of the directory,
+    # see PROJECT_INDEX in shilofue/Parse.py.
+    # a case has both config.json and case.prm, a group only has config.json
+    # and there could be 3 layers at most.
+    local line
     # initialize arrays
     group_dirs=(); case_dirs=()
 
-    [[ -d "$1" ]] || cecho "${FUNCNAME[0]}: \$1 must be an existing directory"
-
-    # check if this is a case directory
-    contents=$(ls "${1}")
-    [[ ${contents} =~ "${config_file}" && ${contents} =~ "${prm_file}" ]] && { case_dirs+=("${1}"); return 0; }
-    [[ ${contents} =~ "${config_file}" && ! ${contents} =~ "${prm_file}" ]] && group_dirs+=("${1}")
-
-    # check if this is a group or project folder, note that there could be 3 layers at most
-    for object in "$1"/*; do
-        if [[ -d ${object} ]]; then
-            contents=$(ls "${object}")
-            [[ ${contents} =~ "${config_file}" && ${contents} =~ "${prm_file}" ]] && case_dirs+=("${object}")
-            # loop for cases in the sub-folder of groups
-            if [[ ${contents} =~ "${config_file}" && ! ${contents} =~ "${prm_file}" ]]; then
-                group_dirs+=("${object}")
-                for sub_object in "${object}"/*; do
-                    if [[ -d ${sub_object} ]]; then
-                        sub_contents=$(ls "${sub_object}")
-                        [[ ${sub_contents} =~ "${config_file}" && ${sub_contents} =~ "${prm_file}" ]] && case_dirs+=("${sub_object}")
-                    fi
-                done
-            fi
-        fi
-    done
+    [[ -d "$1" ]] || { cecho "${FUNCNAME[0]}: \$1 must be an existing directory"; return 1; }
+
+    # each line of output is "group dir" or "case dir"
+    while IFS= read -r line; do
+        case "${line%% *}" in
+            group) group_dirs+=("${line#* }");;
+            case) case_dirs+=("${line#* }");;
+        esac
+    done < <(python -m shilofue.Parse search_groups_cases -i "${1}")
     return 0
 }
 